@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-from plots import Plots
 import streamlit as st
 from sql_queries import run_sql_query, facilities_sql, all_tenants
 from utils import grab_s3_file, password_authenticate
@@ -23,10 +22,8 @@ hide_st_style = """
 st.markdown(hide_st_style, unsafe_allow_html=True)
 
 # ----- FUNCTIONS -----
-plots = Plots()
-
-# tenants = run_sql_query(all_tenants)
-# facilities = run_sql_query(facilities_sql)
+# tenants = load_tenants()  # tenant_features: write-offs classified incrementally instead of all_tenants
+# facilities = run_query('facilities')
 
 # list_rds = facilities['rd'].tolist()
 
@@ -148,7 +145,7 @@ with st.sidebar:
     #     row2=st.columns([3,2,2])
     #     with row2[0]:
     #         # plot_survival_curve_altair(filtered_ecris, 'notification_date')
-    #         plots.plot_altair_chart(filtered_ecris, 'notification_date', 'Survival by Model')
+    #         SurvivalPlot().plot_altair_chart(filtered_ecris, 'notification_date', 'Survival by Model')
 
     #     end_row = st.columns([1,5,5])
     #     with end_row[0]:
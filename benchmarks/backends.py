@@ -0,0 +1,100 @@
+import io
+import re
+
+import pandas as pd
+
+
+# Postgres accepts columns functionally dependent on a grouped primary key; DuckDB needs any_value()
+FUNCTIONAL_DEPENDENCY_REWRITES = [
+    (r'\bf\.region_id\s*,', 'any_value(f.region_id) as region_id,'),            # facilities_sql, grouped by f.id
+    (r'\bo\.moved_out_at::date\s*\n', 'any_value(o.moved_out_at)::date as moved_out_at\n'),  # all_tenants, grouped by o.id
+]
+
+
+def to_duckdb_sql(sql_query, params=None):
+    """
+    Adapt the app's Postgres SQL to DuckDB.
+
+    - `generate_series(...) as d` names a table in DuckDB, so it becomes `as d(d)`
+      (also valid Postgres) to expose the column as `d`.
+    - psycopg2 `%(name)s` placeholders become DuckDB `$name` parameters.
+    - see FUNCTIONAL_DEPENDENCY_REWRITES.
+    """
+    sql_query = re.sub(r'\)\s+as\s+d\s*\n', ') as d(d)\n', sql_query)
+    for pattern, replacement in FUNCTIONAL_DEPENDENCY_REWRITES:
+        sql_query = re.sub(pattern, replacement, sql_query)
+    sql_query = re.sub(r'%\((\w+)\)s', r'$\1', sql_query)
+    return sql_query, params
+
+
+class DuckDBBackend():
+    """
+    Embedded stand-in for Postgres: the synthetic tables are loaded into an
+    in-memory DuckDB database and queries are run after `to_duckdb_sql`.
+    """
+    name = 'duckdb'
+
+    def __init__(self, tables, threads=None):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError('The DuckDB backend needs `pip install -r benchmarks/requirements.txt`.') from e
+        self.conn = duckdb.connect()
+        if threads:
+            self.conn.execute(f'set threads = {int(threads)}')
+        for name, df in tables.items():
+            # Postgres mixes timestamp and timestamptz freely (e.g. coalesce(moved_out_at, now())), DuckDB does not
+            # `*_date` columns are dates in production
+            casts = [f'"{c}"::{"date" if c.endswith("_date") else "timestamptz"} as "{c}"'
+                     for c, t in df.dtypes.items() if str(t).startswith('datetime64')]
+            replace = f" replace ({', '.join(casts)})" if casts else ''
+            self.conn.register('_frame', df)
+            self.conn.execute(f'create table {name} as select *{replace} from _frame')
+            self.conn.unregister('_frame')
+
+    def run(self, sql_query, params=None):
+        sql_query, params = to_duckdb_sql(sql_query, params)
+        return self.conn.execute(sql_query, params or {}).df()
+
+    def close(self):
+        self.conn.close()
+
+
+class PostgresBackend():
+    """
+    A local Postgres database (given by a libpq DSN) loaded with the synthetic
+    tables through COPY. Tables are dropped and recreated on load.
+    """
+    name = 'postgres'
+
+    TYPES = {
+        'int64': 'bigint', 'int32': 'integer', 'float64': 'double precision', 'bool': 'boolean',
+        'datetime64[ns]': 'timestamp', 'datetime64[us]': 'timestamp', 'object': 'text',
+    }
+
+    def __init__(self, tables, dsn):
+        import psycopg2
+
+        self.conn = psycopg2.connect(dsn)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            for name, df in tables.items():
+                cols = ', '.join(f'"{c}" {self.column_type(c, t)}' for c, t in df.dtypes.items())
+                cur.execute(f'drop table if exists {name} cascade')
+                cur.execute(f'create table {name} ({cols})')
+                buf = io.StringIO()
+                df.to_csv(buf, index=False, header=False)
+                buf.seek(0)
+                cur.copy_expert(f'copy {name} from stdin with (format csv)', buf)
+                cur.execute(f'analyze {name}')
+
+    def column_type(self, column, dtype):
+        if column.endswith('_date') and str(dtype).startswith('datetime64'):
+            return 'date'  # `*_date` columns are dates in production
+        return self.TYPES.get(str(dtype), 'text')
+
+    def run(self, sql_query, params=None):
+        return pd.read_sql_query(sql_query, self.conn, params=params)
+
+    def close(self):
+        self.conn.close()
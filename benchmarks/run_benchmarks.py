@@ -0,0 +1,262 @@
+"""
+Time the app's queries and prep functions against synthetic data.
+
+    python -m benchmarks.run_benchmarks --sites 200 --occupancies 1000000
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<baseline>.json
+
+Runs offline against an in-memory DuckDB stand-in by default, or a local
+Postgres when `--dsn` (or BENCH_PG_DSN) is given. Results are written as JSON
+so runs can be compared against a baseline.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.backends import DuckDBBackend, PostgresBackend
+from benchmarks.synthetic_data import generate_ecris, generate_tables
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SCALES = {
+    'small': (50, 100_000),
+    'medium': (200, 1_000_000),
+    'large': (1000, 20_000_000),
+}
+
+
+def time_call(func, repeat):
+    """
+    Run `func` `repeat` times and return (seconds per run, last result).
+    """
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return seconds, result
+
+
+def summarize(seconds, result):
+    rows = len(result) if hasattr(result, '__len__') else None
+    return {
+        'seconds': [round(s, 6) for s in seconds],
+        'best': round(min(seconds), 6),
+        'median': round(statistics.median(seconds), 6),
+        'rows': rows,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(RESULTS_DIR)).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(backend, ecris, repeat=3, only=None):
+    """
+    Time every benchmark and return {name: summary}.
+
+    SQL benchmarks run the query strings from `sql_queries`; prep benchmarks
+    feed the query results into the same code the pages run.
+    """
+    import sql_queries
+    from metrics_cube import MetricsCube
+    from query_builder import build_query, facility_params
+    from plots import HistogramPlot, ScatterPlot, SurvivalPlot
+    from schemas import apply_schema
+    from tenant_features import WriteOffStore, load_tenants
+    from cohort_engine import CohortEngine
+    from occupancy_engine import OccupancyEngine
+    from snapshot_store import HISTORY_START
+    from forecast_engine import ForecastEngine
+    from survival import BOOTSTRAP_WORKERS, SurvivalIndex
+
+    results = {}
+    frames = {}
+
+    def bench(name, func):
+        if only and name not in only:
+            return None
+        print(f'  {name} ...', end=' ', flush=True)
+        seconds, result = time_call(func, repeat)
+        results[name] = summarize(seconds, result)
+        print(f"{results[name]['best']:.3f}s ({results[name]['rows']} rows)")
+        return result
+
+    queries = {
+        'move_outs': build_query('move_outs'),
+        'occupants': build_query('occupants'),
+        'all_tenants': (sql_queries.all_tenants, None),
+        'facilities_sql': build_query('facilities'),
+    }
+    for name, (query, params) in queries.items():
+        frames[name] = bench(f'sql:{name}', lambda q=query, p=params: backend.run(q, p))
+        if frames[name] is None and name != 'all_tenants':
+            frames[name] = backend.run(query, params)
+
+    # all_tenants from the incremental write-off store: a cold build classifies every ledger row,
+    # a warm refresh finds no new ledger ids and only reassembles the tenant frame
+    with tempfile.TemporaryDirectory() as root:
+        store = WriteOffStore(backend.run, root)
+        fetch_occupancies = lambda: backend.run(sql_queries.tenant_occupancies)
+        bench('prep:tenant_features[cold]', lambda: (store.rebuild(), load_tenants(store, fetch_occupancies))[1])
+        bench('prep:tenant_features[warm]', lambda: load_tenants(store, fetch_occupancies))
+
+    # narrow analyses: filters pushed into the SQL rather than applied to the full result
+    site_code = frames['facilities_sql']['rd'].iloc[0]
+    last_year = (pd.Timestamp.now() - pd.DateOffset(years=1)).date()
+    for name in ['move_outs', 'occupants']:
+        bench(f'sql:{name}[last 12 months]', lambda n=name: backend.run(*build_query(n, start_date=last_year)))
+        bench(f'sql:{name}[1 site]', lambda n=name: backend.run(*build_query(n, site_codes=[site_code])))
+
+    # prep_data on the Move Outs page is the MetricsCube build
+    cube = bench('prep:metrics_cube', lambda: MetricsCube(frames['move_outs'], frames['occupants'], frames['facilities_sql']))
+    if cube is None:
+        cube = MetricsCube(frames['move_outs'], frames['occupants'], frames['facilities_sql'])
+
+    # loaders convert frames to the compact dtypes declared in schemas.SCHEMAS
+    schemas = {'move_outs': 'move_outs', 'occupants': 'occupants', 'facilities_sql': 'facilities'}
+    compact = {name: apply_schema(frames[name], schema) for name, schema in schemas.items()}
+    for name, schema in schemas.items():
+        if bench(f'prep:apply_schema[{name}]', lambda n=name, s=schema: apply_schema(frames[n], s)) is not None:
+            print(f"    {name}: {frames[name].memory_usage(deep=True).sum() / 1e6:.1f} MB -> "
+                  f"{compact[name].memory_usage(deep=True).sum() / 1e6:.1f} MB")
+    bench('prep:metrics_cube[compact dtypes]',
+          lambda: MetricsCube(compact['move_outs'], compact['occupants'], compact['facilities_sql']))
+
+    # Move Ins page: cohort engine built once per refresh, then re-sliced per filter
+    intervals = apply_schema(backend.run(sql_queries.occupancy_intervals, {'epoch': '2013-01-01', **facility_params()}), 'occupancy_intervals')
+    engine = bench('prep:cohort_engine', lambda: CohortEngine.from_frame(intervals, frames['facilities_sql']))
+    if engine is None:
+        engine = CohortEngine.from_frame(intervals, frames['facilities_sql'])
+    region = engine.options('region')[0]
+    bench('prep:cohort_engine.retention_matrix', lambda: engine.retention_matrix(max_tenure=36))
+    bench('prep:cohort_engine.retention_matrix[region]', lambda: engine.retention_matrix(max_tenure=36, region=region))
+
+    # Move Outs page: month-end occupants and daily occupancy from the same intervals, in place of sql:occupants
+    occupancy = bench('prep:occupancy_engine', lambda: OccupancyEngine.from_frame(intervals))
+    if occupancy is None:
+        occupancy = OccupancyEngine.from_frame(intervals)
+    occs = bench('prep:occupancy_engine.month_end_occupants', lambda: occupancy.month_end_occupants(HISTORY_START))
+    if occs is None:
+        occs = occupancy.month_end_occupants(HISTORY_START)
+    site_area = frames['facilities_sql'].set_index('rd')['nrsf']
+    bench('prep:occupancy_engine.daily_totals[last 12 months]',
+          lambda: occupancy.daily_totals(last_year, datetime.date.today(), site_area=site_area))
+    bench('prep:metrics_cube[engine occupants]', lambda: MetricsCube(compact['move_outs'], occs, frames['facilities_sql']))
+
+    move_out_df = cube.site_month()
+    end_date = move_out_df['date'].max().date()
+    start_date = (move_out_df['date'].max() - pd.DateOffset(months=3)).date()
+    bench('prep:HistogramPlot.prepare_histogram_data',
+          lambda: HistogramPlot().prepare_histogram_data(move_out_df.copy(), start_date, end_date))
+    # move-out forecasts: every site refitted per refresh, then the actual vs predicted scatter
+    forecasts = ForecastEngine.from_cube(cube)
+    scatter_month = forecasts.last_complete_month()
+    pred_moveouts_df = bench('prep:forecast_engine.predict', lambda: forecasts.predict(scatter_month))
+    if pred_moveouts_df is None:
+        pred_moveouts_df = forecasts.predict(scatter_month)
+    bench('prep:forecast_engine.backtest[12 months]', lambda: forecasts.backtest(12)[0])
+    bench('prep:ScatterPlot.prepare_scatter_data',
+          lambda: ScatterPlot().prepare_scatter_data(move_out_df, pred_moveouts_df, scatter_month))
+    bench('prep:SurvivalPlot.prepare_survival_data',
+          lambda: SurvivalPlot().prepare_survival_data(ecris, 'notification_date'))
+    # confidence bands: batched multinomial resamples, inline and forced onto the process pool
+    survival_index = SurvivalIndex(ecris, 'notification_date')
+    window = (ecris['notification_date'].min(), ecris['notification_date'].max())
+    bench('prep:SurvivalIndex.bands[200, 1 worker]', lambda: survival_index.bands(*window, n_resamples=200, workers=1))
+    bench(f'prep:SurvivalIndex.bands[200, {BOOTSTRAP_WORKERS} workers]',
+          lambda: survival_index.bands(*window, n_resamples=200, workers=BOOTSTRAP_WORKERS, min_pool_cells=0))
+    return results
+
+
+def compare(current, baseline):
+    """
+    Print best-time ratios of `current` against `baseline` (both result documents).
+    """
+    print(f"\n{'benchmark':<48}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<48}{'-':>12}{result['best']:>12.4f}{'-':>8}")
+            continue
+        ratio = result['best'] / base['best'] if base['best'] else float('nan')
+        print(f"{name:<48}{base['best']:>12.4f}{result['best']:>12.4f}{ratio:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--sites', type=int, help='Number of facilities (overrides --scale).')
+    parser.add_argument('--occupancies', type=int, help='Number of occupancies (overrides --scale).')
+    parser.add_argument('--ecri-rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dsn', default=os.environ.get('BENCH_PG_DSN'), help='Local Postgres DSN; DuckDB when omitted.')
+    parser.add_argument('--only', nargs='*', help='Benchmark names to run.')
+    parser.add_argument('--output', help='Result file. Defaults to benchmarks/results/<timestamp>.json.')
+    parser.add_argument('--compare', help='Baseline result file to compare against.')
+    args = parser.parse_args(argv)
+
+    n_sites, n_occupancies = SCALES[args.scale]
+    n_sites = args.sites or n_sites
+    n_occupancies = args.occupancies or n_occupancies
+    today = pd.Timestamp.now().normalize()
+
+    print(f'Generating {n_sites} sites / {n_occupancies:,} occupancies ...', flush=True)
+    tables = generate_tables(n_sites, n_occupancies, seed=args.seed, today=today)
+    ecris = generate_ecris(args.ecri_rows, seed=args.seed, today=today)
+
+    backend = PostgresBackend(tables, args.dsn) if args.dsn else DuckDBBackend(tables)
+    print(f'Loaded into {backend.name}; running benchmarks ({args.repeat} repeats)', flush=True)
+    try:
+        results = run_suite(backend, ecris, repeat=args.repeat, only=args.only)
+    finally:
+        backend.close()
+
+    document = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'backend': backend.name,
+            'sites': n_sites,
+            'occupancies': n_occupancies,
+            'ecri_rows': args.ecri_rows,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{document['meta']['timestamp'].replace(':', '')}_{n_sites}x{n_occupancies}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f'Wrote {output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(document, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
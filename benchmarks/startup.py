@@ -0,0 +1,131 @@
+"""
+Cold-import time of each page, checked against a startup budget.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 7 --profile
+
+A page's module-level imports are run in a fresh interpreter, as on a new
+replica's first page view. The median of `--repeat` runs is compared with the
+page's budget in PAGE_BUDGETS, and the exit status is non-zero when any page
+is over budget or fails to import. `--profile` adds the slowest top-level
+imports of each page (from `python -X importtime`).
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds of cold imports allowed per page (streamlit and pandas alone take about 0.8s)
+PAGE_BUDGETS = {
+    'Home.py': 1.5,
+    'pages/1. Move Ins.py': 2.0,
+    'pages/2. Move Outs.py': 2.0,
+    'pages/3. ECRIs.py': 2.0,
+}
+
+TIMER = """\
+import time
+_started = time.perf_counter()
+{imports}
+print(time.perf_counter() - _started)
+"""
+
+
+def page_imports(path):
+    """
+    Source of the import statements at the top level of the page script.
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def _run(imports, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', TIMER.format(imports=imports)]
+    env = {**os.environ, 'PYTHONPATH': ROOT}
+    return subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+
+
+def time_imports(imports, repeat=5):
+    """
+    Seconds taken by `imports` in each of `repeat` fresh interpreters.
+    """
+    seconds = []
+    for _ in range(repeat):
+        proc = _run(imports)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed')
+        seconds.append(float(proc.stdout.strip().splitlines()[-1]))
+    return seconds
+
+
+def slowest_imports(imports, top=8):
+    """
+    (module, cumulative seconds) of the slowest top-level imports, from `-X importtime`.
+    """
+    interpreter = {name for name, _ in _top_level(_run('', importtime=True).stderr)}
+    rows = [r for r in _top_level(_run(imports, importtime=True).stderr) if r[0] not in interpreter]
+    return sorted(rows, key=lambda r: r[1], reverse=True)[:top]
+
+
+def _top_level(importtime_log):
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # nested imports are indented under their parent
+            rows.append((name.strip(), int(cumulative) / 1e6))
+    return rows
+
+
+def check_budgets(budgets=PAGE_BUDGETS, repeat=5, profile=False):
+    """
+    Time every page against its budget and return {page: result}.
+    """
+    results = {}
+    for page, budget in budgets.items():
+        imports = page_imports(os.path.join(ROOT, page))
+        try:
+            seconds = time_imports(imports, repeat)
+        except RuntimeError as e:
+            results[page] = {'budget': budget, 'error': str(e), 'ok': False}
+            print(f'{page:<28}{budget:>8.2f}{"-":>10}  FAILED: {e}', flush=True)
+            continue
+        median = statistics.median(seconds)
+        results[page] = {
+            'budget': budget,
+            'seconds': [round(s, 4) for s in seconds],
+            'median': round(median, 4),
+            'ok': median <= budget,
+        }
+        print(f'{page:<28}{budget:>8.2f}{median:>10.3f}  {"ok" if median <= budget else "OVER BUDGET"}', flush=True)
+        if profile:
+            results[page]['slowest'] = slowest_imports(imports)
+            for name, cumulative in results[page]['slowest']:
+                print(f'    {name:<40}{cumulative:>8.3f}')
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--profile', action='store_true', help='List the slowest imports of each page.')
+    parser.add_argument('--output', help='Write the results as JSON.')
+    args = parser.parse_args(argv)
+
+    print(f"{'page':<28}{'budget':>8}{'median':>10}", flush=True)
+    results = check_budgets(repeat=args.repeat, profile=args.profile)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}, f, indent=2)
+    return 0 if all(r['ok'] for r in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Synthetic stand-ins for the production tables the app queries.
+
+Shapes and columns follow what `sql_queries` reads: facilities, units,
+occupancies, accounts, occupancy_groups, ledgers, plus the small dimension
+tables `facilities_sql` joins (regions, addresses, roles, users_roles, users).
+Everything is generated with vectorized NumPy from a seeded RNG, so a given
+(sites, occupancies, seed) always produces the same data.
+"""
+import numpy as np
+import pandas as pd
+
+HISTORY_START = pd.Timestamp('2013-03-01')
+WRITE_OFF_DESCRIPTIONS = np.array(['Write Off', 'write-off balance', 'Write off - Move Out', 'Late Fee', 'Rent'])
+MODELS = np.array(['control', 'model_a', 'model_b', 'model_c'])
+REGIONS = ['North', 'Central', 'South', 'East', 'West']
+
+
+def generate_tables(n_sites=50, n_occupancies=100_000, seed=0, today=None):
+    """
+    Build the synthetic tables.
+
+    Parameters:
+    - n_sites (int, optional): Number of facilities. Defaults to 50.
+    - n_occupancies (int, optional): Number of occupancies. Defaults to 100,000.
+    - seed (int, optional): RNG seed. Defaults to 0.
+    - today (Timestamp, optional): Upper bound for generated dates. Defaults to now.
+
+    Returns:
+    - tables (dict): Table name -> pd.DataFrame.
+    """
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp.now().normalize() if today is None else pd.Timestamp(today)
+    history_days = (today - HISTORY_START).days
+
+    # --- facilities and dimensions ---
+    facility_id = np.arange(1, n_sites + 1)
+    created_at = HISTORY_START + pd.to_timedelta(rng.integers(0, history_days - 365, n_sites), unit='D')
+    regions = pd.DataFrame({'id': np.arange(1, len(REGIONS) + 1), 'name': REGIONS})
+    facilities = pd.DataFrame({
+        'id': facility_id,
+        'site_code': [f'RD{i:03d}' for i in facility_id],
+        'created_at': created_at,
+        'fund': rng.integers(0, 10, n_sites),
+        'region_id': rng.integers(1, len(REGIONS) + 1, n_sites),
+    })
+    addresses = pd.DataFrame({
+        'addressable_id': facility_id,
+        'addressable_type': 'Facility',
+        'street': [f'{i} Main St' for i in facility_id],
+        'street_2': None,
+        'city': 'Springfield',
+        'state': 'CA',
+        'zip': '90000',
+        'lat': rng.uniform(32, 42, n_sites),
+        'lng': rng.uniform(-124, -114, n_sites),
+    })
+    users = pd.DataFrame({'id': facility_id, 'first_name': 'Site', 'last_name': [f'Supervisor{i}' for i in facility_id]})
+    roles = pd.DataFrame({'id': facility_id, 'resource_id': facility_id, 'resource_type': 'Facility', 'name': 'supervisor'})
+    users_roles = pd.DataFrame({'role_id': facility_id, 'user_id': facility_id})
+
+    # --- units: roughly one unit per three occupancies over the history ---
+    n_units = max(n_sites, n_occupancies // 3)
+    units = pd.DataFrame({
+        'id': np.arange(1, n_units + 1),
+        'facility_id': rng.integers(1, n_sites + 1, n_units),
+        'width': rng.choice([5, 10, 10, 10, 15, 20], n_units),
+        'length': rng.choice([5, 10, 10, 15, 20, 30], n_units),
+        'inactive': rng.random(n_units) < 0.02,
+    })
+
+    # --- accounts / groups / occupancies ---
+    n_groups = max(1, int(n_occupancies * 0.9))
+    n_accounts = max(1, int(n_groups * 0.85))
+    accounts = pd.DataFrame({'id': np.arange(1, n_accounts + 1)})
+    occupancy_groups = pd.DataFrame({
+        'id': np.arange(1, n_groups + 1),
+        'account_id': rng.integers(1, n_accounts + 1, n_groups),
+    })
+
+    move_in = pd.Series(HISTORY_START + pd.to_timedelta(rng.integers(0, history_days, n_occupancies), unit='D'))
+    stay_days = rng.exponential(420, n_occupancies).astype(np.int64) + 1
+    moved_out_at = move_in + pd.to_timedelta(stay_days, unit='D')
+    moved_out = (moved_out_at < today).to_numpy()
+    moved_out_at = moved_out_at.where(moved_out, pd.NaT)
+    last_change = moved_out_at.fillna(move_in)
+    occupancies = pd.DataFrame({
+        'id': np.arange(1, n_occupancies + 1),
+        'unit_id': rng.integers(1, n_units + 1, n_occupancies),
+        'occupancy_group_id': rng.integers(1, n_groups + 1, n_occupancies),
+        'move_in_date': move_in.dt.normalize(),
+        'moved_out_at': moved_out_at,
+        'moved_out': moved_out,
+        'monthly_rate': rng.uniform(40, 400, n_occupancies).round(2),
+        'auto_pay_id': np.where(rng.random(n_occupancies) < 0.4, rng.integers(1, 10**6, n_occupancies), None),
+        'insurance_id': np.where(rng.random(n_occupancies) < 0.5, rng.integers(1, 10**6, n_occupancies), None),
+        'updated_at': last_change + pd.to_timedelta(rng.integers(0, 86400, n_occupancies), unit='s'),
+    })
+
+    # --- ledgers: a few rows per occupancy, ~30% of them charge_type 7 ---
+    n_ledgers = n_occupancies * 3
+    ledgers = pd.DataFrame({
+        'id': np.arange(1, n_ledgers + 1),
+        'occupancy_id': rng.integers(1, n_occupancies + 1, n_ledgers),
+        'charge_type': np.where(rng.random(n_ledgers) < 0.3, 7, rng.integers(1, 7, n_ledgers)),
+        'description': rng.choice(WRITE_OFF_DESCRIPTIONS, n_ledgers),
+        'chg': -rng.uniform(0, 300, n_ledgers).round(2),
+    })
+
+    return {
+        'facilities': facilities,
+        'regions': regions,
+        'addresses': addresses,
+        'users': users,
+        'roles': roles,
+        'users_roles': users_roles,
+        'units': units,
+        'accounts': accounts,
+        'occupancy_groups': occupancy_groups,
+        'occupancies': occupancies,
+        'ledgers': ledgers,
+    }
+
+
+def generate_ecris(n_rows=100_000, n_models=len(MODELS), seed=0, today=None):
+    """
+    Synthetic `ecri/master_ecris.csv`-shaped frame for the survival benchmarks.
+    """
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp.now().normalize() if today is None else pd.Timestamp(today)
+    notification = pd.Series(today - pd.to_timedelta(rng.integers(0, 3 * 365, n_rows), unit='D'))
+    moved_out = notification + pd.to_timedelta(rng.exponential(200, n_rows).astype(np.int64), unit='D')
+    moved_out = moved_out.where(moved_out < today, pd.NaT)
+    models = np.array([f'model_{i}' for i in range(n_models)]) if n_models != len(MODELS) else MODELS
+    df = pd.DataFrame({
+        'notification_date': notification,
+        'increase_date': notification + pd.Timedelta(days=30),
+        'moved_out_date': moved_out,
+        'model': rng.choice(models, n_rows),
+        'ecri_pending': rng.random(n_rows) < 0.05,
+        'pending_increase_amount': rng.uniform(0, 50, n_rows).round(2),
+    })
+    df['event_occurred'] = df['moved_out_date'].notna().astype(int)
+    return df
@@ -0,0 +1,215 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from metrics_cube import filter_sites, site_dimensions
+from occupancy_engine import EPOCH
+from query_builder import facility_params
+from schemas import apply_schema
+from sql_queries import fetch_sql_query, occupancy_intervals
+
+# first cohort month; the arrays grow with the square of the months covered, so older
+# (or mistyped, e.g. 1900-01-01) move-in dates are left out rather than widening every cohort axis
+EARLIEST_COHORT = datetime.date(2010, 1, 1)
+
+def _months(epoch, days):
+    # day offsets from `epoch` -> months since 1970-01
+    return (epoch + days.astype('timedelta64[D]')).astype('datetime64[M]').astype(np.int64)
+
+
+class CohortEngine():
+    """
+    Move-in cohort retention: move-in month x tenure month, per site and for any set of sites.
+
+    Every occupancy is reduced to integer month offsets: its cohort (move-in month)
+    and the tenure month in which it is first no longer counted. A tenant counts
+    in the month they move out, as in the `occupants` query, so tenure month 0 is
+    100% except for occupancies whose move-out is dated before their move-in;
+    those leave at tenure 0, as `occupants` never counts them. Cohort sizes and departures are counted with one `np.bincount` each
+    into a (sites, cohorts, tenures) array, and the departures are accumulated
+    along the tenure axis once at construction. A filtered matrix is then a sum
+    over the selected sites, with no per-cohort loop.
+
+    Cells a cohort has not reached yet (cohort month + tenure after the current
+    month) are unobserved and come back as NaN. Move-ins before `earliest_cohort`
+    are left out.
+    """
+    def __init__(self, site_code, move_in_day, move_out_day, facilities, epoch=EPOCH, today=None,
+                 earliest_cohort=EARLIEST_COHORT):
+        """
+        Parameters:
+        - site_code (array-like): Site of each occupancy.
+        - move_in_day (array-like): Move-in day offset from `epoch`.
+        - move_out_day (array-like): Last occupied day offset, NaN if still occupied.
+        - facilities (pd.DataFrame): `facilities_sql` result, for the region/fund/same_store/fs filters.
+        - epoch (date, optional): Day 0 of the offsets.
+        - today (date, optional): Current month boundary for unobserved cells. Defaults to today.
+        - earliest_cohort (date, optional): First cohort month. Defaults to EARLIEST_COHORT.
+        """
+        epoch = np.datetime64(pd.Timestamp(epoch).date(), 'D')
+        move_in_day = pd.to_numeric(pd.Series(move_in_day), errors='coerce').to_numpy(dtype=np.float64)
+        move_out_day = pd.to_numeric(pd.Series(move_out_day), errors='coerce').to_numpy(dtype=np.float64)
+        valid = ~np.isnan(move_in_day) & ~pd.isnull(np.asarray(site_code, dtype=object))
+
+        codes, sites = pd.factorize(np.asarray(site_code, dtype=object)[valid], sort=True)
+        self.sites = pd.Index(sites)
+        in_month = _months(epoch, move_in_day[valid].astype(np.int64))
+        out_day = move_out_day[valid]
+        moved_out = ~np.isnan(out_day)
+        out_month = np.where(moved_out, _months(epoch, np.nan_to_num(out_day).astype(np.int64)), 0)
+
+        current = int(np.datetime64(pd.Timestamp(today or datetime.date.today()).date(), 'M').astype(np.int64))
+        earliest = int(np.datetime64(pd.Timestamp(earliest_cohort).date(), 'M').astype(np.int64))
+        # move-ins dated in the future are not a cohort yet
+        keep = (in_month >= earliest) & (in_month <= current)
+        first = int(in_month[keep].min()) if keep.any() else current
+        self.first_month = first
+        self.n_cohorts = n = current - first + 1
+        self.cohorts = pd.period_range(pd.Timestamp(np.datetime64(first, 'M')), periods=n, freq='M').to_timestamp()
+
+        cohort = (in_month - first)[keep]
+        site = codes[keep].astype(np.int64)
+        cell = site * n + cohort
+        n_sites = len(self.sites)
+        self.sizes = np.bincount(cell, minlength=n_sites * n).reshape(n_sites, n).astype(np.int32)
+
+        # first tenure month no longer counted; a move-out dated before its move-in leaves at tenure 0
+        gone = np.clip(out_month - in_month + 1, 0, None)[keep]
+        departs = moved_out[keep] & (gone < n)
+        departures = np.bincount(cell[departs] * n + gone[departs], minlength=n_sites * n * n)
+        self.departed = np.cumsum(departures.reshape(n_sites, n, n), axis=2, dtype=np.int32)
+
+        # cohort c has been observed through tenure n - 1 - c
+        self.observed = np.arange(n)[:, None] + np.arange(n)[None, :] < n
+        self.dims = site_dimensions(self.sites, facilities)
+
+    @classmethod
+    def from_frame(cls, df, facilities, epoch=EPOCH, today=None, earliest_cohort=EARLIEST_COHORT):
+        return cls(df['site_code'], df['move_in_day'], df['move_out_day'], facilities, epoch=epoch, today=today,
+                   earliest_cohort=earliest_cohort)
+
+    def site_mask(self, region=None, fund=None, same_store=None, fs=None, site_codes=None):
+        """
+        Boolean mask over `self.sites`. Each filter takes a single value or a list; None means no filter.
+        """
+        return filter_sites(self.dims, region, fund, same_store, fs, site_codes)
+
+    def _cohort_slice(self, start=None, end=None):
+        lo = 0 if start is None else max(0, int(self.cohorts.searchsorted(pd.Timestamp(start).to_period('M').to_timestamp())))
+        hi = self.n_cohorts if end is None else int(self.cohorts.searchsorted(pd.Timestamp(end).to_period('M').to_timestamp(), side='right'))
+        return slice(lo, max(lo, hi))
+
+    def counts(self, **filters):
+        """
+        Cohort sizes (cohorts,) and tenants still counted (cohorts, tenures) for the filtered sites.
+        """
+        mask = self.site_mask(**filters)
+        sizes = self.sizes[mask].sum(axis=0, dtype=np.int64)
+        # weighted sum over the site axis rather than copying the selected sites out first
+        departed = np.tensordot(mask.astype(np.int64), self.departed, axes=1)
+        retained = sizes[:, None] - departed
+        return sizes, retained
+
+    def retention_matrix(self, start=None, end=None, max_tenure=None, **filters):
+        """
+        % of each move-in cohort still counted at each tenure month.
+
+        Parameters:
+        - start (date, optional): First cohort month. Defaults to the first move-in.
+        - end (date, optional): Last cohort month. Defaults to the current month.
+        - max_tenure (int, optional): Last tenure month shown. Defaults to the full history.
+        - **filters: `site_mask` filters (region, fund, same_store, fs, site_codes).
+
+        Returns:
+        - matrix (pd.DataFrame): Cohort months (index) x tenure months (columns);
+          NaN where a cohort has not reached the tenure. Cohorts without move-ins are left out.
+        """
+        sizes, retained = self.counts(**filters)
+        rows = self._cohort_slice(start, end)
+        cols = slice(0, self.n_cohorts if max_tenure is None else max_tenure + 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.round(100 * retained / sizes[:, None], 2)
+        pct = np.where(self.observed & (sizes[:, None] > 0), pct, np.nan)[rows, cols]
+        matrix = pd.DataFrame(pct, index=pd.Index(self.cohorts[rows], name='cohort'),
+                              columns=pd.RangeIndex(pct.shape[1], name='tenure'))
+        matrix.insert(0, 'move_ins', sizes[rows])
+        return matrix[matrix['move_ins'] > 0]
+
+    def matrix_frame(self, start=None, end=None, max_tenure=None, **filters):
+        """
+        `retention_matrix` in long form (cohort, tenure, move_ins, % retained) for heatmaps, observed cells only.
+        """
+        matrix = self.retention_matrix(start, end, max_tenure, **filters)
+        df = matrix.reset_index().melt(id_vars=['cohort', 'move_ins'], var_name='tenure', value_name='% retained')
+        return df.dropna(subset=['% retained']).reset_index(drop=True)
+
+    def retention_curve(self, start=None, end=None, max_tenure=None, by=None, **filters):
+        """
+        Retention by tenure pooled over the cohorts in [start, end]: tenants still counted over
+        move-ins, using at each tenure only the cohorts that have reached it.
+
+        Parameters:
+        - start, end, max_tenure, **filters: As in `retention_matrix`.
+        - by (str, optional): 'year' gives one curve per move-in year. Defaults to a single curve.
+
+        Returns:
+        - df (pd.DataFrame): tenure, cohorts ('All' or the year), move_ins, retained and % retained.
+        """
+        sizes, retained = self.counts(**filters)
+        rows = self._cohort_slice(start, end)
+        n_tenures = self.n_cohorts if max_tenure is None else max_tenure + 1
+        observed = self.observed[rows, :n_tenures]
+        at_risk = np.where(observed, sizes[rows, None], 0)
+        kept = np.where(observed, retained[rows, :n_tenures], 0)
+
+        if by is None:
+            labels = np.zeros(at_risk.shape[0], dtype=np.int64)
+            names = ['All']
+        elif by == 'year':
+            years = self.cohorts[rows].year.to_numpy()
+            labels, names = pd.factorize(years, sort=True)
+        else:
+            raise ValueError(f"by must be None or 'year', got {by!r}")
+
+        # per-group sums over cohorts: one bincount per quantity on (group, tenure) cells
+        n_groups = len(names)
+        idx = (labels[:, None] * n_tenures + np.arange(n_tenures)[None, :]).ravel()
+        at_risk = np.bincount(idx, weights=at_risk.ravel(), minlength=n_groups * n_tenures).reshape(n_groups, n_tenures)
+        kept = np.bincount(idx, weights=kept.ravel(), minlength=n_groups * n_tenures).reshape(n_groups, n_tenures)
+
+        df = pd.DataFrame({
+            'tenure': np.tile(np.arange(n_tenures), n_groups),
+            'cohorts': np.repeat(np.asarray(names).astype(str), n_tenures),
+            'move_ins': at_risk.ravel().astype(np.int64),
+            'retained': kept.ravel().astype(np.int64),
+        })
+        df = df[df['move_ins'] > 0].reset_index(drop=True)
+        df['% retained'] = np.round(100 * df['retained'] / df['move_ins'], 2)
+        return df
+
+    def site_retention(self, tenure, start=None, end=None, **filters):
+        """
+        Pooled % retained at `tenure` months for each filtered site (cohorts in [start, end] that reached it).
+        """
+        mask = self.site_mask(**filters)
+        rows = self._cohort_slice(start, end)
+        reached = self.observed[rows, tenure]
+        sizes = self.sizes[mask][:, rows]
+        at_risk = np.where(reached, sizes, 0).sum(axis=1)
+        kept = np.where(reached, sizes - self.departed[:, rows, tenure][mask], 0).sum(axis=1)
+        df = pd.DataFrame({'site_code': np.asarray(self.sites)[mask], 'move_ins': at_risk, 'retained': kept})
+        df = df[df['move_ins'] > 0].reset_index(drop=True)
+        df['% retained'] = np.round(100 * df['retained'] / df['move_ins'], 2)
+        return df
+
+    def options(self, dim):
+        return sorted(self.dims[dim].unique().tolist())
+
+
+def fetch_occupancy_intervals(epoch=EPOCH):
+    """
+    Every occupancy as (site_code, move_in_day, move_out_day, area) day offsets from `epoch`,
+    with the compact dtypes of its schema.
+    """
+    params = {'epoch': epoch.isoformat(), **facility_params()}
+    return apply_schema(fetch_sql_query(occupancy_intervals, params), 'occupancy_intervals')
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: pick `n_out` points that preserve the visual shape of a line.
+
+    The first and last points are always kept. The rest of the series is split
+    into `n_out - 2` buckets, and from each bucket the point forming the largest
+    triangle with the previously kept point and the mean of the next bucket is
+    chosen.
+
+    Parameters:
+    - x (np.ndarray): Sorted x values.
+    - y (np.ndarray): y values.
+    - n_out (int): Number of points to keep.
+
+    Returns:
+    - idx (np.ndarray): Indices of the kept points, ascending.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n) if n_out >= n else np.array([0, n - 1])[:max(n_out, 0)]
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_lo, next_hi = hi, max(edges[i + 2] if i + 2 < len(edges) else n, hi + 1)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def downsample_frame(data, x_field, y_field, group_field=None, max_points=None):
+    """
+    Shrink a long-form frame to at most `max_points` rows, split evenly across series.
+
+    Parameters:
+    - data (pd.DataFrame): Long-form line data.
+    - x_field (str): Column on the x axis.
+    - y_field (str): Column on the y axis.
+    - group_field (str, optional): Column identifying each series.
+    - max_points (int, optional): Row budget for the whole chart. None keeps every row.
+
+    Returns:
+    - data (pd.DataFrame): Downsampled frame (the input when already within budget).
+    """
+    if max_points is None or len(data) <= max_points:
+        return data
+
+    groups = [data] if group_field is None else [g for _, g in data.groupby(group_field, sort=False, observed=True)]
+    per_series = max(3, max_points // len(groups))
+    kept = []
+    for series in groups:
+        series = series.sort_values(x_field)
+        idx = lttb_indices(series[x_field].to_numpy(), series[y_field].to_numpy(), per_series)
+        kept.append(series.iloc[idx])
+    return pd.concat(kept, ignore_index=True)
@@ -0,0 +1,210 @@
+import gzip
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from instrumentation import note, span
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'exports')
+EXPORT_TTL = 60*60*24  # matches the daily data refresh
+CHUNK_ROWS = 100_000
+EXCEL_MAX_ROWS = 1_048_575  # sheet limit less the header row
+
+
+def _write_csv_gz(df, path):
+    # compressed chunk by chunk, the full CSV text never exists in memory
+    with gzip.open(path, 'wt', newline='', compresslevel=6) as f:
+        for start in range(0, max(len(df), 1), CHUNK_ROWS):
+            df.iloc[start:start + CHUNK_ROWS].to_csv(f, index=False, header=start == 0)
+
+
+def _write_parquet(df, path):
+    writer = None
+    try:
+        for start in range(0, max(len(df), 1), CHUNK_ROWS):
+            table = pa.Table.from_pandas(df.iloc[start:start + CHUNK_ROWS], preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(df, path):
+    if len(df) > EXCEL_MAX_ROWS:
+        raise ValueError(f'{len(df):,} rows do not fit in one Excel sheet; use CSV or Parquet.')
+    # Excel has no timezone support
+    tz_columns = [c for c, t in df.dtypes.items() if isinstance(t, pd.DatetimeTZDtype)]
+    if tz_columns:
+        df = df.assign(**{c: df[c].dt.tz_localize(None) for c in tz_columns})
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for start in range(0, max(len(df), 1), CHUNK_ROWS):
+            df.iloc[start:start + CHUNK_ROWS].to_excel(writer, index=False, header=start == 0,
+                                                       startrow=start + 1 if start else 0)
+
+
+FORMATS = {
+    'CSV (gzip)': {'extension': 'csv.gz', 'mime': 'application/gzip', 'write': _write_csv_gz},
+    'Parquet': {'extension': 'parquet', 'mime': 'application/vnd.apache.parquet', 'write': _write_parquet},
+    'Excel': {'extension': 'xlsx', 'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+              'write': _write_xlsx, 'requires': 'openpyxl'},
+}
+
+
+def available_formats():
+    """
+    Export formats whose optional dependencies are installed.
+    """
+    return [name for name, spec in FORMATS.items()
+            if spec.get('requires') is None or importlib.util.find_spec(spec['requires']) is not None]
+
+
+def export_key(name, filters, version, fmt):
+    """
+    Fingerprint of an export: dataset name, filter values, data version and format.
+
+    Parameters:
+    - name (str): Dataset name, e.g. 'ecris'.
+    - filters (dict): Filter values that produced the frame (dates, regions, ...).
+    - version (str): Token that changes when the underlying data is refreshed.
+    - fmt (str): Key of FORMATS.
+
+    Returns:
+    - key (str): Hex digest naming the export file.
+    """
+    payload = json.dumps({'name': name, 'filters': filters, 'version': version, 'format': fmt}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class ExportCache():
+    """
+    Export files built on demand and kept on local disk by filter fingerprint.
+
+    Nothing is serialized until an export is requested. The file is then written
+    in chunks of CHUNK_ROWS rows to a temp path and swapped in, and every later
+    request for the same dataset, filters, data version and format is served
+    from disk. Files older than the TTL are rebuilt and pruned.
+    """
+    def __init__(self, cache_dir=EXPORT_DIR, ttl=EXPORT_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, key, fmt):
+        return os.path.join(self.cache_dir, f"{key}.{FORMATS[fmt]['extension']}")
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key, fmt):
+        """
+        Path of a fresh export for `key`, or None if it has not been built or has expired.
+        """
+        path = self.path(key, fmt)
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+        return path if self.ttl is None or age <= self.ttl else None
+
+    def build(self, key, fmt, df):
+        """
+        Write `df` in format `fmt` under `key` (unless another thread just did) and return its path.
+        """
+        with self._lock_for(key):
+            path = self.get(key, fmt)
+            if path is not None:
+                note(cache='disk')
+                return path
+            path = self.path(key, fmt)
+            # temp name keeps the extension, the Excel writer picks its format from it
+            tmp_path = self.path(f'{key}.{os.getpid()}.{threading.get_ident()}.tmp', fmt)
+            with span(f'export:{fmt}', rows=len(df)):
+                try:
+                    FORMATS[fmt]['write'](df, tmp_path)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                note(cache='miss', bytes=os.path.getsize(path))
+        self.prune()
+        return path
+
+    def prune(self):
+        """
+        Remove expired exports.
+        """
+        if self.ttl is None:
+            return
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if '.tmp.' not in name and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+_default_cache = None
+_default_cache_guard = threading.Lock()
+
+
+def get_export_cache():
+    global _default_cache
+    with _default_cache_guard:
+        if _default_cache is None:
+            _default_cache = ExportCache()
+        return _default_cache
+
+
+def export_button(name, df, filters, version, file_stem, key=None):
+    """
+    Download widget that only serializes `df` when the user asks for a file.
+
+    A format is picked first; the file is built when "Prepare download" is
+    clicked (or found already built for the same filters and data version).
+    st.download_button reads the whole file and sends it with the page, so the
+    download button is only rendered in the rerun of that click, not on every
+    rerun once a file exists.
+
+    Parameters:
+    - name (str): Dataset name, part of the export fingerprint.
+    - df (pd.DataFrame | callable): Frame to export, or a function returning it so
+      that even the filtered frame is only built on demand.
+    - filters (dict): Filter values that produced the frame.
+    - version (str): Data version token (e.g. an S3 ETag or a build time).
+    - file_stem (str): Download file name without extension.
+    - key (str, optional): Widget key prefix. Defaults to `name`.
+    """
+    key = key or name
+    formats = available_formats()
+    fmt = st.selectbox('Format', formats, key=f'{key}_export_format')
+    export_cache = get_export_cache()
+    fingerprint = export_key(name, filters, version, fmt)
+    if not st.button('Prepare download', key=f'{key}_export_prepare'):
+        return
+    path = export_cache.get(fingerprint, fmt)
+    if path is None:
+        try:
+            path = export_cache.build(fingerprint, fmt, df() if callable(df) else df)
+        except ValueError as e:
+            st.warning(str(e))
+            return
+    with open(path, 'rb') as f:
+        st.download_button('Download Data', data=f, file_name=f"{file_stem}.{FORMATS[fmt]['extension']}",
+                           mime=FORMATS[fmt]['mime'], key=f'{key}_export_download')
@@ -0,0 +1,208 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from instrumentation import note, span
+from metrics_cube import MEASURES
+from schemas import site_code_dtype
+
+HISTORY_MONTHS = 36  # months before the forecast month each fit uses
+BACKTEST_MONTHS = 12
+SHRINKAGE = 2.0  # weight of the portfolio fit, in months of a site's own occupants
+INTERCEPT_PRIOR = 1e-3  # keeps sites without history on the portfolio rate
+
+
+class ForecastEngine():
+    """
+    Move-out forecasts for every site at once from a site x month matrix.
+
+    Each site's monthly move-out rate (move outs / occupants) is fitted as an
+    intercept, a linear trend and month-of-year effects, weighted by its
+    occupants, and the forecast is that rate times the month's occupants. All
+    sites share one design matrix, so the weighted normal equations of every site
+    are built with one matmul and solved together with `np.linalg.solve`.
+
+    Site coefficients are shrunk toward the fit of the pooled portfolio, with a
+    weight of SHRINKAGE months of the site's own occupants. Sites with a short or
+    empty history fall back on the portfolio trend and seasonality rather than
+    making the system singular.
+
+    A forecast for a month only uses the HISTORY_MONTHS before it, so `predict`
+    on a past month and `backtest` are out of sample.
+    """
+    def __init__(self, sites, dates, move_outs, occupants, history=HISTORY_MONTHS, shrinkage=SHRINKAGE, today=None):
+        """
+        Parameters:
+        - sites (array-like): Site codes, one per row.
+        - dates (array-like): Month-end dates, one per column.
+        - move_outs (np.ndarray): (sites, months) move outs.
+        - occupants (np.ndarray): (sites, months) occupants.
+        - history (int, optional): Months each fit uses.
+        - shrinkage (float, optional): Weight of the portfolio fit (see class docstring).
+        - today (date, optional): Months ending on or after it are incomplete. Defaults to today.
+        """
+        self.sites = pd.Index(np.asarray(sites, dtype=object))
+        self.site_dtype = site_code_dtype(self.sites)
+        self.history = history
+        self.shrinkage = shrinkage
+
+        # one column per calendar month, so window offsets are month offsets
+        dates = pd.DatetimeIndex(dates).to_period('M')
+        months = pd.period_range(dates.min(), dates.max(), freq='M') if len(dates) else pd.PeriodIndex([], freq='M')
+        columns = months.get_indexer(dates)
+        self.dates = months.to_timestamp(how='end').normalize()
+        self.move_outs = np.zeros((len(self.sites), len(months)))
+        self.occupants = np.zeros((len(self.sites), len(months)))
+        self.move_outs[:, columns] = np.nan_to_num(np.asarray(move_outs, dtype=np.float64))
+        self.occupants[:, columns] = np.nan_to_num(np.asarray(occupants, dtype=np.float64))
+
+        self.month_number = (months.year * 12 + months.month - 1).to_numpy() if len(months) else np.zeros(0, dtype=np.int64)
+        current = pd.Timestamp(today or datetime.date.today()).to_period('M')
+        self.complete = (months < current) if len(months) else np.zeros(0, dtype=bool)
+
+    @classmethod
+    def from_cube(cls, cube, **kwargs):
+        """
+        Engine over the `move_outs` and `occupants` measures of a MetricsCube.
+        """
+        return cls(cube.sites, cube.dates, cube.values[:, :, MEASURES.index('move_outs')],
+                   cube.values[:, :, MEASURES.index('occupants')], **kwargs)
+
+    def design(self, columns, origin):
+        """
+        (len(columns), 13) design matrix: intercept, trend in years from `origin`, and
+        February-December indicators (January is the baseline).
+        """
+        month_number = self.month_number[columns]
+        month_of_year = month_number % 12
+        X = np.zeros((len(columns), 13))
+        X[:, 0] = 1.0
+        X[:, 1] = (month_number - self.month_number[origin]) / 12
+        seasonal = month_of_year > 0
+        X[np.flatnonzero(seasonal), 1 + month_of_year[seasonal]] = 1.0
+        return X
+
+    def fit(self, origin):
+        """
+        Coefficients of every site fitted on the `history` months before column `origin`.
+
+        Returns:
+        - coefficients (np.ndarray): (sites, 13), in the columns of `design`.
+        """
+        window = np.arange(max(0, origin - self.history), origin)
+        X = self.design(window, origin)
+        weights = self.occupants[:, window]
+        # the rate's weighted residuals are move_outs - occupants * rate, so X'Wy is X' move_outs
+        # X'W_sX for every site as one matmul: site weights times each month's outer product
+        outer = (X[:, :, None] * X[:, None, :]).reshape(len(window), -1)
+        A = (weights @ outer).reshape(len(self.sites), X.shape[1], X.shape[1])
+        b = self.move_outs[:, window] @ X
+
+        penalty = np.ones(X.shape[1])
+        penalty[0] = INTERCEPT_PRIOR
+        pooled = np.linalg.solve(A.sum(axis=0) + np.diag(penalty), b.sum(axis=0))
+
+        mean_occupants = weights.mean(axis=1) if len(window) else np.zeros(len(self.sites))
+        strength = self.shrinkage * np.maximum(mean_occupants, 1.0)
+        prior = strength[:, None, None] * np.diag(penalty)
+        return np.linalg.solve(A + prior, (b + (prior @ pooled))[..., None])[..., 0]
+
+    def month_column(self, month):
+        """
+        Column of the month containing `month`.
+        """
+        return int(self.dates.to_period('M').get_loc(pd.Timestamp(month).to_period('M')))
+
+    def predict_column(self, origin):
+        """
+        (sites,) predicted move outs for column `origin`, from the months before it.
+        """
+        rates = self.design(np.array([origin]), origin)[0] @ self.fit(origin).T
+        return np.clip(rates, 0, None) * self.occupants[:, origin]
+
+    def predict(self, month):
+        """
+        Predicted move outs per site for the month containing `month`, fitted on the
+        HISTORY_MONTHS before it.
+
+        Parameters:
+        - month (date): Any date in the forecast month.
+
+        Returns:
+        - pred_moveouts_df (pd.DataFrame): site_code (shared categorical dtype), occupants,
+          predicted_moveouts and predicted_rate (%), for sites with occupants that month.
+        """
+        origin = self.month_column(month)
+        with span('forecast.predict', sites=len(self.sites)):
+            predicted = self.predict_column(origin)
+        occupied = self.occupants[:, origin] > 0
+        df = pd.DataFrame({
+            'site_code': pd.Categorical(self.sites[occupied], dtype=self.site_dtype),
+            'occupants': self.occupants[occupied, origin].astype(np.int64),
+            'predicted_moveouts': np.round(predicted[occupied], 2),
+        })
+        df['predicted_rate'] = np.round(100 * df['predicted_moveouts'] / df['occupants'], 2)
+        return df
+
+    def last_complete_month(self, before=None):
+        """
+        Month-end date of the latest complete month, on or before `before` if given.
+        """
+        complete = self.dates[self.complete]
+        if before is not None:
+            complete = complete[complete <= pd.Timestamp(before)]
+        return complete[-1] if len(complete) else None
+
+    def backtest(self, months=BACKTEST_MONTHS):
+        """
+        Forecast each of the last `months` complete months from the months before it and
+        compare with the actual move outs.
+
+        Each month is compared with a seasonal naive forecast as well: the site's
+        rate in the same month a year earlier, times this month's occupants.
+
+        Returns:
+        - site_errors (pd.DataFrame): site_code, actual, predicted, mae and wape per site over the backtest.
+        - summary (dict): months, mae, rmse, wape, bias and naive_wape over every site-month.
+        """
+        origins = np.flatnonzero(self.complete)[-months:]
+        origins = origins[origins > 0]
+        actual = self.move_outs[:, origins]
+        exposure = self.occupants[:, origins]
+        with span('forecast.backtest', months=len(origins), sites=len(self.sites)):
+            predicted = np.stack([self.predict_column(o) for o in origins], axis=1) if len(origins) else np.zeros_like(actual)
+        note(rows_out=actual.size)
+
+        last_year = origins - 12
+        with np.errstate(divide='ignore', invalid='ignore'):
+            naive_rate = np.where(last_year >= 0, self.move_outs[:, np.maximum(last_year, 0)] / self.occupants[:, np.maximum(last_year, 0)], np.nan)
+        naive = np.nan_to_num(naive_rate, posinf=0.0) * exposure
+
+        seen = exposure > 0
+        errors = np.where(seen, predicted - actual, 0.0)
+        naive_errors = np.where(seen & (last_year >= 0), naive - actual, 0.0)
+        total = actual[seen].sum()
+
+        def ratio(num, den):
+            return float(num / den) if den else float('nan')
+
+        summary = {
+            'months': len(origins),
+            'mae': ratio(np.abs(errors).sum(), seen.sum()),
+            'rmse': float(np.sqrt(ratio((errors ** 2).sum(), seen.sum()))),
+            'wape': ratio(np.abs(errors).sum(), total),
+            'bias': ratio(errors.sum(), total),
+            'naive_wape': ratio(np.abs(naive_errors).sum(), actual[seen & (last_year >= 0)].sum()),
+        }
+
+        site_actual = np.where(seen, actual, 0.0).sum(axis=1)
+        site_months = seen.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            site_errors = pd.DataFrame({
+                'site_code': pd.Categorical(self.sites, dtype=self.site_dtype),
+                'actual': site_actual,
+                'predicted': np.round(np.where(seen, predicted, 0.0).sum(axis=1), 2),
+                'mae': np.round(np.abs(errors).sum(axis=1) / site_months, 2),
+                'wape': np.round(np.abs(errors).sum(axis=1) / site_actual, 4),
+            })
+        return site_errors[site_months > 0].reset_index(drop=True), summary
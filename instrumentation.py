@@ -0,0 +1,200 @@
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger('perf')
+
+MAX_RECORDS = 1000
+
+_records = deque(maxlen=MAX_RECORDS)
+_records_guard = threading.Lock()
+_current = contextvars.ContextVar('perf_span', default=None)
+
+
+def _session_id():
+    # the Streamlit session of the current thread (dataset loader threads carry the page's context)
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+def _row_count(value):
+    if isinstance(value, pd.DataFrame) or hasattr(value, 'num_rows'):
+        return len(value)
+    return None
+
+
+@contextmanager
+def span(name, **fields):
+    """
+    Time a block and record it.
+
+    The yielded dict can be annotated inside the block (or through `note` from
+    any function called within it) with `rows_in`, `rows_out`, `cache` and
+    `bytes`. On exit the record is kept for the debug panel and written to the
+    `perf` logger as one JSON line. Records carry the Streamlit session they ran
+    in, so a session's panel only shows its own spans.
+    """
+    record = {'name': name, 'started_at': time.time(), 'thread': threading.current_thread().name,
+              'session': _session_id(), 'rows_in': None, 'rows_out': None, 'cache': None, 'bytes': None,
+              'error': None}
+    record.update(fields)
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = repr(e)
+        raise
+    finally:
+        record['wall_ms'] = round(1000 * (time.perf_counter() - start), 2)
+        _current.reset(token)
+        with _records_guard:
+            _records.append(record)
+        logger.info(json.dumps(record, default=str))
+
+
+def note(**fields):
+    """
+    Annotate the innermost open span (e.g. `note(cache='hit')`). No-op outside a span.
+    """
+    record = _current.get()
+    if record is not None:
+        for key, value in fields.items():
+            if key == 'bytes' and record.get('bytes'):
+                value += record['bytes']
+            record[key] = value
+
+
+def timed(name=None, cache_default=None):
+    """
+    Decorator recording wall time and row counts of each call.
+
+    `rows_in` is taken from the first DataFrame argument and `rows_out` from a
+    DataFrame/Arrow result (or what the call noted, e.g. the rows a chart drew). `cache_default` is stored when nothing inside the call
+    reported a cache status (e.g. 'memory' for a function whose st.cache_data
+    layer answered without running the body).
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label) as record:
+                for arg in list(args) + list(kwargs.values()):
+                    rows = _row_count(arg)
+                    if rows is not None:
+                        record['rows_in'] = rows
+                        break
+                result = func(*args, **kwargs)
+                rows = _row_count(result)
+                if rows is not None:
+                    record['rows_out'] = rows
+                if record['cache'] is None:
+                    record['cache'] = cache_default
+                return result
+        return wrapper
+    return decorator
+
+
+def records(since=None, session=None):
+    """
+    Recorded spans as a DataFrame, optionally only those started at or after `since` (epoch seconds)
+    and only those of Streamlit session `session`.
+    """
+    with _records_guard:
+        rows = [r for r in _records if session is None or r.get('session') == session]
+    df = pd.DataFrame(rows)
+    if since is not None and len(df):
+        df = df[df['started_at'] >= since]
+    return df
+
+
+class RerunProfiler():
+    """
+    Profile code between `start()` and `stop()` with pyinstrument when installed,
+    else cProfile. `stop()` returns a text report.
+    """
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._kind = 'pyinstrument'
+        except ImportError:
+            self._profiler = cProfile.Profile()
+            self._kind = 'cprofile'
+
+    def start(self):
+        if self._kind == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if self._kind == 'pyinstrument':
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=False, color=False)
+        self._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(40)
+        return out.getvalue()
+
+
+def begin_page_run(page_name):
+    """
+    Call at the top of a page. Starts timing the rerun and, when an admin asked
+    for it, a profile of this one rerun. Pass the result to `end_page_run`.
+    """
+    run = {'page': page_name, 'started_at': time.time(), 'start': time.perf_counter(), 'profiler': None}
+    if st.session_state.get('valid_password') and st.session_state.pop('perf_profile_next', False):
+        run['profiler'] = RerunProfiler()
+        run['profiler'].start()
+    return run
+
+
+def end_page_run(run):
+    """
+    Call at the bottom of a page. Records the rerun and shows the admin-only performance panel.
+    """
+    report = run['profiler'].stop() if run['profiler'] is not None else None
+    session = _session_id()
+    record = {'name': f"page:{run['page']}", 'started_at': run['started_at'],
+              'thread': threading.current_thread().name, 'session': session, 'rows_in': None, 'rows_out': None,
+              'cache': None, 'bytes': None, 'error': None,
+              'wall_ms': round(1000 * (time.perf_counter() - run['start']), 2)}
+    with _records_guard:
+        _records.append(record)
+    logger.info(json.dumps(record, default=str))
+
+    if st.session_state.get('valid_password'):
+        render_perf_panel(run['started_at'], report, session)
+
+
+def render_perf_panel(since, profile_report=None, session=None):
+    """
+    Sidebar table of the spans recorded since `since` in session `session` (all sessions
+    if None), slowest first, plus an optional profile.
+    """
+    with st.sidebar.expander('Performance'):
+        df = records(since, session)
+        if len(df):
+            cols = ['name', 'wall_ms', 'rows_in', 'rows_out', 'cache', 'bytes', 'error', 'thread']
+            st.dataframe(df[cols].sort_values('wall_ms', ascending=False), hide_index=True)
+        if st.button('Profile next rerun'):
+            st.session_state['perf_profile_next'] = True
+        if profile_report:
+            st.code(profile_report)
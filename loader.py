@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import pandas as pd
+from schemas import SCHEMAS, apply_schema
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 8  # threads per page load
+DEFAULT_TIMEOUT = 120  # seconds
+
+
+class Dataset():
+    """
+    A dataset a page needs, declared up front so it can be fetched alongside the others.
+
+    Parameters:
+    - name (str): Key the result is returned under.
+    - fetch (callable): Function returning the data.
+    - args (tuple, optional): Positional arguments for `fetch`.
+    - kwargs (dict, optional): Keyword arguments for `fetch`.
+    - timeout (float, optional): Seconds to wait for this dataset. Defaults to DEFAULT_TIMEOUT.
+    - schema (str, optional): SCHEMAS entry applied to the result. Defaults to `name` when it has one.
+    """
+    def __init__(self, name, fetch, args=(), kwargs=None, timeout=DEFAULT_TIMEOUT, schema=None):
+        self.name = name
+        self.fetch = fetch
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.timeout = timeout
+        self.schema = schema or (name if name in SCHEMAS else None)
+
+
+class LoadResult():
+    """
+    Outcome of `load_datasets`: `data` holds successful results, `errors` the
+    exception for every dataset that failed or timed out, `timings` wall seconds.
+    """
+    def __init__(self):
+        self.data = {}
+        self.errors = {}
+        self.timings = {}
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def get(self, name, default=None):
+        return self.data.get(name, default)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def _script_run_ctx():
+    # Streamlit caching and widgets look up the script context of the current thread
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    return get_script_run_ctx(suppress_warning=True)
+
+
+def _run(dataset, ctx):
+    if ctx is not None:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx
+        add_script_run_ctx(threading.current_thread(), ctx)
+    start = time.perf_counter()
+    try:
+        data = dataset.fetch(*dataset.args, **dataset.kwargs)
+        if dataset.schema is not None and isinstance(data, pd.DataFrame):
+            data = apply_schema(data, dataset.schema)
+        return data
+    finally:
+        logger.info('Loaded dataset %s in %.3fs', dataset.name, time.perf_counter() - start)
+
+
+def load_datasets(datasets, executor=None):
+    """
+    Fetch several datasets concurrently, on a thread pool of this call's own.
+
+    Fetches are I/O bound (Postgres, S3), so threads overlap the waits without
+    extra processes. A dataset that raises or exceeds its timeout is recorded in
+    `errors` and does not affect the others, so a page can render whatever did
+    load. A fetch that times out cannot be interrupted and keeps its thread until
+    it returns; as the pool belongs to this page run, it never holds up the loads
+    of later runs. DataFrame results are converted to their declared compact
+    dtypes (see schemas.SCHEMAS).
+
+    Parameters:
+    - datasets (list[Dataset]): Datasets the page needs.
+    - executor (Executor, optional): Pool to run on instead, left running. Defaults to
+      a new pool of up to MAX_WORKERS threads, shut down when the call returns.
+
+    Returns:
+    - result (LoadResult): Loaded data, errors and timings keyed by dataset name.
+    """
+    owned = executor is None
+    if owned:
+        executor = ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(datasets))),
+                                      thread_name_prefix='dataset-loader')
+    ctx = _script_run_ctx()
+    submitted = time.perf_counter()
+    futures = {d.name: (d, executor.submit(_run, d, ctx)) for d in datasets}
+
+    result = LoadResult()
+    try:
+        for name, (dataset, future) in futures.items():
+            # every timeout is measured from submission, not from when we start waiting on it
+            remaining = max(0, dataset.timeout - (time.perf_counter() - submitted))
+            try:
+                result.data[name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                result.errors[name] = TimeoutError(f'{name} did not load within {dataset.timeout}s')
+            except Exception as e:
+                result.errors[name] = e
+            result.timings[name] = time.perf_counter() - submitted
+            if name in result.errors:
+                logger.warning('Dataset %s failed: %r', name, result.errors[name])
+    finally:
+        if owned:
+            # don't wait on fetches that timed out; their threads exit once the fetch returns
+            executor.shutdown(wait=False, cancel_futures=True)
+    return result
@@ -0,0 +1,164 @@
+import time
+
+import numpy as np
+import pandas as pd
+from schemas import align_site_codes, site_code_dtype
+
+MEASURES = ['occupants', 'move_outs', 'area_move_out', 'move_out_rate']
+ROLLUP_DIMENSIONS = ['region', 'fund', 'same_store']
+SITE_DIMENSIONS = ['region', 'fund', 'same_store', 'fs']
+
+
+def site_dimensions(sites, facilities):
+    """
+    `facilities_sql` dimensions (region, fund, same_store, fs) for each of `sites`, indexed by site_code.
+    Sites missing from `facilities` fall under 'Unknown'.
+    """
+    dims = facilities.rename(columns={'rd': 'site_code'}).drop_duplicates('site_code')
+    dims = dims.set_index(dims['site_code'].astype(object)).reindex(pd.Index(sites, name='site_code'))
+    return pd.DataFrame({
+        'region': dims['region'].astype(object).fillna('Unknown').astype(str),
+        'fund': dims['fund'].astype(object).fillna('Unknown').astype(str),
+        'same_store': dims['same_store'].astype(object).eq(True),
+        'fs': dims['fs'].astype(object).fillna('Unknown').astype(str),
+    })
+
+
+def matches(column, value):
+    """
+    Boolean mask of `column` equal to `value` (a single value or a list); None matches everything.
+    """
+    if value is None:
+        return np.ones(len(column), dtype=bool)
+    if isinstance(value, (list, tuple, set)):
+        return column.isin(list(value)).to_numpy()
+    return (column == value).to_numpy()
+
+
+def filter_sites(dims, region=None, fund=None, same_store=None, fs=None, site_codes=None):
+    """
+    Boolean mask over the rows of `dims` (see site_dimensions). Each filter takes a single value or a list.
+    """
+    filters = {'region': region, 'fund': fund, 'same_store': same_store, 'fs': fs}
+    mask = np.ones(len(dims), dtype=bool)
+    for dim, value in filters.items():
+        mask &= matches(dims[dim], value)
+    if site_codes is not None:
+        mask &= np.isin(np.asarray(dims.index), list(site_codes))
+    return mask
+
+
+class MetricsCube():
+    """
+    Site x month cube of additive move-out measures, built once per data refresh.
+
+    Measures live in a dense float64 array of shape (sites, months, measures),
+    and every site carries its `facilities_sql` dimensions (region, fund,
+    same_store, fs). Filtered portfolio totals are sums over the selected sites.
+
+    Cells are also pre-summed per (region, fund, same_store) combination. A filter
+    on those dimensions only sums a handful of rollup rows instead of every site.
+    Rates (% moved out) are always recomputed from the summed measures, never
+    averaged.
+    """
+    def __init__(self, move_out_monthly, occs, facilities):
+        """
+        Parameters:
+        - move_out_monthly (pd.DataFrame): `move_outs` query result (date, site_code, area_move_out, move_outs, move_out_rate).
+        - occs (pd.DataFrame): `occupants` query result (date, site_code, occupants).
+        - facilities (pd.DataFrame): `facilities_sql` result (rd, region, fund, same_store, fs, ...).
+        """
+        self.built_at = time.time()  # data version for exports derived from this cube
+        # on one shared categorical dtype the merge joins category codes, not strings
+        occs, move_out_monthly = align_site_codes(occs, move_out_monthly)
+        cells = occs.merge(move_out_monthly, how='left', on=['date', 'site_code'])
+        cells['date'] = pd.to_datetime(cells['date'])
+        for measure in MEASURES:
+            cells[measure] = pd.to_numeric(cells[measure], errors='coerce').fillna(0)
+
+        site_idx, sites = pd.factorize(cells['site_code'], sort=True)
+        self.sites = pd.Index(np.asarray(sites, dtype=object))
+        self.site_dtype = site_code_dtype(self.sites)
+        self.site_codes = self.site_dtype.categories.get_indexer(self.sites)
+        month_idx, self.dates = pd.factorize(cells['date'], sort=True)
+        self.dates = pd.DatetimeIndex(self.dates)
+        self.values = np.zeros((len(self.sites), len(self.dates), len(MEASURES)))
+        np.add.at(self.values, (site_idx, month_idx), cells[MEASURES].to_numpy(dtype=np.float64))
+
+        self.dims = site_dimensions(self.sites, facilities)
+
+        # pre-summed cells per (region, fund, same_store) combination
+        grouped = self.dims.groupby(ROLLUP_DIMENSIONS, sort=True)
+        group_idx = grouped.ngroup().to_numpy()
+        self.rollup_groups = grouped.size().reset_index()[ROLLUP_DIMENSIONS]
+        self.rollup_values = np.zeros((len(self.rollup_groups), len(self.dates), len(MEASURES)))
+        np.add.at(self.rollup_values, group_idx, self.values)
+
+    def site_mask(self, region=None, fund=None, same_store=None, fs=None, site_codes=None):
+        """
+        Boolean mask over `self.sites`. Each filter takes a single value or a list; None means no filter.
+        """
+        return filter_sites(self.dims, region, fund, same_store, fs, site_codes)
+
+    def _summed(self, region=None, fund=None, same_store=None, fs=None, site_codes=None):
+        """
+        (months, measures) totals for a filter, read from the rollups whenever the
+        filter only touches rollup dimensions.
+        """
+        if fs is None and site_codes is None:
+            groups = self.rollup_groups
+            mask = np.ones(len(groups), dtype=bool)
+            for dim, value in zip(ROLLUP_DIMENSIONS, (region, fund, same_store)):
+                mask &= matches(groups[dim], value)
+            return self.rollup_values[mask].sum(axis=0)
+        mask = self.site_mask(region, fund, same_store, fs, site_codes)
+        return self.values[mask].sum(axis=0)
+
+    def totals(self, **filters):
+        """
+        Monthly totals of every measure for the filtered sites, with `% moved out`.
+        """
+        summed = self._summed(**filters)
+        df = pd.DataFrame(summed, columns=MEASURES)
+        df.insert(0, 'date', self.dates)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['% moved out'] = np.round(100 * df['move_outs'] / df['occupants'].replace(0, np.nan), 2)
+        return df
+
+    def monthly_summary(self, **filters):
+        """
+        Year/month totals in the shape `prep_data` used to produce.
+        """
+        df = self.totals(**filters)
+        df.insert(0, 'month', df['date'].dt.month)
+        df.insert(0, 'year', df['date'].dt.year)
+        return df[['year', 'month', 'occupants', 'move_outs', '% moved out']]
+
+    def heatmap(self, **filters):
+        """
+        `% moved out` pivoted to years x months for HeatmapPlot.
+        """
+        return self.monthly_summary(**filters).pivot(index='year', columns='month', values='% moved out')
+
+    def site_month(self, **filters):
+        """
+        Long-form site x month rows for the filtered sites (histogram and bar inputs),
+        ordered by date so it can be wrapped in a TimeIndexedFrame without sorting.
+        `site_code` is categorical on the shared site code dtype. Only site-months
+        with occupants are kept; one without move outs is 0% moved out.
+        """
+        mask = self.site_mask(**filters)
+        values = self.values[mask].transpose(1, 0, 2)
+        n_months, n_sites = values.shape[:2]
+        df = pd.DataFrame(values.reshape(-1, len(MEASURES)), columns=MEASURES)
+        site_codes = pd.Categorical.from_codes(np.tile(self.site_codes[mask], n_months), dtype=self.site_dtype)
+        df.insert(0, 'site_code', site_codes)
+        df.insert(0, 'date', np.repeat(self.dates, n_sites))
+        df = df[df['occupants'] > 0].reset_index(drop=True)
+        df['% moved out'] = np.round(100 * df['move_outs'] / df['occupants'].replace(0, np.nan), 2)
+        df['year'] = df['date'].dt.year
+        df['month'] = df['date'].dt.month
+        return df
+
+    def options(self, dim):
+        return sorted(self.dims[dim].unique().tolist())
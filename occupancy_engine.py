@@ -0,0 +1,228 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from query_builder import facility_params
+from schemas import apply_schema
+from sql_queries import run_sql_query, occupancy_intervals
+
+EPOCH = datetime.date(2013, 1, 1)
+OPEN = np.iinfo(np.int32).max  # move_out_day for occupancies that have not moved out
+
+
+class OccupancyEngine():
+    """
+    Daily occupancy built from occupancy intervals instead of a SQL range join.
+
+    Each occupancy is an inclusive interval [move_in_day, move_out_day] of int32
+    day offsets from `epoch`, matching the `occupants` query where a tenant still
+    counts in the month they move out. Move-ins and move-outs are turned into
+    per-site event counts with `np.bincount` and accumulated with cumulative sums,
+    so cost is O(occupancies + sites x days) rather than O(months x occupancies).
+    """
+    def __init__(self, site_code, move_in_day, move_out_day, area, epoch=EPOCH):
+        """
+        Parameters:
+        - site_code (array-like): Site of each occupancy.
+        - move_in_day (array-like): Move-in day offset from `epoch`.
+        - move_out_day (array-like): Last occupied day offset, `OPEN` (or NaN) if still occupied.
+        - area (array-like): Unit square feet.
+        - epoch (date, optional): Day 0 of the offsets.
+        """
+        self.epoch = pd.Timestamp(epoch)
+        codes, self.sites = pd.factorize(np.asarray(site_code), sort=True)
+        self.site_idx = codes.astype(np.int32)
+        self.move_in_day = np.asarray(move_in_day, dtype=np.int32)
+        # float64 before filling: OPEN does not fit the float32 of the `occupancy_intervals` schema
+        move_out_day = pd.to_numeric(pd.Series(move_out_day), errors='coerce').astype(np.float64).fillna(OPEN).to_numpy()
+        self.move_out_day = move_out_day.astype(np.int32)
+        self.area = np.nan_to_num(np.asarray(area, dtype=np.float32))
+
+    @classmethod
+    def from_frame(cls, df, epoch=EPOCH):
+        return cls(df['site_code'], df['move_in_day'], df['move_out_day'], df['area'], epoch=epoch)
+
+    def day_offset(self, d):
+        return int((pd.Timestamp(d) - self.epoch).days)
+
+    def _cumulative_events(self, start_day, n_days):
+        """
+        Return per-site running totals over the window of `n_days` days starting at `start_day`:
+        - moved_in[s, d]: occupancies with move_in_day <= d
+        - moved_out[s, d]: occupancies with move_out_day < d
+        each as (count, area) pairs.
+        """
+        n_sites = len(self.sites)
+        size = n_sites * n_days
+
+        # move-ins before the window collapse onto its first day
+        in_day = self.move_in_day - start_day
+        keep_in = in_day < n_days
+        in_idx = self.site_idx[keep_in] * n_days + np.clip(in_day[keep_in], 0, None)
+
+        # a tenant stops counting the day after their move-out
+        gone_day = self.move_out_day.astype(np.int64) + 1 - start_day
+        keep_out = gone_day < n_days
+        out_idx = self.site_idx[keep_out] * n_days + np.clip(gone_day[keep_out], 0, None)
+
+        def running(idx, weights=None):
+            counts = np.bincount(idx, weights=weights, minlength=size).reshape(n_sites, n_days)
+            return np.cumsum(counts, axis=1)
+
+        moved_in = running(in_idx), running(in_idx, self.area[keep_in])
+        moved_out = running(out_idx), running(out_idx, self.area[keep_out])
+        return moved_in, moved_out
+
+    def daily(self, start_date, end_date):
+        """
+        Compute daily occupant counts and occupied square feet per site.
+
+        Parameters:
+        - start_date (date): First day of the window.
+        - end_date (date): Last day of the window (inclusive).
+
+        Returns:
+        - days (pd.DatetimeIndex): Days in the window.
+        - occupants (np.ndarray): int32 array of shape (sites, days).
+        - occupied_area (np.ndarray): float32 array of shape (sites, days).
+        """
+        start_day = self.day_offset(start_date)
+        n_days = self.day_offset(end_date) - start_day + 1
+        (in_n, in_area), (out_n, out_area) = self._cumulative_events(start_day, n_days)
+        days = pd.date_range(start_date, periods=n_days, freq='D')
+        return days, (in_n - out_n).astype(np.int32), (in_area - out_area).astype(np.float32)
+
+    def rollup(self, start_date, end_date, freq='M', how='any', site_area=None):
+        """
+        Roll daily occupancy up to periods (month by default) per site.
+
+        Parameters:
+        - start_date (date): First day of the window.
+        - end_date (date): Last day of the window (inclusive).
+        - freq (str, optional): Pandas period frequency. Defaults to 'M'.
+        - how (str, optional): 'any' counts occupancies active at any point in the
+          period (same as the `occupants` query), 'end' counts those active on the
+          last day and 'mean' averages the daily counts. Defaults to 'any'.
+        - site_area (pd.Series, optional): Rentable square feet indexed by site_code;
+          when given an `area_occupancy` column (occupied / rentable sq ft) is added.
+
+        Returns:
+        - df (pd.DataFrame): One row per period end and site with `occupants`,
+          `occupied_area`, `move_outs` and `area_move_out`.
+        """
+        start_day = self.day_offset(start_date)
+        n_days = self.day_offset(end_date) - start_day + 1
+        (in_n, in_area), (out_n, out_area) = self._cumulative_events(start_day, n_days)
+
+        days = pd.date_range(start_date, periods=n_days, freq='D')
+        periods = days.to_period(freq)
+        boundaries = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        first = boundaries
+        last = np.r_[boundaries[1:] - 1, n_days - 1]
+
+        if how == 'any':
+            occupants = in_n[:, last] - out_n[:, first]
+            occupied = in_area[:, last] - out_area[:, first]
+        elif how == 'end':
+            occupants = in_n[:, last] - out_n[:, last]
+            occupied = in_area[:, last] - out_area[:, last]
+        elif how == 'mean':
+            lengths = (last - first + 1).astype(np.float64)
+
+            def period_mean(daily):
+                total = np.cumsum(daily, axis=1)
+                before = np.where(first > 0, total[:, np.maximum(first - 1, 0)], 0)
+                return (total[:, last] - before) / lengths
+
+            occupants = period_mean(in_n - out_n)
+            occupied = period_mean(in_area - out_area)
+        else:
+            raise ValueError(f"how must be 'any', 'end' or 'mean', got {how!r}")
+
+        # tenants whose last day falls in the period; out_n[d] counts move_out_day < d
+        out_n_next = np.concatenate([out_n, self._moved_out_through(end_date, 'count')], axis=1)
+        out_area_next = np.concatenate([out_area, self._moved_out_through(end_date, 'area')], axis=1)
+        move_outs = out_n_next[:, last + 1] - out_n[:, first]
+        area_move_out = out_area_next[:, last + 1] - out_area[:, first]
+
+        n_sites, n_periods = occupants.shape
+        df = pd.DataFrame({
+            'date': np.tile(days[last].date, n_sites),
+            'site_code': np.repeat(np.asarray(self.sites), n_periods),
+            'occupants': occupants.ravel(),
+            'occupied_area': occupied.ravel(),
+            'move_outs': move_outs.ravel(),
+            'area_move_out': area_move_out.ravel(),
+        })
+        if site_area is not None:
+            df['area_occupancy'] = df['occupied_area'] / df['site_code'].map(site_area)
+        return df
+
+    def month_end_occupants(self, start_date, today=None):
+        """
+        Month-end occupant counts in the shape of the `occupants` query, from the month
+        of `start_date` through the open month.
+
+        Parameters:
+        - start_date (date): Any day of the first month.
+        - today (date, optional): Day in the open month. Defaults to today.
+
+        Returns:
+        - df (pd.DataFrame): date (month end), site_code and occupants, one row per site
+          and month with occupants, with the compact dtypes of the `occupants` schema.
+        """
+        today = pd.Timestamp(today or datetime.date.today())
+        start = pd.Timestamp(start_date).to_period('M').start_time
+        # the whole open month, so move-ins dated later this month count as they do in the query
+        df = self.rollup(start.date(), (today + pd.offsets.MonthEnd(0)).date(), how='any')
+        df = df.loc[df['occupants'] > 0, ['date', 'site_code', 'occupants']]
+        return apply_schema(df.reset_index(drop=True), 'occupants')
+
+    def daily_totals(self, start_date, end_date, site_codes=None, site_area=None):
+        """
+        Daily occupants and occupied square feet summed over a set of sites.
+
+        Parameters:
+        - start_date (date): First day of the window.
+        - end_date (date): Last day of the window (inclusive).
+        - site_codes (list, optional): Sites to sum. Defaults to every site.
+        - site_area (pd.Series, optional): Rentable square feet indexed by site_code;
+          when given an `area_occupancy` column (occupied / rentable sq ft of the sites
+          with a known area) is added.
+
+        Returns:
+        - df (pd.DataFrame): One row per day with `date`, `occupants` and `occupied_area`.
+        """
+        days, occupants, occupied = self.daily(start_date, end_date)
+        sites = np.asarray(self.sites, dtype=object)
+        selected = np.ones(len(sites), dtype=bool) if site_codes is None else np.isin(sites, list(site_codes))
+        df = pd.DataFrame({
+            'date': days,
+            'occupants': occupants[selected].sum(axis=0, dtype=np.int64),
+            'occupied_area': occupied[selected].sum(axis=0, dtype=np.float64),
+        })
+        if site_area is not None:
+            site_area = pd.Series(pd.to_numeric(site_area, errors='coerce').to_numpy(dtype=np.float64),
+                                  index=np.asarray(site_area.index, dtype=object)).dropna()
+            site_area = site_area[~site_area.index.duplicated()]  # facilities_sql repeats a site per supervisor
+            known = selected & np.isin(sites, site_area.index)
+            rentable = site_area.reindex(sites[known]).sum()
+            df['area_occupancy'] = occupied[known].sum(axis=0, dtype=np.float64) / rentable if rentable else np.nan
+        return df
+
+    def _moved_out_through(self, end_date, what):
+        """
+        Per-site totals of occupancies whose last day is on or before `end_date`, as a (sites, 1) column.
+        """
+        done = self.move_out_day <= self.day_offset(end_date)
+        weights = None if what == 'count' else self.area[done]
+        totals = np.bincount(self.site_idx[done], weights=weights, minlength=len(self.sites))
+        return totals.reshape(-1, 1)
+
+
+def load_occupancy_engine(epoch=EPOCH):
+    """
+    Pull every occupancy interval once and build an OccupancyEngine from it.
+    """
+    df = run_sql_query(occupancy_intervals, params={'epoch': epoch.isoformat(), **facility_params()})
+    return OccupancyEngine.from_frame(df, epoch=epoch)
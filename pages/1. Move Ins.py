@@ -1,13 +1,20 @@
 import pandas as pd
 import numpy as np
-from plots import Plots
+from plots import CohortPlot
 import streamlit as st
-from sql_queries import run_sql_query, facilities_sql, all_tenants
-from utils import grab_s3_file, password_authenticate, blank
+from query_builder import run_query
+from cohort_engine import CohortEngine, fetch_occupancy_intervals
+from loader import Dataset, load_datasets
+from instrumentation import begin_page_run, end_page_run
+from export import export_button
+from shared_store import load_shared_frame, shared_version
+from refresher import get_refresher, render_refresh_status
+from utils import password_authenticate, blank
 
-plots = Plots()
+cohort_plot = CohortPlot()
 page_title="Occupancy Tool - Move Ins"
 st.set_page_config(page_title="Move Ins", page_icon="📈", layout= "wide")
+perf_run = begin_page_run('Move Ins')
 
 st.subheader("Move Ins")
 
@@ -16,11 +23,11 @@ with st.sidebar:
     st.image('red_dot.png', width=200)
     st.title(page_title)
 
-# Need to come back to password authentication 
+# Need to come back to password authentication
 #     if not st.session_state.get('valid_password', False):
 #         # Display the password input field
 #         enter_password = st.text_input("Password", type='password')
-        
+
 #         # Check for password authentication
 #         if password_authenticate(enter_password) == "Admin":
 #             st.session_state['valid_password'] = True
@@ -28,4 +35,100 @@ with st.sidebar:
 #             st.warning("Please Enter Valid Password in the Sidebar")
 
 # if st.session_state['valid_password'] == True:
-#     st.write('Hello')
\ No newline at end of file
+#     st.write('Hello')
+
+# serve whatever is cached; expiring data is refreshed in the background while the old version is shown
+get_refresher().check(['occupancy_intervals', 'facilities_sql'])
+
+datasets = load_datasets([
+    # one row per occupancy, memory-mapped once per host
+    Dataset('occupancy_intervals', load_shared_frame, ('occupancy_intervals', fetch_occupancy_intervals), {'ttl': None}),
+    Dataset('facilities', run_query, ('facilities',), {'ttl': None}),
+])
+if 'occupancy_intervals' in datasets.errors:
+    st.error('Error retrieving move in data.')
+    st.stop()
+intervals = datasets['occupancy_intervals']
+# without facility dimensions every site falls under 'Unknown' and only the portfolio view is meaningful
+facilities = datasets.get('facilities', pd.DataFrame(columns=['rd', 'region', 'fund', 'same_store', 'fs']))
+
+@st.cache_resource(ttl=60*60)
+def build_cohort_engine(_intervals, facilities, version):
+    # built once per refresh; every filter and cohort range below is a slice of it
+    return CohortEngine.from_frame(_intervals, facilities)
+
+engine = build_cohort_engine(intervals, facilities, shared_version(intervals))
+
+with st.sidebar:
+    selected_regions = st.multiselect("Region", engine.options('region'))
+    selected_funds = st.multiselect("Fund", engine.options('fund'))
+    selected_sites = st.multiselect("Site", engine.sites.tolist())
+    same_store_only = st.checkbox("Same Store Only")
+
+filters = {
+    'region': selected_regions or None,
+    'fund': selected_funds or None,
+    'same_store': True if same_store_only else None,
+    'site_codes': selected_sites or None,
+}
+
+cohort_months = [c.strftime('%Y-%m') for c in engine.cohorts]
+default_start = max(0, len(cohort_months) - 37)
+
+# ----- UI -----
+with st.form("Filters"):
+    form1= st.columns([3,2,1,2])
+    start_month, end_month = form1[0].select_slider(
+        "Move In Months",
+        options=cohort_months,
+        value=(cohort_months[default_start], cohort_months[-1])
+    )
+    max_tenure = form1[1].slider("Months Since Move In", 1, max(1, len(cohort_months) - 1), min(24, max(1, len(cohort_months) - 1)))
+    by_year = form1[2].checkbox("Curve per Year", value=True)
+    submitted = form1[3].form_submit_button("Confirm Selection")
+    if submitted:
+        st.write('Move ins selected:', f'{start_month} to {end_month}')
+
+start_date, end_date = pd.Timestamp(start_month), pd.Timestamp(end_month)
+matrix = engine.retention_matrix(start_date, end_date, max_tenure, **filters)
+if matrix.empty:
+    st.info('No move ins for this selection.')
+    st.stop()
+
+curve = engine.retention_curve(start_date, end_date, max_tenure, **filters)
+
+def retained_at(tenure):
+    row = curve[curve['tenure'] == tenure]
+    return f"{row['% retained'].iloc[0]:.1f}%" if len(row) else '-'
+
+blank()
+row1=st.columns([2,1,1,1,2])
+with row1[1]:
+    st.metric("Move Ins", f"{int(matrix['move_ins'].sum()):,}")
+with row1[2]:
+    st.metric("Retained at 6 Months", retained_at(6))
+with row1[3]:
+    st.metric("Retained at 12 Months", retained_at(12))
+
+blank()
+
+row2=st.columns([3,2])
+with row2[0]:
+    cohort_plot.plot_retention_heatmap(engine.matrix_frame(start_date, end_date, max_tenure, **filters),
+                                       '% Retained by Move In Month')
+with row2[1]:
+    curves = engine.retention_curve(start_date, end_date, max_tenure, by='year', **filters) if by_year else curve
+    cohort_plot.plot_retention_curves(curves, 'Retention Curve')
+
+# row 3: sites ranked by retention at the chosen tenure (cohorts that have reached it)
+site_table = engine.site_retention(max_tenure, start_date, end_date, **filters)
+st.dataframe(site_table.sort_values('% retained'), hide_index=True, use_container_width=True)
+
+end_row = st.columns([1,5,5])
+with end_row[0]:
+    export_button('cohort_retention', matrix.reset_index(),
+                  {**filters, 'start_date': start_month, 'end_date': end_month, 'max_tenure': max_tenure},
+                  version=shared_version(intervals), file_stem=f'cohort_retention_{start_month} to {end_month}')
+
+render_refresh_status()
+end_page_run(perf_run)
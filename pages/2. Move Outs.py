@@ -1,17 +1,30 @@
 import pandas as pd
 import numpy as np
-from plots import HeatmapPlot, HistogramPlot, ScatterPlot, BarPlot
+from plots import HeatmapPlot, HistogramPlot, ScatterPlot, BarPlot, OccupancyPlot
 import streamlit as st
-from sql_queries import run_sql_query, move_outs, occupants, facilities_sql
+from query_builder import run_query
+from snapshot_store import HISTORY_START, load_month_end_frame
+from cohort_engine import fetch_occupancy_intervals
+from occupancy_engine import OccupancyEngine
+from loader import Dataset, load_datasets
+from instrumentation import begin_page_run, end_page_run
+from export import export_button
+from shared_store import load_shared_frame, shared_version
+from refresher import get_refresher, render_refresh_status
+from metrics_cube import MetricsCube
+from forecast_engine import ForecastEngine
+from time_index import TimeIndexedFrame
 from utils import grab_s3_file, password_authenticate, blank
 
 page_title="Occupancy Tool - Move Outs"
 st.set_page_config(page_title=page_title, page_icon="📈", layout= "wide")
+perf_run = begin_page_run('Move Outs')
 
 heatmap_plot = HeatmapPlot()
 histogram = HistogramPlot()
 scatter = ScatterPlot()
 barplot = BarPlot()
+occupancy_plot = OccupancyPlot()
 
 st.subheader("Move Out Analysis")
 
@@ -35,37 +48,95 @@ with st.sidebar:
 # if st.session_state['valid_password'] == True:
 #     st.write('Hello')
 
-move_out_monthly = run_sql_query(move_outs)
-occs = run_sql_query(occupants)
+def load_monthly_data(name):
+    # closed months come from the local snapshot store, only recent months hit the database;
+    # the result is memory-mapped once per host instead of copied into every session
+    return load_shared_frame(name, load_month_end_frame, (name,), ttl=None, sort_by='date')
+
+# serve whatever is cached; expiring data is refreshed in the background while the old version is shown
+get_refresher().check(['move_outs', 'occupancy_intervals', 'facilities_sql'])
+
+datasets = load_datasets([
+    Dataset('move_outs', load_monthly_data, ('move_outs',)),
+    # one row per occupancy, memory-mapped once per host and shared with the Move Ins page
+    Dataset('occupancy_intervals', load_shared_frame, ('occupancy_intervals', fetch_occupancy_intervals), {'ttl': None}),
+    Dataset('facilities', run_query, ('facilities',), {'ttl': None}),
+])
+if 'move_outs' in datasets.errors or 'occupancy_intervals' in datasets.errors:
+    st.error('Error retrieving move out data.')
+    st.stop()
+move_out_monthly, intervals = datasets['move_outs'], datasets['occupancy_intervals']
+# without facility dimensions every site falls under 'Unknown' and only the portfolio view is meaningful
+facilities = datasets.get('facilities', pd.DataFrame(columns=['rd', 'region', 'fund', 'same_store', 'fs']))
+
+@st.cache_resource(ttl=60*60)
+def build_occupancy_engine(_intervals, version):
+    # daily occupancy per site from the intervals, built once per refresh
+    return OccupancyEngine.from_frame(_intervals)
+
+occupancy = build_occupancy_engine(intervals, shared_version(intervals))
+
+@st.cache_resource(ttl=60*60)
+def month_end_occupants(_occupancy, version, today):
+    # same rows as the `occupants` query, without its months x occupancies range join
+    return _occupancy.month_end_occupants(HISTORY_START, today)
+
+today = pd.Timestamp.now().date()
+# the open month's row moves to a new month-end on the first of the month
+versions = (shared_version(move_out_monthly), shared_version(intervals), today)
+occs = month_end_occupants(occupancy, versions[1], today)
+
+@st.cache_resource(ttl=60*60)
+def build_metrics_cube(_move_out_monthly, _occs, facilities, versions):
+    # built once per refresh; every filter combination below is answered from it
+    return MetricsCube(_move_out_monthly, _occs, facilities)
+
+cube = build_metrics_cube(move_out_monthly, occs, facilities, versions)
+
+@st.cache_data(ttl=60*60)
+def daily_occupancy(_occupancy, version, site_codes, start_date, end_date, site_area):
+    return _occupancy.daily_totals(start_date, end_date, site_codes=site_codes, site_area=site_area)
+
+@st.cache_resource(ttl=60*60)
+def build_forecast_engine(_cube, versions):
+    # every site is refitted from the cube once per refresh
+    return ForecastEngine.from_cube(_cube)
+
+forecasts = build_forecast_engine(cube, versions)
+
+@st.cache_data(ttl=60*60)
+def predicted_move_outs(_forecasts, versions, month):
+    return _forecasts.predict(month)
+
+@st.cache_data(ttl=60*60)
+def forecast_backtest(_forecasts, versions):
+    return _forecasts.backtest()
 
-st.cache(ttl= 60*60*24)
-def prep_data(move_out_monthly, occs):
-    move_out_df = occs.merge(move_out_monthly, how="left", on=["date", "site_code"])
-    move_out_df['% moved out'] = round(100 * move_out_df['move_outs'] / move_out_df['occupants'], 2)
-    move_out_df['date'] = pd.to_datetime(move_out_df['date'])
-
-    # Extract year and month from the date
-    move_out_df['year'] = move_out_df['date'].dt.year
-    move_out_df['month'] = move_out_df['date'].dt.month
-
-    # Group by year and month, then sum 'occupants' and 'move_outs'
-    monthly_summary = move_out_df.groupby(['year', 'month'])[['occupants', 'move_outs']].sum().reset_index()
+with st.sidebar:
+    selected_regions = st.multiselect("Region", cube.options('region'))
+    selected_funds = st.multiselect("Fund", cube.options('fund'))
+    same_store_only = st.checkbox("Same Store Only")
 
-    # Recalculate the '% moved out'
-    monthly_summary['% moved out'] = round(100 * monthly_summary['move_outs'] / monthly_summary['occupants'], 2)
-    heatmap_data = monthly_summary.pivot(index='year', columns='month', values='% moved out')
-    return move_out_df, monthly_summary, heatmap_data
+filters = {
+    'region': selected_regions or None,
+    'fund': selected_funds or None,
+    'same_store': True if same_store_only else None,
+}
 
 st.cache(ttl= 60*60*24)
 def date_ranges(occs):
-    min_date = occs['date'].min()
-    max_date = occs['date'].max()
+    min_date = occs['date'].min().date()
+    max_date = occs['date'].max().date()
     one_month_ago = (pd.Timestamp.now() - pd.DateOffset(months=1)).date()
     default_range = (one_month_ago, pd.Timestamp.now().date())
     return min_date, max_date, one_month_ago, default_range
 
 min_date, max_date, one_month_ago, default_range = date_ranges(occs)
-move_out_df, monthly_summary, heatmap_data = prep_data(move_out_monthly, occs)
+move_out_df = cube.site_month(**filters)
+# already in date order, so this only records the time column for range slicing
+move_outs_by_date = TimeIndexedFrame(move_out_df, 'date')
+monthly_summary = cube.monthly_summary(**filters)
+heatmap_data = cube.heatmap(**filters)
 # ----- UI -----
 with st.form("Filters"):
     form1= st.columns([2,1,1,4]) 
@@ -90,12 +161,21 @@ blank()
 
 row2=st.columns([2,2,2])
 with row2[0]:
-    print("")
-
-    # barplot.plot_altair_monthly_bars(move_out_df, x_field='year', y_field='move_outs', secondary_x ='month', title_text="Moves Y/Y-Each Month")
+    # actual vs predicted for the last complete month in the range, each site forecast from the months before it
+    scatter_month = forecasts.last_complete_month(end_date)
+    if scatter_month is not None:
+        pred_moveouts_df = predicted_move_outs(forecasts, versions, scatter_month)
+        scatter_data = scatter.prepare_scatter_data(move_out_df, pred_moveouts_df, scatter_month)
+        scatter.plot_altair_scatterplot(scatter_data, x_field='% moved out', y_field='percentage_difference',
+                                        title_text='Actual vs Predicted Move Outs',
+                                        x_title=f"% Moved Out ({scatter_month.strftime('%b %Y')})",
+                                        tooltip=['site_code', 'move_outs', 'predicted_moveouts', '% moved out', 'percentage_difference'])
+        _, backtest = forecast_backtest(forecasts, versions)
+        st.caption(f"Backtest over the last {backtest['months']} months: {backtest['wape']:.1%} WAPE "
+                   f"(same month last year: {backtest['naive_wape']:.1%}), bias {backtest['bias']:+.1%}")
 with row2[1]: 
     # display histogram of yoy move outs
-    prepped_histo = histogram.prepare_histogram_data(move_out_df, start_date, end_date)
+    prepped_histo = histogram.prepare_histogram_data(move_outs_by_date, start_date, end_date)
     # st.write(prepped_histo)
     histogram.plot_altair_histogram(prepped_histo, x_field="yoy_change", title_text="Distribution of Y/Y Changes in % Moved Out", x_title='', y_title='# Properties')
 
@@ -106,3 +186,20 @@ with row2[2]:
 # row 3
 barplot.plot_altair_monthly_bars(move_out_df, x_field='year', y_field='move_outs', secondary_x ='month', title_text="Moves Y/Y-Each Month")
 
+# row 4: daily occupancy of the filtered sites over the selected range
+site_codes = tuple(cube.sites[cube.site_mask(**filters)])
+site_area = facilities.set_index('rd')['nrsf'] if 'nrsf' in facilities else None
+daily = daily_occupancy(occupancy, versions[1], site_codes, start_date, min(end_date, today), site_area)
+row4 = st.columns([1,1])
+with row4[0]:
+    if 'area_occupancy' in daily:
+        occupancy_plot.plot_daily_occupancy(daily, title_text='Daily Occupancy (% of Rentable Sq Ft)')
+with row4[1]:
+    occupancy_plot.plot_daily_occupancy(daily, title_text='Daily Occupants', y_field='occupants')
+
+end_row = st.columns([1,5,5])
+with end_row[0]:
+    export_button('move_outs', move_out_df, filters, version=cube.built_at, file_stem='move_outs_by_site_month')
+
+render_refresh_status()
+end_page_run(perf_run)
@@ -1,14 +1,21 @@
 import pandas as pd
 import numpy as np
 from plots import SurvivalPlot
+from survival import SurvivalIndex, N_RESAMPLES
+from time_index import TimeIndexedFrame
 import streamlit as st
 from sql_queries import run_sql_query, facilities_sql, all_tenants
-from utils import grab_s3_file, password_authenticate, blank
-from Home import enter_password 
+from utils import grab_s3_file, fetch_ecris, password_authenticate, blank, ECRIS_BUCKET, ECRI_OCCS_KEY
+from loader import Dataset, load_datasets
+from instrumentation import begin_page_run, end_page_run
+from export import export_button
+from shared_store import load_shared_frame, shared_version
+from refresher import get_refresher, render_refresh_status
 
 survival_plots = SurvivalPlot()
 page_title="Occupancy Tool - ECRIs"
 st.set_page_config(page_title=page_title, page_icon="📈", layout= "wide")
+perf_run = begin_page_run('ECRIs')
 
 st.subheader("ECRI Analysis")
 
@@ -27,20 +34,23 @@ with st.sidebar:
     # ----- Data grab and prep -----
     # prep to be moved to another file eventually
     # st.cache()
-try:
-    ecris = grab_s3_file('ecri/master_ecris.csv', 'rev-mgt')
-    ecri_occs = grab_s3_file('ecri/occupancies.csv', 'rev-mgt')
-except Exception as e:
+# serve whatever is cached; expiring data is refreshed in the background while the old version is shown
+get_refresher().check(['ecris', 'ecri_occs'])
+
+# one memory-mapped copy shared by every session and process, republished only when the S3 object changes
+datasets = load_datasets([
+    Dataset('ecris', load_shared_frame, ('ecris', fetch_ecris), {'ttl': None, 'sort_by': 'notification_date'}),
+    Dataset('ecri_occs', grab_s3_file, (ECRI_OCCS_KEY, ECRIS_BUCKET)),
+])
+if 'ecris' in datasets.errors:
     st.error('Error retrieving ECRI data.')
+    st.stop()
+ecris = datasets['ecris']
+ecri_occs = datasets.get('ecri_occs')
 
 st.cache(ttl=60*60*24) # daily refresh
 def process_ecris (ecris):
-    ecris['notification_date'] = pd.to_datetime(ecris['notification_date'])
-    ecris['increase_date'] = pd.to_datetime(ecris['increase_date'])
-    ecris['moved_out_date'] = pd.to_datetime(ecris['moved_out_date'])
-    ecris['event_occurred'] = (~ecris['moved_out_date'].isnull()).astype(int)
-
-    # Explicit datetime conversion
+    # `ecris` is shared across sessions, dates are parsed and `event_occurred` derived in fetch_ecris
     min_date = ecris['notification_date'].min().to_pydatetime()
     max_date = ecris['notification_date'].max().to_pydatetime()
 
@@ -56,6 +66,26 @@ def process_ecris (ecris):
 
 min_date, max_date, all_possible_dates, six_months_ago, default_range, ecris_pending, increase_amount_pending = process_ecris(ecris)
 
+# keyed on the shared dataset version rather than hashing the frame on every rerun
+@st.cache_resource(ttl=60*60*24)
+def build_survival_index(_ecris, version, start_time_column):
+    # built once per data refresh; slider moves only difference its prefix sums
+    return SurvivalIndex(_ecris, start_time_column)
+
+survival_index = build_survival_index(ecris, shared_version(ecris), 'notification_date')
+
+@st.cache_resource(ttl=60*60*24)
+def index_by_date(_ecris, version, time_column):
+    # published sorted by notification_date, so this only finds the range bounds with searchsorted
+    return TimeIndexedFrame(_ecris, time_column)
+
+ecris_by_date = index_by_date(ecris, shared_version(ecris), 'notification_date')
+
+@st.cache_data(ttl=60*60*24)
+def window_bands(_survival_index, version, start_date, end_date, n_resamples=N_RESAMPLES):
+    # seeded bootstrap, so each window's bands are computed once per data version
+    return _survival_index.bands(start_date, end_date, n_resamples=n_resamples)
+
 # ----- UI -----
 with st.form("Filters"):
     form1= st.columns([2,1,1,4]) 
@@ -72,6 +102,7 @@ with st.form("Filters"):
     # option = form1[1].selectbox(
     #     'Choose Start Time Column',
     #     ['notification_date', 'increase_date'])
+    show_bands = form1[1].checkbox("95% Bands", help="Bootstrap confidence bands around each survival curve")
     submitted = form1[2].form_submit_button("Confirm Selection")
     if submitted:
         st.write('Date Range selected:', f'{formatted_start_date} to {formatted_end_date}')
@@ -79,8 +110,7 @@ with st.form("Filters"):
 
 # Filter based on the selected range
 start_date, end_date = range
-filtered_ecris = ecris[(ecris['notification_date'].dt.date >= start_date) & 
-                (ecris['notification_date'].dt.date <= end_date)]
+filtered_ecris = ecris_by_date.between(start_date, end_date)
 
 # option = form1[1].selectbox(
 #     'Choose Start Time Column',
@@ -98,10 +128,14 @@ blank()
 row2=st.columns([3,2,2])
 with row2[0]:
     # plot_survival_curve_altair(filtered_ecris, 'notification_date')
-    survival_plots.plot_altair_chart(filtered_ecris, 'notification_date', 'Survival by Model')
+    bands = window_bands(survival_index, shared_version(ecris), start_date, end_date) if show_bands else None
+    survival_plots.plot_altair_window(survival_index, start_date, end_date, 'Survival by Model', bands=bands)
 
 end_row = st.columns([1,5,5])
 with end_row[0]:
-    csv_data = filtered_ecris.to_csv(index=False)
-    st.download_button("Download Data", data=csv_data, file_name=f'ecris_{min_date.date()} to {max_date.date()}.csv', mime="text/csv")
+    # built only when requested, then reused for the same range until the data is republished
+    export_button('ecris', filtered_ecris, {'start_date': start_date, 'end_date': end_date},
+                  version=shared_version(ecris), file_stem=f'ecris_{start_date} to {end_date}')
 
+render_refresh_status()
+end_page_run(perf_run)
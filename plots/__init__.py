@@ -0,0 +1,44 @@
+"""
+Chart classes for the pages, loaded on first use.
+
+`from plots import ScatterPlot` imports only the module defining that chart (and
+altair), so a page pays for the charts it draws and `import plots` itself is free.
+"""
+import importlib
+
+# chart class -> module defining it
+CHARTS = {
+    'BasePlot': 'plots.base',
+    'SurvivalPlot': 'plots.survival_plot',
+    'HeatmapPlot': 'plots.heatmap_plot',
+    'HistogramPlot': 'plots.histogram_plot',
+    'ScatterPlot': 'plots.scatter_plot',
+    'BarPlot': 'plots.bar_plot',
+    'CohortPlot': 'plots.cohort_plot',
+    'OccupancyPlot': 'plots.occupancy_plot',
+}
+
+__all__ = list(CHARTS)
+
+
+def chart_class(name):
+    """
+    The chart class registered as `name`, importing its module on first use.
+    """
+    try:
+        module = CHARTS[name]
+    except KeyError:
+        raise AttributeError(f"module 'plots' has no chart {name!r}") from None
+    cls = getattr(importlib.import_module(module), name)
+    globals()[name] = cls  # later lookups skip __getattr__
+    return cls
+
+
+def __getattr__(name):
+    if name in CHARTS:
+        return chart_class(name)
+    raise AttributeError(f"module 'plots' has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(CHARTS))
@@ -0,0 +1,26 @@
+import altair as alt
+from instrumentation import timed
+from plots.base import BasePlot
+
+
+class BarPlot(BasePlot):
+    def __init__(self):
+        super().__init__()
+        # x = year , y=move outs
+    @timed()
+    def plot_altair_monthly_bars(self, data, x_field, y_field, secondary_x, title_text, color_palette="teals"):
+        # Sum the data by month and year
+        summed_data = data.groupby(['month', 'year'])[y_field].sum().reset_index()
+
+        # Define the bar chart
+        chart = alt.Chart(summed_data).mark_bar().encode(
+            x=alt.X(f'{x_field}:O', title=None, axis=alt.Axis(labels=False, ticks=False, domain=False)),  # Hide x-axis labels, ticks, and domain),
+            y=alt.Y(f'{y_field}:Q', title=None),
+            color=alt.Color(f'{x_field}:O', scale=alt.Scale(scheme=color_palette), legend=alt.Legend(orient='right')),
+            tooltip=[x_field, secondary_x, y_field]
+        ).facet(
+            column=alt.Column(f'{secondary_x}', title=None, header=alt.Header(labelOrient="bottom", labelPadding=10))  # Adjust label position and padding for month
+        )
+        styled_chart = self.style_chart(chart, title_text, width=False, height=False)
+        styled_chart= styled_chart.configure_view(stroke=None).configure_axis(grid=False)
+        self.render(styled_chart, title_text)
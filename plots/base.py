@@ -0,0 +1,117 @@
+import json
+import logging
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+from downsample import downsample_frame
+from instrumentation import note
+
+logger = logging.getLogger(__name__)
+
+MAX_POINTS_PER_CHART = 5000
+
+class BasePlot():
+    def __init__(self, max_points=MAX_POINTS_PER_CHART):
+        self.font = 'monospace'
+        self.max_points = max_points
+
+    def spec_size(self, chart):
+        """
+        Size in bytes of the Vega-Lite spec (data included) sent to the browser.
+        """
+        with alt.data_transformers.disable_max_rows():
+            return len(json.dumps(chart.to_dict()).encode('utf-8'))
+
+    def chart_rows(self, chart):
+        """
+        Rows of inline data in a chart and its layers / concatenated sub-charts.
+        """
+        rows = len(chart.data) if isinstance(getattr(chart, 'data', None), pd.DataFrame) else 0
+        for attr in ('layer', 'hconcat', 'vconcat', 'concat'):
+            for sub in getattr(chart, attr, None) or []:
+                rows += self.chart_rows(sub)
+        return rows
+
+    def render(self, chart, name=None):
+        """
+        Display a chart in Streamlit, logging the rows it carries so payload regressions are visible.
+
+        The spec size in bytes takes a second serialization of the chart, so it is
+        only measured when this module's logger is at DEBUG.
+        """
+        name = name or type(self).__name__
+        rows = self.chart_rows(chart)
+        note(rows_out=rows)
+        if logger.isEnabledFor(logging.DEBUG):
+            size = self.spec_size(chart)
+            note(bytes=size)
+            logger.debug('Chart %s spec: %d rows, %d bytes', name, rows, size)
+        else:
+            logger.info('Chart %s spec: %d rows', name, rows)
+        st.altair_chart(chart, use_container_width=True)
+
+    def style_chart(self, chart, title_text, width=600, height=300):
+        if width == False and height ==False:
+             chart = chart.properties(
+            title=alt.TitleParams(title_text, fontSize=16, font=self.font, anchor='middle')
+        ).configure_axis(
+            labelFont=self.font,
+            titleFont=self.font
+        ).configure_legend(
+            labelFont=self.font,
+            titleFont=self.font
+        )
+        else:
+            chart = chart.properties(
+                width=width, 
+                height=height, 
+                title=alt.TitleParams(title_text, fontSize=16, font=self.font, anchor='middle')
+            ).configure_axis(
+                labelFont=self.font,
+                titleFont=self.font
+            ).configure_legend(
+                labelFont=self.font,
+                titleFont=self.font
+            )
+        return chart
+
+    def plot_data_with_tooltip(self, data, x_field, y_field, color_field, hex_palette, x_scale, y_scale, max_points=None):
+        """
+        Layered line chart with a nearest-point hover rule and label.
+
+        All five layers read one dataset attached to the layer itself, so the data
+        is serialized once rather than per layer. Each series is downsampled with
+        LTTB so the chart holds at most `max_points` rows (defaults to `self.max_points`).
+        """
+        data = downsample_frame(data, x_field, y_field, color_field, max_points or self.max_points)
+        nearest = alt.selection_point(nearest=True, on='mouseover', fields=[x_field], empty=False)
+
+        line = alt.Chart().mark_line(interpolate='basis').encode(
+            x=alt.X(f'{x_field}:Q', scale=alt.Scale(domain=x_scale), title=None),
+            y=alt.Y(f'{y_field}:Q', scale=alt.Scale(domain=y_scale), title=None),
+            color=alt.Color(f'{color_field}:N', scale=alt.Scale(range=hex_palette))
+        )
+
+        selectors = alt.Chart().mark_point().encode(
+            x=f'{x_field}:Q',
+            opacity=alt.value(0),
+        ).add_params(
+            nearest
+        )
+
+        points = line.mark_point().encode(
+            opacity=alt.condition(nearest, alt.value(1), alt.value(0))
+        )
+
+        text = line.mark_text(align='left', dx=5, dy=-5).encode(
+           text=alt.condition(nearest, f'{y_field}:Q', alt.value(' '))
+        )
+
+        rules = alt.Chart().mark_rule(color='gray').encode(
+            x=f'{x_field}:Q',
+        ).transform_filter(
+            nearest
+        )
+
+        return alt.layer(line, selectors, points, rules, text, data=data)
@@ -0,0 +1,41 @@
+import altair as alt
+from instrumentation import timed
+from plots.base import BasePlot
+from plots.palettes import series_palette
+
+
+class CohortPlot(BasePlot):
+    def __init__(self):
+        super().__init__()
+
+    @timed()
+    def plot_retention_heatmap(self, data, title_text, color_palette="teals"):
+        """
+        Move-in cohort x tenure month heatmap of % retained.
+
+        Parameters:
+        - data (pd.DataFrame): `CohortEngine.matrix_frame` result (cohort, tenure, move_ins, % retained).
+        - title_text (str): Title for the heatmap.
+        - color_palette (str, optional): Vega color scheme. Defaults to 'teals'.
+        """
+        chart = alt.Chart(data).mark_rect().encode(
+            x=alt.X('tenure:O', title='Months since move in'),
+            y=alt.Y('yearmonth(cohort):O', title='', sort='descending'),
+            color=alt.Color('% retained:Q', scale=alt.Scale(scheme=color_palette)),
+            tooltip=[alt.Tooltip('yearmonth(cohort):T', title='cohort'), 'tenure', 'move_ins', '% retained']
+        )
+        styled_chart = self.style_chart(chart, title_text, width=600, height=500)
+        self.render(styled_chart, title_text)
+
+    @timed()
+    def plot_retention_curves(self, data, title_text):
+        """
+        % retained by tenure month, one line per `cohorts` value (see CohortEngine.retention_curve).
+        """
+        groups = data['cohorts'].unique()
+        hex_palette = series_palette(len(groups))
+        y_min = data['% retained'].min()
+        chart = self.plot_data_with_tooltip(data, 'tenure', '% retained', 'cohorts', hex_palette,
+                                            x_scale=[0, data['tenure'].max()], y_scale=[y_min, 100])
+        styled_chart = self.style_chart(chart, title_text)
+        self.render(styled_chart, title_text)
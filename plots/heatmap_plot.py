@@ -0,0 +1,59 @@
+import altair as alt
+from instrumentation import timed
+from plots.base import BasePlot
+
+
+class HeatmapPlot(BasePlot):
+    def __init__(self):
+        super().__init__()
+    
+    @timed()
+    def prepare_heatmap_data(self, heatmap_data):
+        # Reset index for the heatmap data
+        data = heatmap_data.reset_index().melt(id_vars='year', value_name='% moved out', var_name='month')
+        return data
+    
+    @timed()
+    def plot_altair_heatmap(self, data, x_field, y_field, color_field, title_text, color_palette="teals"):
+        """
+        Create a heatmap using Altair based on the provided data.
+
+        Parameters:
+        - data (pd.DataFrame): Data for the heatmap.
+        - x_field (str): Field to be used for the x-axis.
+        - y_field (str): Field to be used for the y-axis.
+        - color_field (str): Field to determine the color of the heatmap cells.
+        - title_text (str): Title for the heatmap.
+        - color_scheme (str, optional): Color scheme for the heatmap. Defaults to 'teals'.
+
+        Returns:
+        - chart: Altair heatmap chart.
+        """
+        # Define the heatmap chart
+        chart = alt.Chart(data).mark_rect().encode(
+            x=alt.X(f'{x_field}:O', title=''),
+            y=alt.Y(f'{y_field}:O', title=''),
+            color=alt.Color(f'{color_field}:Q', scale=alt.Scale(scheme=color_palette)),
+            tooltip=[x_field, y_field, color_field]
+        )
+
+        # Style the chart
+        styled_chart = self.style_chart(chart, title_text, width=600, height=400)
+        return styled_chart
+
+    def display_heatmap(self, data, x_field, y_field, color_field, title_text):
+        """
+        Display the heatmap using Streamlit.
+
+        Parameters:
+        - data (pd.DataFrame): Data for the heatmap.
+        - x_field (str): Field to be used for the x-axis.
+        - y_field (str): Field to be used for the y-axis.
+        - color_field (str): Field to determine the color of the heatmap cells.
+        - title_text (str): Title for the heatmap.
+        """
+        # Create a palette that starts from a light teal (close to white) and progresses to a dark teal
+
+        data = self.prepare_heatmap_data(data)
+        heatmap = self.plot_altair_heatmap(data, x_field, y_field, color_field, title_text)
+        self.render(heatmap, title_text)
@@ -0,0 +1,109 @@
+import altair as alt
+import pandas as pd
+from distributions import histogram_frame, kde_curve
+from instrumentation import timed
+from plots.base import BasePlot
+from time_index import TimeIndexedFrame
+
+
+class HistogramPlot(BasePlot):
+    def __init__(self):
+        super().__init__()
+    
+    @timed()
+    def prepare_histogram_data(self, move_out_df, start_date, end_date):
+        """
+        Prepare data for the histogram based on the provided date range.
+        
+        Parameters:
+        - move_out_df (TimeIndexedFrame | pd.DataFrame): Move-out data indexed on 'date'. It is not modified.
+        - start_date (datetime): Start date for the desired range.
+        - end_date (datetime): End date for the desired range.
+
+        Returns:
+        - sorted_df (pd.DataFrame): DataFrame with Y/Y change prepared for histogram plotting.
+        """
+        if not isinstance(move_out_df, TimeIndexedFrame):
+            move_out_df = TimeIndexedFrame(move_out_df, 'date')
+
+        # Now filter based on the date range
+        current_year_data = move_out_df.between(start_date, end_date)
+        previous_year_data = move_out_df.shifted(start_date, end_date, years=1)
+
+        # Merge the two dataframes on 'site_code' to calculate the Y/Y change
+        merged_df = current_year_data[['site_code', '% moved out']].merge(previous_year_data[['site_code', '% moved out']], on='site_code', suffixes=('_current', '_prev'))
+
+        # Calculate the Y/Y change
+        merged_df['yoy_change'] = merged_df['% moved out_current'] - merged_df['% moved out_prev']
+
+        merged_df = merged_df[~merged_df['yoy_change'].isna()]
+        # Sort the dataframe by 'yoy_change'
+        sorted_df = merged_df.sort_values(by='yoy_change', ascending=False)
+
+        return sorted_df
+
+    @timed()
+    def prepare_binned_data(self, data, x_field, num_bins=30, density=False, bandwidth=None):
+        """
+        Compute histogram bins and, optionally, a KDE curve server-side.
+
+        Only bin counts and a fixed-resolution density curve are returned, so the
+        chart payload does not grow with the number of input rows. `data` is not modified.
+
+        Parameters:
+        - data (pd.DataFrame): Data for the histogram.
+        - x_field (str): Field to bin.
+        - num_bins (int, optional): Number of bins. Defaults to 30.
+        - density (bool, optional): Also compute a KDE curve. Defaults to False.
+        - bandwidth (float, optional): KDE bandwidth. Defaults to Silverman's rule.
+
+        Returns:
+        - binned_data (pd.DataFrame): Bin centres (`x_field`) and `count`.
+        - density_data (pd.DataFrame | None): `x_field` and `scaled_density`, the KDE
+          scaled to expected counts per bin so it overlays the bars.
+        """
+        values = data[x_field].to_numpy()
+        binned_data, bin_width = histogram_frame(values, x_field, num_bins)
+        if not density:
+            return binned_data, None
+        grid, kde = kde_curve(values, bandwidth=bandwidth)
+        n = binned_data['count'].sum()
+        density_data = pd.DataFrame({x_field: grid, 'scaled_density': kde * n * bin_width})
+        return binned_data, density_data
+
+    @timed()
+    def plot_altair_histogram(self, data, x_field, title_text, x_title, y_title, bar_color="teal", num_bins=30, bar_width=15, density=False, bandwidth=None):
+        """
+        Create a histogram using Altair based on the provided data.
+        
+        Parameters:
+        - data (pd.DataFrame): Data for the histogram.
+        - x_field (str): Field to be used for the x-axis.
+        - title_text (str): Title for the histogram.
+        - density (bool, optional): Overlay a KDE curve computed server-side. Defaults to False.
+        - bandwidth (float, optional): KDE bandwidth. Defaults to Silverman's rule.
+        
+        Returns:
+        - chart: Altair histogram chart.
+        """
+        binned_data, density_data = self.prepare_binned_data(data, x_field, num_bins, density, bandwidth)
+
+        # Plot the histogram using Altair
+        chart = alt.Chart(binned_data).mark_bar(color=bar_color, size=bar_width).encode(
+            x=alt.X(f'{x_field}:Q', title=x_title, axis=alt.Axis(grid=False)),
+            y=alt.Y('count:Q', title=y_title, axis=alt.Axis(grid=False)),
+            tooltip=[x_field, 'count']
+        )
+        # Density plot (like KDE)
+        if density_data is not None:
+            density_line = alt.Chart(density_data).mark_line(color='red').encode(
+                x=f'{x_field}:Q',
+                y=alt.Y('scaled_density:Q', axis=alt.Axis(grid=False))
+            )
+
+            chart = (chart + density_line)
+        
+        chart = chart.interactive()
+        # Style the chart
+        styled_chart = self.style_chart(chart, title_text, width=600, height=400)
+        self.render(styled_chart, title_text)
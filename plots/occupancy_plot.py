@@ -0,0 +1,32 @@
+import altair as alt
+from instrumentation import timed
+from plots.base import BasePlot
+
+
+class OccupancyPlot(BasePlot):
+    def __init__(self):
+        super().__init__()
+
+    @timed()
+    def plot_daily_occupancy(self, data, title_text, y_field='area_occupancy', color='#2a9d8f'):
+        """
+        Line chart of daily occupancy.
+
+        Parameters:
+        - data (pd.DataFrame): `OccupancyEngine.daily_totals` result (date, occupants, occupied_area[, area_occupancy]).
+        - title_text (str): Chart title.
+        - y_field (str, optional): 'area_occupancy' (share of rentable sq ft) or 'occupants'. Defaults to 'area_occupancy'.
+        - color (str, optional): Line color.
+        """
+        share = y_field == 'area_occupancy'
+        tooltip = [alt.Tooltip('date:T', title='Date'), alt.Tooltip('occupants:Q', title='Occupants', format=',')]
+        if share:
+            tooltip.append(alt.Tooltip(f'{y_field}:Q', title='Occupied sq ft', format='.1%'))
+        chart = alt.Chart(data).mark_line(color=color).encode(
+            x=alt.X('date:T', title=None),
+            y=alt.Y(f'{y_field}:Q', title=None, scale=alt.Scale(zero=False),
+                    axis=alt.Axis(format='.0%' if share else ',')),
+            tooltip=tooltip,
+        )
+        styled_chart = self.style_chart(chart, title_text, width=False, height=False)
+        self.render(styled_chart.configure_view(stroke=None), title_text)
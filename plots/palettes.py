@@ -0,0 +1,66 @@
+"""
+Colour palettes for the charts, in plain Python.
+
+These reproduce the seaborn palettes the charts used, so pages no longer import
+seaborn and matplotlib (a few seconds of every cold start) for a list of hex codes.
+"""
+
+SERIES_START = '#5A9'
+# seaborn's dark_palette('#5A9') end colour: the HUSL hue of #5A9 at 15% of its saturation and lightness 15
+SERIES_END = (0.1380987286871388, 0.1505008502516578, 0.14725909688199193)
+LUT_SIZE = 256  # entries in matplotlib's colormap lookup table, which the palettes are sampled from
+
+
+def hex_to_rgb(color):
+    """
+    '#rgb' or '#rrggbb' -> (r, g, b) floats in [0, 1].
+    """
+    digits = color.lstrip('#')
+    if len(digits) == 3:
+        digits = ''.join(d * 2 for d in digits)
+    return tuple(int(digits[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def rgb_to_hex(rgb):
+    return '#' + ''.join(format(round(v * 255), '02x') for v in rgb)
+
+
+def _linspace(n):
+    # np.linspace(0, 1, n): multiples of one step, with the last value exactly 1
+    if n < 2:
+        return [0.0] * n
+    step = 1.0 / (n - 1)
+    return [i * step for i in range(n - 1)] + [1.0]
+
+
+def blend_palette(colors, n_colors):
+    """
+    `n_colors` evenly spaced colours blending through `colors`, as seaborn's blend_palette.
+
+    Like the matplotlib colormap seaborn builds, the blend is first tabulated at
+    LUT_SIZE points and each colour is read from the table, so the hex codes
+    match the seaborn palette exactly.
+
+    Parameters:
+    - colors (list): Hex strings or (r, g, b) tuples, spread evenly from first to last.
+    - n_colors (int): Number of colours.
+
+    Returns:
+    - palette (list of tuple): (r, g, b) floats.
+    """
+    anchors = [hex_to_rgb(c) if isinstance(c, str) else tuple(c) for c in colors]
+    segments = len(anchors) - 1
+    table = []
+    for x in _linspace(LUT_SIZE):
+        i = min(int(x * segments), segments - 1)
+        t = x * segments - i
+        lo, hi = anchors[i], anchors[i + 1]
+        table.append(tuple(min(1.0, max(0.0, a + t * (b - a))) for a, b in zip(lo, hi)))
+    return [table[min(int(x * LUT_SIZE), LUT_SIZE - 1)] for x in _linspace(int(n_colors))]
+
+
+def series_palette(n_colors):
+    """
+    Hex colours for `n_colors` line series: seaborn's "dark:#5A9_r", teal fading to dark grey.
+    """
+    return [rgb_to_hex(c) for c in blend_palette([SERIES_START, SERIES_END], n_colors)]
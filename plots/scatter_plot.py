@@ -0,0 +1,66 @@
+import altair as alt
+import numpy as np
+from instrumentation import timed
+from plots.base import BasePlot
+from schemas import align_site_codes
+
+
+class ScatterPlot(BasePlot):
+    def __init__(self):
+        super().__init__()
+
+    @timed()
+    def prepare_scatter_data(self, data, pred_moveouts_df, end_date):
+        """
+        Prepare data for the scatterplot based on the provided end date.
+        
+        Parameters:
+        - move_out_df (pd.DataFrame): DataFrame with move-out data.
+        - pred_moveouts_df (pd.DataFrame): DataFrame with predicted move-outs (see ForecastEngine.predict).
+        - end_date (datetime): End date for the desired range.
+        
+        Returns:
+        - merged_scatter_data (pd.DataFrame): DataFrame prepared for scatter plotting.
+        """
+        
+        # Filter move_out_df for the given end_date
+        filtered_data = data[data['date'] == end_date]
+
+        # Merge the filtered data with predicted move-outs, on shared site code categories
+        filtered_data, pred_moveouts_df = align_site_codes(filtered_data, pred_moveouts_df)
+        merged_scatter_data = filtered_data[['site_code', '% moved out', 'move_outs']].merge(pred_moveouts_df, on='site_code')
+        # a site forecast at 0 move outs (a clipped negative rate) has no % difference rather than ±inf
+        predicted = merged_scatter_data['predicted_moveouts'].replace(0, np.nan)
+        merged_scatter_data['percentage_difference'] = 100 * (merged_scatter_data['move_outs'] - predicted) / predicted
+
+        return merged_scatter_data
+
+    @timed()
+    def plot_altair_scatterplot(self, data, x_field, y_field, title_text, color_palette="teals", x_title='% Moved Out',
+                                y_title='% Difference (Actual - Pred) / Pred', tooltip=None):
+        """
+        Create a scatterplot using Altair based on the provided data.
+        
+        Parameters:
+        - data (pd.DataFrame): Data for the scatterplot.
+        - x_field (str): Field to be used for the x-axis.
+        - y_field (str): Field to be used for the y-axis.
+        - title_text (str): Title for the scatterplot.
+        - color_palette (str, optional): Color palette for the scatterplot. Defaults to None.
+        - x_title, y_title (str, optional): Axis titles.
+        - tooltip (list, optional): Tooltip fields. Defaults to the x and y fields.
+        
+        Returns:
+        - chart: Altair scatterplot chart.
+        """
+        # Define the scatterplot chart
+        chart = alt.Chart(data).mark_circle().encode(
+            x=alt.X(f'{x_field}:Q', title=x_title),
+            y=alt.Y(f'{y_field}:Q', title=y_title),
+            color=alt.Color(scale=alt.Scale(scheme=color_palette)),
+            tooltip=tooltip or [x_field, y_field]
+        )
+
+        # Style the chart
+        styled_chart = self.style_chart(chart, title_text, width=600, height=400)
+        self.render(styled_chart, title_text)
@@ -0,0 +1,52 @@
+import altair as alt
+from instrumentation import timed
+from plots.base import BasePlot
+from plots.palettes import series_palette
+from survival import survival_table, survival_bands
+
+
+class SurvivalPlot(BasePlot):
+    @timed()
+    def prepare_survival_data(self, df, start_time_column, group_column='model'):
+        """
+        Kaplan-Meier curves for every group in one vectorized pass (see survival.survival_table).
+        """
+        return survival_table(df, start_time_column, group_column=group_column)
+
+    @timed()
+    def plot_altair_chart(self, df, start_time_column, title_text, group_column='model', bands=False, **bootstrap):
+        """
+        Plot survival curves fitted from the raw rows. With `bands`, bootstrap confidence
+        bands are drawn behind them (`bootstrap` goes to survival.bootstrap_bands).
+        """
+        data = self.prepare_survival_data(df, start_time_column, group_column)
+        band_data = survival_bands(df, start_time_column, group_column, **bootstrap) if bands else None
+        self.plot_survival_curves(data, title_text, group_column, band_data)
+
+    @timed()
+    def plot_altair_window(self, survival_index, start_date, end_date, title_text, bands=None):
+        """
+        Plot survival curves for a start-date window from a precomputed SurvivalIndex,
+        without refitting from the raw rows. `bands` is an optional `SurvivalIndex.bands` frame.
+        """
+        data = survival_index.window(start_date, end_date)
+        self.plot_survival_curves(data, title_text, survival_index.group_column, bands)
+
+    def plot_survival_curves(self, data, title_text, group_column='model', bands=None):
+        unique_models = data[group_column].unique()
+        hex_palette = series_palette(len(unique_models))
+        y_min = data['% Survived'].min() if bands is None else min(data['% Survived'].min(), bands['lower'].min())
+        x_max = min(180, data['Days'].max())
+
+        chart = self.plot_data_with_tooltip(data, 'Days', '% Survived', group_column, hex_palette, x_scale=[0, x_max], y_scale=[y_min, 1])
+        if bands is not None:
+            # shaded bands behind the curves, in the same colour per group
+            band = alt.Chart(bands).mark_area(opacity=0.2, clip=True).encode(
+                x=alt.X('Days:Q', scale=alt.Scale(domain=[0, x_max]), title=None),
+                y=alt.Y('lower:Q', scale=alt.Scale(domain=[y_min, 1]), title=None),
+                y2='upper:Q',
+                color=alt.Color(f'{group_column}:N', scale=alt.Scale(range=hex_palette), legend=None),
+            )
+            chart = alt.layer(band, chart)
+        styled_chart = self.style_chart(chart, title_text)
+        self.render(styled_chart, title_text)
@@ -0,0 +1,90 @@
+import datetime
+
+import pandas as pd
+from query_cache import DEFAULT_TTL
+from sql_queries import facilities_sql, move_outs_range, occupants_range, run_sql_query
+
+HISTORY_START = datetime.date(2019, 5, 31)
+EXCLUDED_FACILITY_IDS = [48]
+
+# facilities.fund codes, as labelled by facilities_sql
+FUNDS = {0: 'FAM1', 1: 'FAM2', 2: 'FAM3', 3: 'FAM4', 4: 'Inland', 5: 'RDH II', 6: 'RDH III', 7: 'RDH IV', 8: 'SPH', 9: 'FAM5'}
+FUND_CODES = {label: code for code, label in FUNDS.items()}
+
+QUERIES = {
+    'move_outs': move_outs_range,
+    'occupants': occupants_range,
+    'facilities': facilities_sql,
+}
+DATE_BOUNDED = {'move_outs', 'occupants'}
+
+
+def _as_list(values):
+    if values is None:
+        return None
+    if isinstance(values, (str, int)):
+        values = [values]
+    return sorted(set(values))
+
+
+def _as_date(value, default):
+    return (pd.Timestamp(value).date() if value is not None else default).isoformat()
+
+
+def facility_params(site_codes=None, regions=None, funds=None, excluded_facility_ids=None):
+    """
+    Bound parameters for `sql_queries.facility_filter`.
+
+    Parameters:
+    - site_codes (str | list, optional): Site codes to keep. Defaults to every site.
+    - regions (str | list, optional): Region names (`regions.name`) to keep.
+    - funds (str | int | list, optional): Fund labels ('FAM1', 'SPH', ...) or `facilities.fund` codes.
+    - excluded_facility_ids (list, optional): Facility ids always left out. Defaults to EXCLUDED_FACILITY_IDS.
+
+    Returns:
+    - params (dict): Parameter dict; lists are sorted so equal filters share a cache entry.
+    """
+    funds = _as_list(funds)
+    if funds is not None:
+        unknown = [f for f in funds if not isinstance(f, int) and f not in FUND_CODES]
+        if unknown:
+            raise ValueError(f'Unknown fund(s): {unknown}')
+        funds = sorted({f if isinstance(f, int) else FUND_CODES[f] for f in funds})
+    return {
+        'site_codes': _as_list(site_codes),
+        'regions': _as_list(regions),
+        'funds': funds,
+        'excluded_facility_ids': sorted(EXCLUDED_FACILITY_IDS if excluded_facility_ids is None else excluded_facility_ids),
+    }
+
+
+def build_query(name, start_date=None, end_date=None, **filters):
+    """
+    SQL text and bound parameters for one of QUERIES with its filters pushed into the query.
+
+    Parameters:
+    - name (str): 'move_outs', 'occupants' or 'facilities'.
+    - start_date (date, optional): First month (move_outs / occupants). Defaults to HISTORY_START.
+    - end_date (date, optional): Last month (move_outs / occupants). Defaults to today.
+    - **filters: `facility_params` arguments (site_codes, regions, funds, excluded_facility_ids).
+
+    Returns:
+    - (sql_query, params) (tuple): Ready for `run_sql_query` / `fetch_sql_query`.
+    """
+    if name not in QUERIES:
+        raise ValueError(f'Unknown query {name!r}; expected one of {sorted(QUERIES)}')
+    params = facility_params(**filters)
+    if name in DATE_BOUNDED:
+        params['start_date'] = _as_date(start_date, HISTORY_START)
+        params['end_date'] = _as_date(end_date, datetime.date.today())
+    elif start_date is not None or end_date is not None:
+        raise ValueError(f'{name} does not take a date range')
+    return QUERIES[name], params
+
+
+def run_query(name, start_date=None, end_date=None, ttl=DEFAULT_TTL, **filters):
+    """
+    Run `build_query(...)` through `run_sql_query`, so results are cached per parameter set.
+    """
+    sql_query, params = build_query(name, start_date, end_date, **filters)
+    return run_sql_query(sql_query, params, ttl=ttl)
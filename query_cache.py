@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+from instrumentation import note
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'queries')
+DEFAULT_TTL = 60*60*24  # daily refresh
+
+
+def normalize_sql(sql_query):
+    """
+    Normalize SQL text so that formatting-only differences share a cache entry.
+
+    Line comments are dropped, whitespace is collapsed and any trailing semicolon
+    is removed. Case is preserved since string literals (e.g. site codes) are
+    case sensitive.
+    """
+    sql_query = re.sub(r'--[^\n]*', ' ', sql_query)
+    sql_query = re.sub(r'\s+', ' ', sql_query).strip()
+    return sql_query.rstrip(';').strip()
+
+
+def cache_key(sql_query, params=None):
+    """
+    Build a stable key from the normalized SQL text and its bound parameters.
+
+    Parameters:
+    - sql_query (str): SQL text.
+    - params (dict | list | tuple, optional): Parameters bound to the query.
+
+    Returns:
+    - key (str): Hex digest identifying the query + parameter set.
+    """
+    payload = json.dumps({'sql': normalize_sql(sql_query), 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class QueryCache():
+    """
+    Result cache for SQL queries stored on local disk as Parquet.
+
+    Every entry is a `<key>.parquet` file holding the result and a `<key>.json`
+    sidecar recording when it was fetched. Entries survive process restarts, so
+    a fresh server warm-starts from whatever was already fetched as long as the
+    entry is younger than the TTL requested by the caller.
+    """
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.parquet', base + '.json'
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def read_meta(self, key):
+        _, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key, ttl=DEFAULT_TTL):
+        """
+        Return the cached frame for `key`, or None if it is missing or older than `ttl` seconds.
+        """
+        data_path, _ = self._paths(key)
+        meta = self.read_meta(key)
+        if meta is None or not os.path.exists(data_path):
+            return None
+        if ttl is not None and time.time() - meta['fetched_at'] > ttl:
+            return None
+        try:
+            return pd.read_parquet(data_path)
+        except Exception as e:
+            logger.warning('Discarding unreadable cache entry %s: %s', key, e)
+            self.invalidate(key)
+            return None
+
+    def put(self, key, df, sql_query=None, params=None):
+        """
+        Write `df` to disk under `key`. Files are written to a temp path and
+        swapped in so readers in other processes never see a partial file.
+        """
+        data_path, meta_path = self._paths(key)
+        meta = {
+            'fetched_at': time.time(),
+            'rows': len(df),
+            'sql': normalize_sql(sql_query) if sql_query else None,
+            'params': json.loads(json.dumps(params, default=str)),
+        }
+        tmp_suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            df.to_parquet(data_path + tmp_suffix, index=False)
+            os.replace(data_path + tmp_suffix, data_path)
+            with open(meta_path + tmp_suffix, 'w') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + tmp_suffix, meta_path)
+        except Exception as e:
+            # an unserializable column shouldn't break the page, it just won't persist
+            logger.warning('Could not persist cache entry %s: %s', key, e)
+            for path in (data_path + tmp_suffix, meta_path + tmp_suffix):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def invalidate(self, key):
+        for path in self._paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(('.parquet', '.json')):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def get_or_fetch(self, sql_query, fetch, params=None, ttl=DEFAULT_TTL):
+        """
+        Serve `sql_query` from the cache, running `fetch(sql_query, params)` on a miss.
+
+        Parameters:
+        - sql_query (str): SQL text.
+        - fetch (callable): Function returning a DataFrame for (sql_query, params).
+        - params (dict | list | tuple, optional): Parameters bound to the query.
+        - ttl (int, optional): Maximum entry age in seconds. Defaults to one day.
+
+        Returns:
+        - df (pd.DataFrame): Query result.
+        """
+        key = cache_key(sql_query, params)
+        df = self.get(key, ttl)
+        if df is not None:
+            note(cache='disk')
+            return df
+        # only one thread per key goes to the database, the rest wait for its result
+        with self._lock_for(key):
+            df = self.get(key, ttl)
+            if df is not None:
+                note(cache='disk')
+                return df
+            df = fetch(sql_query, params)
+            self.put(key, df, sql_query, params)
+        note(cache='miss')
+        return df
+
+
+_default_cache = None
+_default_cache_guard = threading.Lock()
+
+
+def get_query_cache():
+    global _default_cache
+    with _default_cache_guard:
+        if _default_cache is None:
+            _default_cache = QueryCache()
+        return _default_cache
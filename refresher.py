@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+from instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+REFRESH_AHEAD = 0.8  # refresh once a dataset is 80% of the way to its ttl
+TICK = 30  # seconds between scheduler checks
+RETRY_AFTER = 5*60  # wait after a failed refresh before trying again
+MAX_WORKERS = 2
+
+
+class RefreshJob():
+    """
+    A registered dataset: how to refresh it, how long it stays fresh, and its last outcome.
+
+    Parameters:
+    - name (str): Dataset name.
+    - refresh (callable): Brings the dataset's caches up to date. Called with the
+      age in seconds above which data counts as due, so a replica that finds the
+      data was just refreshed by another process can skip the fetch.
+    - ttl (int): Seconds the data is meant to stay fresh.
+    - last_refreshed (callable, optional): Epoch seconds of the data currently
+      served, read from the cache itself so restarts and other replicas are seen.
+    """
+    def __init__(self, name, refresh, ttl, last_refreshed=None):
+        self.name = name
+        self.refresh = refresh
+        self.ttl = ttl
+        self.last_refreshed = last_refreshed
+        self.future = None
+        self.last_started = None
+        self.last_finished = None
+        self.last_success = None
+        self.last_duration = None
+        self.last_error = None
+        self.runs = 0
+
+
+class BackgroundRefresher():
+    """
+    Stale-while-revalidate scheduler for the app's cached datasets.
+
+    Pages read whatever version the caches hold and never wait on an expired
+    one. A daemon thread checks every TICK seconds, and any dataset older than
+    REFRESH_AHEAD x its ttl is refreshed on a small worker pool while the
+    previous version keeps being served. Refreshes are single-flight: triggering
+    a dataset that is already refreshing returns the running future.
+    """
+    def __init__(self, tick=TICK, refresh_ahead=REFRESH_AHEAD, max_workers=MAX_WORKERS):
+        self.tick = tick
+        self.refresh_ahead = refresh_ahead
+        self.jobs = {}
+        self._guard = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refresher')
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, name, refresh, ttl, last_refreshed=None):
+        """
+        Add a dataset (see RefreshJob). Registering an existing name replaces its definition.
+        """
+        with self._guard:
+            job = RefreshJob(name, refresh, ttl, last_refreshed)
+            old = self.jobs.get(name)
+            if old is not None:
+                job.future, job.runs = old.future, old.runs
+            self.jobs[name] = job
+        return job
+
+    def age(self, name):
+        """
+        Seconds since `name` was last refreshed, or None if it has never been.
+        """
+        job = self.jobs[name]
+        refreshed = None
+        if job.last_refreshed is not None:
+            try:
+                refreshed = job.last_refreshed()
+            except Exception as e:
+                logger.warning('Could not read refresh time of %s: %r', name, e)
+        refreshed = refreshed if refreshed is not None else job.last_success
+        return None if refreshed is None else time.time() - refreshed
+
+    def is_due(self, name):
+        job = self.jobs[name]
+        if job.last_error and time.time() - job.last_finished < RETRY_AFTER:
+            return False
+        age = self.age(name)
+        return age is None or age >= self.refresh_ahead * job.ttl
+
+    def _run(self, job):
+        job.last_started = time.time()
+        try:
+            with span(f'refresh:{job.name}'):
+                job.refresh(self.refresh_ahead * job.ttl)
+        except Exception as e:
+            job.last_error = repr(e)
+            logger.exception('Background refresh of %s failed', job.name)
+        else:
+            job.last_error = None
+            job.last_success = time.time()
+        finally:
+            job.last_finished = time.time()
+            job.last_duration = job.last_finished - job.last_started
+            job.runs += 1
+
+    def trigger(self, name):
+        """
+        Refresh `name` in the background unless a refresh is already running. Returns its future.
+        """
+        with self._guard:
+            job = self.jobs[name]
+            if job.future is None or job.future.done():
+                job.future = self._executor.submit(self._run, job)
+            return job.future
+
+    def check(self, names=None):
+        """
+        Trigger every due dataset among `names` (default: all) without waiting. Returns the triggered names.
+        """
+        triggered = []
+        for name in names or list(self.jobs):
+            if self.is_due(name):
+                self.trigger(name)
+                triggered.append(name)
+        return triggered
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception:
+                logger.exception('Refresh scheduler check failed')
+            self._stop.wait(self.tick)
+
+    def start(self):
+        with self._guard:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name='refresh-scheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        """
+        One row per dataset: state, age, time to next refresh and the last run's outcome.
+        """
+        rows = []
+        for name, job in list(self.jobs.items()):
+            age = self.age(name)
+            running = job.future is not None and not job.future.done()
+            rows.append({
+                'dataset': name,
+                'state': 'refreshing' if running else 'error' if job.last_error else 'ok' if age is not None else 'empty',
+                'age_s': None if age is None else round(age),
+                'next_refresh_in_s': None if age is None else round(max(0, self.refresh_ahead * job.ttl - age)),
+                'last_refresh_s': None if job.last_duration is None else round(job.last_duration, 2),
+                'last_finished': None if job.last_finished is None else pd.Timestamp(job.last_finished, unit='s').floor('s'),
+                'runs': job.runs,
+                'last_error': job.last_error,
+            })
+        return pd.DataFrame(rows)
+
+
+def register_app_datasets(refresher):
+    """
+    Register the datasets the pages read: month-end move outs, occupancy intervals (the
+    Move Ins cohorts and the Move Outs occupants), facilities, and the ECRI S3 files.
+    """
+    from query_cache import cache_key, get_query_cache
+    from cohort_engine import fetch_occupancy_intervals
+    from shared_store import get_shared_store
+    from snapshot_store import load_month_end_frame
+    from query_builder import build_query
+    from sql_queries import fetch_sql_query
+    from utils import ECRIS_BUCKET, ECRIS_KEY, ECRI_OCCS_KEY, fetch_ecris, s3_cache, s3_version
+
+    store = get_shared_store()
+
+    def shared_checked_at(name):
+        meta = store.current(name)
+        return meta['checked_at'] if meta else None
+
+    refresher.register(
+        'move_outs',
+        lambda due_age: store.load('move_outs', load_month_end_frame, ('move_outs',), ttl=due_age, sort_by='date'),
+        ttl=60*60, last_refreshed=lambda: shared_checked_at('move_outs'))
+
+    refresher.register(
+        'occupancy_intervals',
+        lambda due_age: store.load('occupancy_intervals', fetch_occupancy_intervals, ttl=due_age),
+        ttl=60*60, last_refreshed=lambda: shared_checked_at('occupancy_intervals'))
+
+    refresher.register(
+        'ecris',
+        lambda due_age: store.load('ecris', fetch_ecris, ttl=due_age, sort_by='notification_date',
+                                   version=lambda: s3_version(ECRIS_KEY, ECRIS_BUCKET, revalidate=True)),
+        ttl=60*15, last_refreshed=lambda: shared_checked_at('ecris'))
+
+    def s3_checked_at(key):
+        meta = s3_cache().read_meta(ECRIS_BUCKET, key)
+        return meta['checked_at'] if meta else None
+
+    refresher.register(
+        'ecri_occs',
+        lambda due_age: s3_cache().fetch(ECRIS_BUCKET, ECRI_OCCS_KEY),
+        ttl=60*15, last_refreshed=lambda: s3_checked_at(ECRI_OCCS_KEY))
+
+    query_cache = get_query_cache()
+
+    def query_fetched_at(sql_query, params):
+        meta = query_cache.read_meta(cache_key(sql_query, params))
+        return meta['fetched_at'] if meta else None
+
+    # same (sql, params) as the pages' run_query('facilities'), so both share one cache entry
+    facilities_query, facilities_params = build_query('facilities')
+    refresher.register(
+        'facilities_sql',
+        lambda due_age: query_cache.get_or_fetch(facilities_query, fetch_sql_query, params=facilities_params, ttl=due_age),
+        ttl=60*60*24, last_refreshed=lambda: query_fetched_at(facilities_query, facilities_params))
+    return refresher
+
+
+_default_refresher = None
+_default_refresher_guard = threading.Lock()
+
+
+def get_refresher():
+    """
+    The process-wide refresher with the app datasets registered, started on first use.
+    """
+    global _default_refresher
+    with _default_refresher_guard:
+        if _default_refresher is None:
+            _default_refresher = register_app_datasets(BackgroundRefresher())
+        return _default_refresher.start()
+
+
+def render_refresh_status():
+    """
+    Admin-only sidebar table of each dataset's refresh state.
+    """
+    if not st.session_state.get('valid_password'):
+        return
+    with st.sidebar.expander('Data refresh'):
+        st.dataframe(get_refresher().status(), hide_index=True)
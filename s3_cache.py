@@ -0,0 +1,176 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from instrumentation import note
+
+logger = logging.getLogger(__name__)
+
+S3_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 's3')
+CHUNK_SIZE = 1 << 20
+
+
+@contextlib.contextmanager
+def _replacing(path, mode):
+    """
+    Write to a temporary file next to `path` and move it into place on success.
+
+    The temporary name is unique (`tempfile.mkstemp`), so processes sharing the
+    cache directory (e.g. several replicas on one host) never write the same file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class S3ObjectCache():
+    """
+    Local disk cache of S3 objects validated by ETag.
+
+    Objects are stored under `<cache_dir>/<hash of bucket/key>/<etag>.bin` with a
+    `meta.json` describing the current version. A cached object is revalidated
+    with a conditional GET (`IfNoneMatch=<etag>`): S3 answers 304 when it is
+    unchanged and the file on disk is served, otherwise the new body is streamed
+    to disk in chunks and replaces the old version.
+
+    The client is passed in so the cache can be exercised against a local S3
+    stand-in (e.g. a moto mocked client). boto3 clients are thread-safe, so one
+    instance is shared across threads.
+    """
+    def __init__(self, client, cache_dir=S3_CACHE_DIR, revalidate_after=0):
+        """
+        Parameters:
+        - client: boto3 S3 client.
+        - cache_dir (str, optional): Directory holding cached objects.
+        - revalidate_after (int, optional): Seconds after a successful check during
+          which a cached object is served without contacting S3. Defaults to 0.
+        """
+        self.client = client
+        self.cache_dir = cache_dir
+        self.revalidate_after = revalidate_after
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_downloaded': 0}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _object_dir(self, bucket, key):
+        digest = hashlib.sha256(f'{bucket}/{key}'.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.cache_dir, digest)
+
+    def _lock_for(self, bucket, key):
+        with self._locks_guard:
+            return self._locks.setdefault((bucket, key), threading.Lock())
+
+    def read_meta(self, bucket, key):
+        try:
+            with open(os.path.join(self._object_dir(bucket, key), 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(meta['path']):
+            return None
+        return meta
+
+    def _write_meta(self, bucket, key, meta):
+        path = os.path.join(self._object_dir(bucket, key), 'meta.json')
+        with _replacing(path, 'w') as f:
+            json.dump(meta, f)
+
+    def _store(self, bucket, key, obj):
+        """
+        Stream a GetObject response body to disk and record it as the current version.
+        """
+        obj_dir = self._object_dir(bucket, key)
+        os.makedirs(obj_dir, exist_ok=True)
+        etag = obj['ETag'].strip('"')
+        path = os.path.join(obj_dir, f'{etag}.bin')
+        size = 0
+        with _replacing(path, 'wb') as out:
+            for chunk in obj['Body'].iter_chunks(CHUNK_SIZE):
+                out.write(chunk)
+                size += len(chunk)
+
+        old = self.read_meta(bucket, key)
+        meta = {
+            'bucket': bucket,
+            'key': key,
+            'etag': etag,
+            'path': path,
+            'size': size,
+            'content_encoding': obj.get('ContentEncoding'),
+            'checked_at': time.time(),
+        }
+        self._write_meta(bucket, key, meta)
+        if old is not None and old['path'] != path and os.path.exists(old['path']):
+            os.remove(old['path'])
+        self.stats['misses'] += 1
+        self.stats['bytes_downloaded'] += size
+        note(cache='miss', bytes=size)
+        return meta
+
+    def fetch(self, bucket, key):
+        """
+        Return metadata (including the local `path`) for the current version of an object.
+
+        Parameters:
+        - bucket (str): S3 bucket.
+        - key (str): Object key.
+
+        Returns:
+        - meta (dict): `path`, `etag`, `size`, `content_encoding` and `checked_at`.
+        """
+        with self._lock_for(bucket, key):
+            return self._fetch(bucket, key)
+
+    def _fetch(self, bucket, key):
+        # callers hold the object's lock
+        meta = self.read_meta(bucket, key)
+        if meta is None:
+            return self._store(bucket, key, self.client.get_object(Bucket=bucket, Key=key))
+
+        if time.time() - meta['checked_at'] < self.revalidate_after:
+            self.stats['hits'] += 1
+            note(cache='disk')
+            return meta
+
+        try:
+            obj = self.client.get_object(Bucket=bucket, Key=key, IfNoneMatch=f'"{meta["etag"]}"')
+        except ClientError as e:
+            status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            if status != 304 and e.response.get('Error', {}).get('Code') not in ('304', 'NotModified'):
+                raise
+            meta['checked_at'] = time.time()
+            self._write_meta(bucket, key, meta)
+            self.stats['hits'] += 1
+            note(cache='etag')
+            return meta
+        return self._store(bucket, key, obj)
+
+    def open(self, bucket, key):
+        """
+        Open the cached copy of an object for binary reading, revalidating it first.
+        Returns the open file and its metadata.
+
+        The file is opened under the object's lock, so another thread storing a new
+        version cannot remove it first. Another process sharing the cache directory
+        still can; the object is then fetched again.
+        """
+        with self._lock_for(bucket, key):
+            meta = self._fetch(bucket, key)
+            try:
+                return open(meta['path'], 'rb'), meta
+            except FileNotFoundError:
+                meta = self._fetch(bucket, key)
+                return open(meta['path'], 'rb'), meta
@@ -0,0 +1,213 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+from instrumentation import note
+
+logger = logging.getLogger(__name__)
+
+# dtype specs:
+# - 'site_code': categorical over the process-wide site code set (see SiteCodeCategories)
+# - 'category': categorical over the column's own values
+# - 'int': smallest signed integer holding the values (nullable when there are nulls)
+# - 'float32' / 'float64': floats; money stays float64 so sums keep their cents
+# - 'datetime': datetime64
+# - 'bool': bool (nullable 'boolean' when there are nulls); 't'/'true'/'1' strings are parsed
+SCHEMAS = {
+    'move_outs': {
+        'date': 'datetime',
+        'site_code': 'site_code',
+        'area_move_out': 'float32',
+        'move_outs': 'int',
+        'move_out_rate': 'float64',
+    },
+    'occupants': {
+        'date': 'datetime',
+        'site_code': 'site_code',
+        'occupants': 'int',
+    },
+    'facilities': {
+        'facility_id': 'int',
+        'rd': 'site_code',
+        'acq_date': 'datetime',
+        'region': 'category',
+        'region_id': 'int',
+        'fund': 'category',
+        'fs': 'category',
+        'acquisition_date': 'datetime',
+        'age_of_facility': 'float32',
+        'city': 'category',
+        'state': 'category',
+        'latitude': 'float32',
+        'longitude': 'float32',
+        'nrsf': 'float32',
+        'same_store': 'bool',
+    },
+    'occupancy_intervals': {
+        'site_code': 'site_code',
+        'move_in_day': 'int',
+        'move_out_day': 'float32',  # NaN while still occupied
+        'area': 'float32',
+    },
+    'ecris': {
+        'notification_date': 'datetime',
+        'increase_date': 'datetime',
+        'moved_out_date': 'datetime',
+        'model': 'category',
+        'ecri_pending': 'bool',
+        'pending_increase_amount': 'float64',
+        'event_occurred': 'int',
+    },
+    'all_tenants': {
+        'site_code': 'site_code',
+        'id': 'int',
+        'occ_id': 'int',
+        'move_in_date': 'datetime',
+        'moved_out_at': 'datetime',
+        'moved_out': 'bool',
+        'tenancy': 'float32',
+        'autopay': 'bool',
+        'insurance_id': 'int',
+        'monthly_rate': 'float64',
+        'write_offs': 'float64',
+        'bad_debt': 'bool',
+    },
+}
+
+TRUE_STRINGS = {'true', 't', '1', 'yes', 'y'}
+INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+class SiteCodeCategories():
+    """
+    The site code category set shared by every dataset in the process.
+
+    Frames whose `site_code` columns carry the same CategoricalDtype merge and
+    group on the integer codes rather than by hashing strings. The set only grows:
+    new codes are added in sorted order, so frames built before a new site
+    appeared may hold an older dtype until `align_site_codes` brings them in line.
+    """
+    def __init__(self):
+        self._codes = pd.Index([], dtype=object)
+        self._dtype = pd.CategoricalDtype(self._codes)
+        self._guard = threading.Lock()
+
+    def dtype(self, values=()):
+        """
+        The shared CategoricalDtype, first extended with any codes in `values`.
+        """
+        values = values.categories if isinstance(values, pd.CategoricalDtype) else values
+        new = pd.Index(pd.unique(pd.Series(values, dtype=object).dropna())).difference(self._codes)
+        if len(new):
+            with self._guard:
+                self._codes = self._codes.union(new).sort_values()
+                self._dtype = pd.CategoricalDtype(self._codes)
+        return self._dtype
+
+
+_site_codes = SiteCodeCategories()
+
+
+def site_code_dtype(values=()):
+    return _site_codes.dtype(values)
+
+
+def _smallest_int(values):
+    lo, hi = values.min(), values.max()
+    for t in INT_TYPES:
+        info = np.iinfo(t)
+        if info.min <= lo and hi <= info.max:
+            return t
+    return np.int64
+
+
+def _convert(col, spec):
+    """
+    `col` converted to `spec`, or `col` itself when it already has a compact enough dtype.
+    """
+    dtype = col.dtype
+    if spec == 'site_code':
+        if isinstance(dtype, pd.CategoricalDtype):
+            site_code_dtype(dtype)  # register its codes; frames are aligned where they meet
+            return col
+        return col.astype(site_code_dtype(col.unique()))
+    if spec == 'category':
+        return col if isinstance(dtype, pd.CategoricalDtype) else col.astype('category')
+    if spec == 'datetime':
+        return col if pd.api.types.is_datetime64_any_dtype(dtype) else pd.to_datetime(col)
+    if spec == 'bool':
+        if pd.api.types.is_bool_dtype(dtype):
+            return col
+        if dtype == object or pd.api.types.is_string_dtype(dtype):
+            parsed = col.map(lambda v: v if pd.isnull(v) else str(v).strip().lower() in TRUE_STRINGS)
+        else:
+            parsed = col.where(col.isnull(), col != 0)
+        return parsed.astype('boolean') if parsed.isnull().any() else parsed.astype(bool)
+    if spec == 'int':
+        numeric = col if pd.api.types.is_numeric_dtype(dtype) else pd.to_numeric(col, errors='coerce')
+        valid = numeric.dropna()
+        if not len(valid) or (pd.api.types.is_float_dtype(numeric.dtype) and not (valid == np.floor(valid)).all()):
+            return numeric  # not integral; leave it as it is
+        target = _smallest_int(valid)
+        if len(valid) < len(numeric):
+            return numeric.astype(pd.api.types.pandas_dtype(target.__name__.capitalize()))
+        return numeric if numeric.dtype == target else numeric.astype(target)
+    if spec in ('float32', 'float64'):
+        if dtype == spec:
+            return col
+        return pd.to_numeric(col, errors='coerce').astype(spec)
+    raise ValueError(f'Unknown dtype spec {spec!r}')
+
+
+def apply_schema(df, name):
+    """
+    Convert the columns of `df` to the compact dtypes declared in SCHEMAS[name].
+
+    Columns the schema does not list are kept unchanged. When every column already
+    has its compact dtype the frame itself is returned, so frames read back from the
+    shared store are not copied on each call.
+
+    Parameters:
+    - df (pd.DataFrame): Loaded dataset.
+    - name (str): Key in SCHEMAS.
+
+    Returns:
+    - df (pd.DataFrame): Frame with compact dtypes (same attrs).
+    """
+    schema = SCHEMAS[name]
+    converted = {}
+    for column, spec in schema.items():
+        if column in df.columns:
+            original = df[column]
+            col = _convert(original, spec)
+            if col is not original:
+                converted[column] = col
+    if not converted:
+        return df
+
+    before = int(df.memory_usage(deep=True).sum())
+    out = pd.DataFrame({c: converted.get(c, df[c]) for c in df.columns}, index=df.index)
+    out.attrs.update(df.attrs)
+    after = int(out.memory_usage(deep=True).sum())
+    note(bytes_saved=before - after)
+    logger.info('Schema %s: %d rows, %.1f MB -> %.1f MB (%d column(s) converted)',
+                name, len(out), before / 1e6, after / 1e6, len(converted))
+    return out
+
+
+def align_site_codes(*frames, column='site_code'):
+    """
+    Give the `column` of every frame the current shared site code dtype, so merges
+    between them run on category codes. Frames already on that dtype are returned as-is.
+    """
+    dtype = site_code_dtype()
+    for df in frames:
+        if column in df.columns:
+            dtype = site_code_dtype(df[column].dtype if isinstance(df[column].dtype, pd.CategoricalDtype) else df[column].unique())
+    aligned = []
+    for df in frames:
+        if column in df.columns and df[column].dtype != dtype:
+            df = df.assign(**{column: df[column].astype(dtype)})
+        aligned.append(df)
+    return aligned
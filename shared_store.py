@@ -0,0 +1,246 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+from instrumentation import note, span
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: writers are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'shared')
+DEFAULT_TTL = 60*60
+KEEP_VERSIONS = 2
+SHARED_VERSION_ATTR = 'shared_version'
+
+
+def _normalize_table(table):
+    """
+    Cast to types pandas can view without copying: nanosecond timestamps (dates
+    included) and 32-bit offset strings, all in a single chunk.
+    """
+    fields = []
+    for field in table.schema:
+        t = field.type
+        if pa.types.is_date(t):
+            t = pa.timestamp('ns')
+        elif pa.types.is_timestamp(t) and t.unit != 'ns':
+            t = pa.timestamp('ns', tz=t.tz)
+        elif pa.types.is_large_string(t):
+            t = pa.string()
+        fields.append(pa.field(field.name, t))
+    return table.cast(pa.schema(fields)).combine_chunks().replace_schema_metadata(None)
+
+
+def _types_mapper(t):
+    # strings stay Arrow-backed (no per-process object arrays)
+    return pd.StringDtype('pyarrow') if t == pa.string() else None
+
+
+class SharedDatasetStore():
+    """
+    Datasets published once as Arrow IPC files and memory-mapped by every process.
+
+    Each dataset is written uncompressed to `<root>/<name>/<version>.arrow`, and
+    `current.json` points at the live version. Readers map that file read-only, so
+    every Streamlit process on the host shares one copy through the OS page cache
+    instead of holding its own. The resulting frames view the mapped buffers
+    directly for strings and for numeric and timestamp columns without nulls. Those
+    arrays are read-only, and frames are shared by every session of the process, so
+    callers filter them and never assign into them.
+
+    Refreshes are single-writer across processes (an flock on `<name>/.lock`).
+    Older versions are unlinked once superseded. Processes still mapping them keep
+    their pages until they switch to the new version.
+    """
+    def __init__(self, root=SHARED_DIR, keep_versions=KEEP_VERSIONS):
+        self.root = root
+        self.keep_versions = keep_versions
+        self._open = {}  # name -> (version, frame) mapped in this process
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _pointer_path(self, name):
+        return os.path.join(self._dir(name), 'current.json')
+
+    def current(self, name):
+        """
+        Metadata of the live version of `name` (`version`, `path`, `rows`, `checked_at`, ...), or None.
+        """
+        try:
+            with open(self._pointer_path(name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if os.path.exists(meta['path']) else None
+
+    def _write_pointer(self, name, meta):
+        path = self._pointer_path(name)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+        return meta
+
+    @contextlib.contextmanager
+    def _writer_lock(self, name):
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self._dir(name), '.lock'), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def publish(self, name, data, source_version=None, sort_by=None):
+        """
+        Write a new version of `name` and make it the live one.
+
+        Parameters:
+        - name (str): Dataset name.
+        - data (pd.DataFrame | pa.Table): Dataset contents.
+        - source_version (str, optional): Version of the source (e.g. an S3 ETag), used to skip
+          republishing unchanged data.
+        - sort_by (str, optional): Column to sort by before writing, nulls last, so readers
+          can range-slice without sorting their own copy.
+
+        Returns:
+        - meta (dict): Metadata of the published version.
+        """
+        os.makedirs(self._dir(name), exist_ok=True)
+        table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+        if sort_by is not None:
+            table = table.sort_by(sort_by)
+        table = _normalize_table(table)
+
+        version = str(time.time_ns())
+        path = os.path.join(self._dir(name), f'{version}.arrow')
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        os.replace(tmp, path)
+
+        now = time.time()
+        meta = self._write_pointer(name, {
+            'version': version,
+            'path': path,
+            'rows': table.num_rows,
+            'bytes': os.path.getsize(path),
+            'source_version': source_version,
+            'published_at': now,
+            'checked_at': now,
+        })
+        note(bytes=meta['bytes'])
+        logger.info('Published shared dataset %s v%s: %d rows, %d bytes', name, version, meta['rows'], meta['bytes'])
+        self._prune(name, path)
+        return meta
+
+    def _prune(self, name, live_path):
+        files = sorted(f for f in os.listdir(self._dir(name)) if f.endswith('.arrow'))
+        for f in files[:-self.keep_versions] if self.keep_versions else files:
+            path = os.path.join(self._dir(name), f)
+            if path == live_path:
+                continue
+            try:
+                os.remove(path)  # existing mappings stay valid after unlink
+            except OSError:
+                pass
+
+    def frame(self, name, meta=None):
+        """
+        The live version of `name` as a DataFrame over the memory-mapped file,
+        opened once per process and version.
+        """
+        meta = meta or self.current(name)
+        if meta is None:
+            raise FileNotFoundError(f'Shared dataset {name} has not been published')
+        opened = self._open.get(name)
+        if opened is not None and opened[0] == meta['version']:
+            note(cache='shared')
+            return opened[1]
+        with span(f'shared_store.map:{name}', rows=meta['rows']):
+            source = pa.memory_map(meta['path'], 'r')
+            table = pa.ipc.open_file(source).read_all()
+            df = table.to_pandas(split_blocks=True, types_mapper=_types_mapper)
+            df.attrs[SHARED_VERSION_ATTR] = meta['version']
+        self._open[name] = (meta['version'], df)
+        return df
+
+    def load(self, name, fetch, args=(), kwargs=None, ttl=DEFAULT_TTL, version=None, sort_by=None):
+        """
+        Return `name` from the shared store, refreshing it through `fetch` when older than `ttl`.
+
+        Only one process refreshes at a time; the others keep reading the live
+        version and pick up the new one on their next call.
+
+        Parameters:
+        - name (str): Dataset name.
+        - fetch (callable): Function returning the dataset as a DataFrame or Arrow table.
+        - args (tuple, optional): Positional arguments for `fetch`.
+        - kwargs (dict, optional): Keyword arguments for `fetch`.
+        - ttl (int, optional): Seconds before the data is checked again. Defaults to one hour.
+          None serves any published version (refreshing is then left to the background refresher).
+        - version (callable, optional): Returns the source's current version. When it matches
+          the live version's, the data is kept and only its check time is renewed.
+        - sort_by (str, optional): See `publish`.
+
+        Returns:
+        - df (pd.DataFrame): Read-only frame over the shared file.
+        """
+        meta = self.current(name)
+        if meta is not None and (ttl is None or time.time() - meta['checked_at'] <= ttl):
+            return self.frame(name, meta)
+        os.makedirs(self._dir(name), exist_ok=True)
+        with self._writer_lock(name):
+            meta = self.current(name)
+            if meta is None or (ttl is not None and time.time() - meta['checked_at'] > ttl):
+                source_version = version() if version is not None else None
+                if meta is not None and source_version is not None and meta.get('source_version') == source_version:
+                    meta = self._write_pointer(name, {**meta, 'checked_at': time.time()})
+                else:
+                    meta = self.publish(name, fetch(*args, **(kwargs or {})), source_version, sort_by)
+        return self.frame(name, meta)
+
+
+def shared_version(df):
+    """
+    Version of a frame returned by SharedDatasetStore, usable as a cache key in place of hashing the frame.
+    """
+    return df.attrs.get(SHARED_VERSION_ATTR)
+
+
+_default_store = None
+_default_store_guard = threading.Lock()
+
+
+def get_shared_store():
+    global _default_store
+    with _default_store_guard:
+        if _default_store is None:
+            _default_store = SharedDatasetStore()
+        return _default_store
+
+
+def load_shared_frame(name, fetch, args=(), kwargs=None, ttl=DEFAULT_TTL, version=None, sort_by=None):
+    """
+    `SharedDatasetStore.load` on the process-wide store.
+    """
+    return get_shared_store().load(name, fetch, args, kwargs, ttl=ttl, version=version, sort_by=sort_by)
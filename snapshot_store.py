@@ -0,0 +1,380 @@
+import datetime
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+from query_builder import facility_params
+from schemas import apply_schema
+from sql_queries import (fetch_sql_query, move_outs_range, occupants_range, occupancies_by_id,
+                         occupancies_changed_since, occupancy_ids)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'snapshots')
+HISTORY_START = datetime.date(2019, 5, 31)
+NO_UPDATES = '9999-12-31'
+# changes are looked for this far behind the stored watermark, so rows from transactions that
+# committed after it was read, with an older updated_at or id, are still picked up
+WATERMARK_OVERLAP = pd.Timedelta(hours=1)
+ID_OVERLAP = 1_000
+TRACKED_COLUMNS = ['id', 'unit_id', 'move_in_date', 'moved_out', 'moved_out_at', 'monthly_rate']
+
+
+def month_key(d):
+    return f'{d.year:04d}-{d.month:02d}'
+
+
+def month_start(d):
+    return datetime.date(d.year, d.month, 1)
+
+
+def month_number(dates):
+    """
+    Months since year 0 of each date, as floats with NaN for missing dates.
+    """
+    dates = pd.to_datetime(pd.Series(dates))
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.float64)
+
+
+def _month_date(number):
+    return datetime.date(int(number) // 12, int(number) % 12 + 1, 1)
+
+
+def tracked_rows(df):
+    """
+    `occupancies_changed_since` / `occupancies_by_id` rows in the dtypes the store keeps them in.
+    """
+    return pd.DataFrame({
+        'id': df['id'].astype(np.int64),
+        'unit_id': pd.to_numeric(df['unit_id']).astype(np.float64),
+        'move_in_date': pd.to_datetime(df['move_in_date']),
+        'moved_out': df['moved_out'].astype('boolean'),
+        'moved_out_at': pd.to_datetime(df['moved_out_at']),
+        'monthly_rate': pd.to_numeric(df['monthly_rate']).astype(np.float64),
+    })
+
+
+def _differs(old, new, columns):
+    # missing on both sides counts as equal
+    mask = np.zeros(len(old), dtype=bool)
+    for column in columns:
+        a, b = old[column], new[column]
+        same = (a == b).fillna(False).to_numpy(dtype=bool) | (a.isna() & b.isna()).to_numpy()
+        mask |= ~same
+    return mask
+
+
+def move_out_months(old, new, current):
+    """
+    Months of `move_outs` a change affects: the old and new move-out month of each row
+    whose unit, move-out date or rate changed.
+
+    Parameters:
+    - old, new (pd.DataFrame): Tracked rows before and after, aligned by id; all NaN
+      where a row was inserted (old) or deleted (new).
+    - current (int): Month number of the open month.
+
+    Returns:
+    - first, last (np.ndarray): Month numbers of the affected ranges, inclusive; NaN ranges are skipped.
+    """
+    changed = _differs(old, new, ['unit_id', 'moved_out_at', 'monthly_rate'])
+    months = np.concatenate([month_number(old['moved_out_at'])[changed], month_number(new['moved_out_at'])[changed]])
+    return months, months
+
+
+def _occupied_span(rows, current):
+    # months a row counts in, as in `occupants`: from its move-in through its move-out, or the open month
+    start = month_number(rows['move_in_date'])
+    staying = (rows['moved_out'] == False).fillna(False).to_numpy(dtype=bool)  # noqa: E712
+    end = np.where(staying, current, month_number(rows['moved_out_at']))
+    end = np.where(np.isnan(start), np.nan, end)
+    start = np.where(np.isnan(end), np.nan, start)  # moved out without a date: never counted
+    return start, end
+
+
+def occupied_months(old, new, current):
+    """
+    Months of `occupants` a change affects (see `move_out_months` for the arguments).
+
+    A row that changed unit, or appeared or disappeared, changes every month it
+    counts in under its old and new values. Otherwise only the months between its
+    old and new move-in, and between its old and new move-out, change.
+    """
+    changed = _differs(old, new, ['unit_id', 'move_in_date', 'moved_out', 'moved_out_at'])
+    old, new = old[changed], new[changed]
+    old_start, old_end = _occupied_span(old, current)
+    new_start, new_end = _occupied_span(new, current)
+    whole = (old['unit_id'] != new['unit_id']).to_numpy() | np.isnan(old_start) | np.isnan(new_start)
+    moved_in = ~whole & (old_start != new_start)
+    moved_end = ~whole & (old_end != new_end)
+    first = [np.where(whole, old_start, np.nan), np.where(whole, new_start, np.nan),
+             np.where(moved_in, np.fmin(old_start, new_start), np.nan), np.where(moved_end, np.fmin(old_end, new_end), np.nan)]
+    last = [np.where(whole, old_end, np.nan), np.where(whole, new_end, np.nan),
+            np.where(moved_in, np.fmax(old_start, new_start), np.nan), np.where(moved_end, np.fmax(old_end, new_end), np.nan)]
+    return np.concatenate(first), np.concatenate(last)
+
+
+# dataset -> function giving the months a set of occupancy changes affects
+TOUCHED_MONTHS = {
+    'move_outs': move_out_months,
+    'occupants': occupied_months,
+}
+
+
+class MonthEndSnapshotStore():
+    """
+    Incremental store for month-end datasets (`move_outs`, `occupants`).
+
+    Each dataset lives under `<root>/<name>/month=YYYY-MM/part.parquet`, next to a
+    state file keeping the `occupancies` watermark (max `updated_at` / max `id` /
+    row count) from its previous refresh, and `_occupancies.parquet`, the
+    TRACKED_COLUMNS of every occupancy as of that refresh.
+
+    A refresh reads the rows changed since the watermark (less WATERMARK_OVERLAP /
+    ID_OVERLAP) together with the current watermark, in one statement, and
+    compares them with the tracked copies. Only the months the differences affect
+    (see TOUCHED_MONTHS), the open month and month-ends never materialized are
+    recomputed, so an edit that leaves a dataset's columns alone (e.g. autopay)
+    recomputes nothing but the open month. When the row count does not add up,
+    the ids are reconciled: deleted rows are recomputed from their tracked
+    values, and rows the watermark missed are fetched by id.
+    """
+    def __init__(self, datasets, fetch, root=SNAPSHOT_DIR, history_start=HISTORY_START, touched_months=TOUCHED_MONTHS):
+        """
+        Parameters:
+        - datasets (dict): Dataset name -> month-bounded SQL taking `start_date`/`end_date` and `facility_params` params.
+        - fetch (callable): Function running (sql_query, params) and returning a DataFrame.
+        - root (str, optional): Directory holding the partitions.
+        - history_start (date, optional): First month-end to materialize.
+        - touched_months (dict, optional): Dataset name -> function giving the months a change affects.
+        """
+        self.datasets = datasets
+        self.fetch = fetch
+        self.root = root
+        self.history_start = history_start
+        self.touched_months = touched_months
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def state_path(self, name):
+        return os.path.join(self.root, name, '_state.json')
+
+    def tracked_path(self, name):
+        return os.path.join(self.root, name, '_occupancies.parquet')
+
+    def read_state(self, name):
+        try:
+            with open(self.state_path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_state(self, name, state):
+        path = self.state_path(name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f, default=str)
+        os.replace(path + '.tmp', path)
+
+    def read_tracked(self, name):
+        try:
+            return tracked_rows(pd.read_parquet(self.tracked_path(name)))
+        except (OSError, ValueError):
+            return None
+
+    def _write_tracked(self, name, df):
+        path = self.tracked_path(name)
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    def _lock_for(self, name):
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def partition_dir(self, name, month):
+        return os.path.join(self.root, name, f'month={month}')
+
+    def stored_months(self, name):
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(path):
+            return []
+        return sorted(d.split('=', 1)[1] for d in os.listdir(path) if d.startswith('month=') and not d.endswith('.tmp'))
+
+    def _write_partitions(self, name, df, months):
+        """
+        Replace the partitions for `months` with the matching rows of `df`. Months
+        with no rows still get an empty partition so they count as materialized.
+        """
+        dates = pd.to_datetime(df['date'])
+        keys = dates.dt.strftime('%Y-%m')
+        for month in months:
+            part = df[keys == month]
+            path = self.partition_dir(name, month)
+            tmp = path + '.tmp'
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            part.to_parquet(os.path.join(tmp, 'part.parquet'), index=False)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp, path)
+
+    def _changes(self, tracked, changed, n_rows):
+        """
+        Old and new tracked values of every changed, inserted or deleted occupancy,
+        aligned by id, and the tracked rows updated with them.
+        """
+        tracked = tracked.set_index('id')
+        changed = changed.set_index('id')
+        deleted = pd.Index([], dtype=np.int64)
+        if n_rows != len(tracked) + len(changed.index.difference(tracked.index)):
+            # rows were deleted, or inserted out of sight of the watermark
+            ids = pd.Index(self.fetch(occupancy_ids, None)['id'].astype(np.int64))
+            deleted = tracked.index.difference(ids)
+            unseen = ids.difference(tracked.index).difference(changed.index)
+            if len(unseen):
+                found = tracked_rows(self.fetch(occupancies_by_id, {'ids': [int(i) for i in unseen]}))
+                changed = pd.concat([changed, found.set_index('id')])
+            logger.info('Snapshot: reconciled occupancy ids, %d deleted, %d unseen', len(deleted), len(unseen))
+        ids = changed.index.union(deleted)
+        old = tracked.reindex(ids)
+        new = changed.reindex(ids)
+        kept = tracked.drop(ids.intersection(tracked.index))
+        parts = [df for df in (kept, changed) if len(df)]
+        tracked = pd.concat(parts).sort_index() if parts else kept
+        return old, new, tracked.reset_index()
+
+    def _due_months(self, name, old, new, today):
+        """
+        Month numbers to recompute: the months the changes affect, the open month and
+        every month after the last one stored.
+        """
+        first = int(month_number([month_start(self.history_start)])[0])
+        current = int(month_number([today])[0])
+        # +1 / -1 at the edges of each affected range, so a cumulative sum marks every month in one
+        edges = np.zeros(current - first + 2, dtype=np.int64)
+        lo, hi = self.touched_months[name](old, new, current)
+        with np.errstate(invalid='ignore'):
+            keep = (lo <= hi) & (hi >= first) & (lo <= current)  # False for NaN ranges
+        lo = np.clip(lo[keep], first, current).astype(np.int64) - first
+        hi = np.clip(hi[keep], first, current).astype(np.int64) - first
+        np.add.at(edges, lo, 1)
+        np.add.at(edges, hi + 1, -1)
+        due = np.cumsum(edges)[:-1] > 0
+
+        stored = self.stored_months(name)
+        last = int(month_number([datetime.date.fromisoformat(stored[-1] + '-01')])[0]) if stored else first - 1
+        due[max(0, min(last + 1, current) - first):] = True  # the open month and month-ends never materialized
+        return first + np.flatnonzero(due)
+
+    def _recompute(self, name, months, today):
+        """
+        Query and write `months` (month numbers), one query per run of consecutive months.
+        """
+        breaks = np.flatnonzero(np.diff(months) != 1) + 1
+        for run in np.split(months, breaks):
+            start = _month_date(run[0])
+            end = min((pd.Timestamp(_month_date(run[-1])) + pd.offsets.MonthEnd(0)).date(), today)
+            params = {**facility_params(), 'start_date': start.isoformat(), 'end_date': end.isoformat()}
+            df = self.fetch(self.datasets[name], params)
+            self._write_partitions(name, df, [month_key(_month_date(m)) for m in run])
+
+    def refresh(self, names=None, today=None):
+        """
+        Bring datasets up to date and return {name: months recomputed}.
+
+        Parameters:
+        - names (list, optional): Datasets to refresh. Defaults to all of them.
+        - today (date, optional): Date the open month is taken from. Defaults to today.
+        """
+        today = today or datetime.date.today()
+        recomputed = {}
+        for name in names or list(self.datasets):
+            with self._lock_for(name):
+                os.makedirs(os.path.join(self.root, name), exist_ok=True)
+                state = self.read_state(name)
+                tracked = self.read_tracked(name)
+                # partitions built with other facility filters (e.g. before exclusions were pushed down) are all stale
+                full = (state is None or tracked is None or not self.stored_months(name)
+                        or state.get('filters') != facility_params())
+                if full:
+                    tracked = tracked_rows(pd.DataFrame(columns=TRACKED_COLUMNS))
+                    params = {'updated_at': NO_UPDATES, 'id': -1}
+                else:
+                    watermark = state['watermark']
+                    updated_at = watermark.get('updated_at')
+                    params = {
+                        'updated_at': (pd.Timestamp(updated_at) - WATERMARK_OVERLAP).isoformat() if updated_at else NO_UPDATES,
+                        'id': max(0, int(watermark.get('id') or 0) - ID_OVERLAP),
+                    }
+                changes = self.fetch(occupancies_changed_since, params)
+                summary = changes.iloc[0]
+                old, new, tracked = self._changes(tracked, tracked_rows(changes.dropna(subset=['id'])), int(summary['n_rows']))
+
+                if full:
+                    first = int(month_number([month_start(self.history_start)])[0])
+                    months = np.arange(first, int(month_number([today])[0]) + 1)
+                else:
+                    months = self._due_months(name, old, new, today)
+                self._recompute(name, months, today)
+                keys = [month_key(_month_date(m)) for m in months]
+                logger.info('Snapshot %s: recomputed %d month(s), %d occupancies changed', name, len(keys), len(new))
+
+                self._write_tracked(name, tracked)
+                self.write_state(name, {
+                    'watermark': {
+                        'updated_at': None if pd.isnull(summary['max_updated_at']) else str(summary['max_updated_at']),
+                        'id': None if pd.isnull(summary['max_id']) else int(summary['max_id']),
+                        'n_rows': int(summary['n_rows']),
+                    },
+                    'refreshed_at': datetime.datetime.now().isoformat(),
+                    'open_month': month_key(today),
+                    'filters': facility_params(),
+                })
+                recomputed[name] = keys
+        return recomputed
+
+    def rebuild(self, names=None, today=None):
+        """
+        Drop the stored state and recompute every month.
+        """
+        for name in names or list(self.datasets):
+            with self._lock_for(name):
+                if os.path.exists(self.state_path(name)):
+                    os.remove(self.state_path(name))
+        return self.refresh(names, today)
+
+    def load(self, name):
+        """
+        Concatenate every stored month of `name` into one frame, oldest month first.
+        """
+        parts = [pd.read_parquet(os.path.join(self.partition_dir(name, m), 'part.parquet'))
+                 for m in self.stored_months(name)]
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
+
+
+def default_snapshot_store():
+    return MonthEndSnapshotStore({'move_outs': move_outs_range, 'occupants': occupants_range}, fetch_sql_query)
+
+
+def load_month_end_frame(name, store=None):
+    """
+    Refresh one snapshot dataset ('move_outs' or 'occupants') and return its full frame,
+    with the compact dtypes of its schema.
+    """
+    store = store or default_snapshot_store()
+    store.refresh([name])
+    return apply_schema(store.load(name), name)
+
+
+def load_month_end_frames(store=None):
+    """
+    Refresh the snapshot store and return the (move_out_monthly, occs) frames `prep_data` expects.
+    """
+    store = store or default_snapshot_store()
+    return load_month_end_frame('move_outs', store), load_month_end_frame('occupants', store)
@@ -1,74 +1,234 @@
+import os
+import threading
 import psycopg2 
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
 from dotenv import load_dotenv
 import streamlit as st 
-
-HOST = st.secrets["POSTGRES_HOST"]
-DB = st.secrets["POSTGRES_DB"]
-PORT = st.secrets["POSTGRES_PORT"]
-USER = st.secrets["POSTGRES_USER"]
-PASSWORD = st.secrets["POSTGRES_PASSWORD"]
-
+from query_cache import get_query_cache, DEFAULT_TTL
+from instrumentation import timed
 
 def get_sql_connection():
+    # secrets are read on connect so the query strings can be imported offline (e.g. by benchmarks)
     conn = psycopg2.connect(
-        host=HOST,
-        database=DB,
-        port=PORT,
-        user=USER,
-        password=PASSWORD
+        host=st.secrets["POSTGRES_HOST"],
+        database=st.secrets["POSTGRES_DB"],
+        port=st.secrets["POSTGRES_PORT"],
+        user=st.secrets["POSTGRES_USER"],
+        password=st.secrets["POSTGRES_PASSWORD"]
     )
 
     return conn 
 
-st.cache_data(ttl=60*60*24)
-def run_sql_query(sql_query):
+def fetch_sql_query(sql_query, params=None):
     conn = get_sql_connection()
-    df = pd.read_sql_query(sql_query, conn)
-    conn.close()
-    
+    try:
+        df = pd.read_sql_query(sql_query, conn, params=params)
+    finally:
+        conn.close()
+
     return df 
 
-move_outs = """
+COPY_BLOCK_SIZE = 1 << 22  # bytes of CSV parsed per Arrow batch
+
+def fetch_sql_arrow(sql_query, params=None, column_types=None, block_size=COPY_BLOCK_SIZE):
+    """
+    Stream a query out of Postgres with `COPY (query) TO STDOUT` into an Arrow table.
+
+    The server writes CSV into a pipe from a background thread while pyarrow
+    parses it batch by batch, so no Python row tuples are ever built and the
+    working set beyond the result itself is about one `block_size` chunk.
+
+    Parameters:
+    - sql_query (str): SQL text (a single SELECT).
+    - params (dict | tuple, optional): Parameters bound to the query.
+    - column_types (dict, optional): Column name -> pyarrow type; other columns are inferred.
+    - block_size (int, optional): Bytes of CSV per parsed batch.
+
+    Returns:
+    - table (pa.Table): Query result.
+    """
+    conn = get_sql_connection()
+    try:
+        with conn.cursor() as cur:
+            if params is not None:
+                sql_query = cur.mogrify(sql_query, params).decode('utf-8')
+        copy_sql = f"COPY ({sql_query.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+        read_fd, write_fd = os.pipe()
+        errors = []
+
+        def produce():
+            try:
+                with os.fdopen(write_fd, 'wb') as sink, conn.cursor() as cur:
+                    cur.copy_expert(copy_sql, sink)
+            except Exception as e:
+                errors.append(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            with os.fdopen(read_fd, 'rb') as source:
+                reader = pa_csv.open_csv(
+                    source,
+                    read_options=pa_csv.ReadOptions(block_size=block_size),
+                    parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types=column_types or {},
+                        true_values=['t'],
+                        false_values=['f'],
+                        # COPY writes NULL unquoted and empty strings as ""
+                        strings_can_be_null=True,
+                        quoted_strings_can_be_null=False,
+                    ),
+                )
+                table = reader.read_all()
+        except pa.ArrowInvalid:
+            # a failed COPY leaves no header to parse; surface the database error instead. A parse
+            # error mid-stream closes the pipe, and the producer's BrokenPipeError is not the cause
+            producer.join()
+            if errors and isinstance(errors[0], psycopg2.Error):
+                raise errors[0]
+            raise
+        finally:
+            # the read end is closed by now, so copy_expert stops before the connection is closed
+            producer.join()
+        if errors:
+            raise errors[0]
+    finally:
+        conn.close()
+
+    return table
+
+# in-memory layer kept short; the disk cache underneath enforces the per-query ttl
+@timed('run_sql_query', cache_default='memory')
+@st.cache_data(ttl=60*15)
+def run_sql_query(sql_query, params=None, ttl=DEFAULT_TTL):
+    """
+    Run a query through the on-disk result cache.
+
+    Parameters:
+    - sql_query (str): SQL text.
+    - params (dict | tuple, optional): Parameters bound to the query.
+    - ttl (int, optional): Maximum age in seconds of a cached result. Defaults to one day.
+
+    Returns:
+    - df (pd.DataFrame): Query result.
+    """
+    return get_query_cache().get_or_fetch(sql_query, fetch_sql_query, params=params, ttl=ttl)
+
+# facility predicates shared by the parameterized queries below; a NULL list means "no filter".
+# psycopg2 inlines the values, so the planner folds the unused branches away
+facility_filter = """
+	f.id <> all(%(excluded_facility_ids)s::int[])
+	and (%(site_codes)s::text[] is null or f.site_code = any(%(site_codes)s::text[]))
+	and (%(regions)s::text[] is null or f.region_id in (select rf.id from regions rf where rf.name = any(%(regions)s::text[])))
+	and (%(funds)s::int[] is null or f.fund = any(%(funds)s::int[]))
+"""
+
+# parameterized move_outs / occupants: month-ends from %(start_date)s's month through %(end_date)s's month.
+# occupancies are narrowed by the date bounds and facility filters before being joined to the months.
+# build the params with query_builder.build_query
+move_outs_range = """
 with dates as (
 	select (date_trunc('month',d) + interval '1 month'- interval '1 day')::date as date 
 	from generate_series
-		(('2019-05-31')::date,
-		now()::date,
+		(date_trunc('month', %(start_date)s::date),
+		%(end_date)s::date,
 		interval '1 month') as d
 )
+, moved_out as (
+	select o2.id, o2.moved_out_at, o2.monthly_rate, f.site_code, u.width * u.length as area
+	from occupancies o2
+	    inner join units u on u.id = o2.unit_id
+	    inner join facilities f on f.id = u.facility_id
+	where o2.moved_out_at >= date_trunc('month', %(start_date)s::date)
+		and o2.moved_out_at < date_trunc('month', %(end_date)s::date) + interval '1 month'
+		and """ + facility_filter + """
+)
 select 
 	d.date,
-    f.site_code,
-    sum(u.width * u.length) as area_move_out,
+    o2.site_code,
+    sum(o2.area) as area_move_out,
 	count(distinct o2.id) as move_outs,
     sum(o2.monthly_rate) as move_out_rate
 from dates d
-	inner join occupancies o2 on date_trunc('month', o2.moved_out_at::date) = date_trunc('month', d.date)  
-    inner join units u on u.id = o2.unit_id
-    inner join facilities f on f.id = u.facility_id
-group by d.date, f.site_code
+	inner join moved_out o2 on date_trunc('month', o2.moved_out_at::date) = date_trunc('month', d.date)  
+group by d.date, o2.site_code
 """
 
-occupants = """
+occupants_range = """
 	with dates as (
 	select (date_trunc('month',d) + interval '1 month'- interval '1 day')::date as date 
 	from generate_series
-		(('2019-05-31')::date,
-		now()::date,
+		(date_trunc('month', %(start_date)s::date),
+		%(end_date)s::date,
 		interval '1 month') as d
 )
+, occs as (
+	select o.id, o.move_in_date, o.moved_out, o.moved_out_at, f.site_code
+	from occupancies o
+	    inner join units u on u.id = o.unit_id
+	    inner join facilities f on f.id = u.facility_id
+	where o.move_in_date < date_trunc('month', %(end_date)s::date) + interval '1 month'
+		and (o.moved_out = false or o.moved_out_at >= date_trunc('month', %(start_date)s::date))
+		and """ + facility_filter + """
+)
 select 
 	d.date,
-    f.site_code,
+    o.site_code,
 	count(distinct o.id) as occupants
 from dates d
-	inner join occupancies o on o.move_in_date::date <= d.date and (o.moved_out = false or o.moved_out_at::date >= (date_trunc('month', d.date)))
+	inner join occs o on o.move_in_date::date <= d.date and (o.moved_out = false or o.moved_out_at::date >= (date_trunc('month', d.date)))
+	group by d.date, o.site_code
+"""
+
+# the occupancy columns the month-end datasets depend on, tracked by snapshot_store
+occupancy_change_columns = """
+    o.id, o.unit_id, o.move_in_date::date as move_in_date, o.moved_out, o.moved_out_at::date as moved_out_at, o.monthly_rate
+"""
+
+# the table's watermark (row count, max id, max updated_at) next to every row changed since the
+# (overlapped) stored one. One statement, so the count and the changed rows come from one snapshot
+occupancies_changed_since = """
+select w.n_rows, w.max_id, w.max_updated_at, c.*
+from (select count(*) as n_rows, max(id) as max_id, max(updated_at) as max_updated_at from occupancies) w
+    left join (
+        select """ + occupancy_change_columns + """
+        from occupancies o
+        where o.updated_at > %(updated_at)s or o.id > %(id)s
+    ) c on true
+"""
+
+occupancy_ids = """
+select id
+from occupancies
+"""
+
+occupancies_by_id = """
+select """ + occupancy_change_columns + """
+from occupancies o
+where o.id = any(%(ids)s::bigint[])
+"""
+
+# one row per occupancy, dates as day offsets from %(epoch)s; feeds occupancy_engine and cohort_engine.
+# takes query_builder.facility_params() as well, so excluded facilities stay out as in move_outs / occupants
+occupancy_intervals = """
+select 
+    f.site_code,
+    (o.move_in_date::date - %(epoch)s::date) as move_in_day,
+    case when o.moved_out = false or o.moved_out_at is null then null
+        else (o.moved_out_at::date - %(epoch)s::date) end as move_out_day,
+    u.width * u.length as area
+from occupancies o
     inner join units u on u.id = o.unit_id
     inner join facilities f on f.id = u.facility_id
-	group by d.date, f.site_code
+where o.move_in_date is not null
+    and """ + facility_filter + """
 """
 
+# superseded by tenant_features.load_tenants, which classifies ledger rows incrementally
 all_tenants = """
 select distinct on (f.site_code , a.id) f.site_code, a.id, o.id as occ_id, min(o.move_in_date) as move_in_date
     , o.moved_out_at::date
@@ -93,6 +253,53 @@ group by f.site_code , a.id , o.id, o2.moved_out , o2.auto_pay_id , o2.insurance
 order by f.site_code , a.id, o2.move_in_date desc  ;
 """
 
+ledger_watermark = """
+select max(id) as id
+from ledgers
+"""
+
+# charge_type 7 rows in an id range; descriptions are classified by tenant_features, not with LIKE
+ledger_charges_between = """
+select l.id, l.occupancy_id, l.chg, l.description
+from ledgers l
+where l.charge_type = 7
+    and l.id > %(after_id)s and l.id <= %(through_id)s
+"""
+
+# one row per occupancy with its account and the columns all_tenants reports; tenant_features joins them
+tenant_occupancies = """
+select
+    o.id as occ_id,
+    og.account_id,
+    o.occupancy_group_id,
+    f.site_code,
+    o.move_in_date::date as move_in_date,
+    o.moved_out_at::date as moved_out_at,
+    o.moved_out,
+    o.auto_pay_id is not null as autopay,
+    o.insurance_id,
+    o.monthly_rate
+from occupancies o
+    inner join occupancy_groups og on og.id = o.occupancy_group_id
+    inner join accounts a on a.id = og.account_id
+    inner join units u on u.id = o.unit_id
+    inner join facilities f on f.id = u.facility_id
+"""
+
+# Arrow types of tenant_occupancies for fetch_sql_arrow; COPY's CSV does not carry them
+tenant_occupancies_types = {
+    'occ_id': pa.int64(),
+    'account_id': pa.int64(),
+    'occupancy_group_id': pa.int64(),
+    'site_code': pa.string(),
+    'move_in_date': pa.date32(),
+    'moved_out_at': pa.date32(),
+    'moved_out': pa.bool_(),
+    'autopay': pa.bool_(),
+    'insurance_id': pa.int64(),
+    'monthly_rate': pa.float64(),
+}
+
 facilities_sql = '''
 with acquisition_dates as (
 	select *
@@ -168,8 +375,7 @@ from facilities f
 		left join acquisition_dates ad on ad.site_code = f.site_code 
 		left join regions r on r.id = f.region_id 
 		inner join units u on u.facility_id = f.id and u.inactive = false 
-where f.id != 48 
-group by f.site_code, f.id, s.name, acquisition_date , age_of_facility , a.street, a.street_2 , a.city, a.state, a.zip, latitude, longitude, r.name, f.fund, ad.acq_date 
+where ''' + facility_filter + '''group by f.site_code, f.id, s.name, acquisition_date , age_of_facility , a.street, a.street_2 , a.city, a.state, a.zip, latitude, longitude, r.name, f.fund, ad.acq_date 
 order by f.site_code ;
 '''
 
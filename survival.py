@@ -0,0 +1,335 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+MAX_DAYS = 180
+N_RESAMPLES = 200
+BATCH_RESAMPLES = 50  # resamples drawn per task
+BOOTSTRAP_WORKERS = min(4, os.cpu_count() or 1)
+# resample x group x bucket cells below which batches run inline: spawning the pool costs
+# seconds and a 200-resample band over a handful of groups takes a few hundredths inline
+POOL_MIN_CELLS = 50_000_000
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_workers = None
+_pool_guard = threading.Lock()
+
+
+def durations_from_dates(df, start_time_column, end_column='moved_out_date', today=None):
+    """
+    Days from `start_time_column` to move out, or to `today` for tenants still in place.
+    """
+    today = pd.Timestamp.now() if today is None else pd.Timestamp(today)
+    end = df[end_column].fillna(today)
+    return (end - df[start_time_column]).dt.days.to_numpy()
+
+
+def km_curves(durations, events, group_codes, n_groups, max_days=MAX_DAYS):
+    """
+    Kaplan-Meier survival for every group at once on a daily 0..max_days grid.
+
+    Durations beyond `max_days` only ever contribute to the at-risk counts inside
+    the grid, so they are collapsed into one overflow bucket. Event and removal
+    counts per (group, day) come from a single `np.bincount`; at-risk counts are
+    the group size minus the running total removed, and survival is the
+    cumulative product of (1 - events / at risk) along each row.
+
+    Parameters:
+    - durations (np.ndarray): Integer duration of each row in days.
+    - events (np.ndarray): 1 if the row moved out, 0 if censored.
+    - group_codes (np.ndarray): Integer group of each row in [0, n_groups).
+    - n_groups (int): Number of groups.
+    - max_days (int, optional): Last day of the grid. Defaults to 180.
+
+    Returns:
+    - survival (np.ndarray): (n_groups, max_days + 1) survival probabilities.
+    - last_day (np.ndarray): Largest observed duration per group (capped at max_days).
+    """
+    removed, died = km_counts(durations, events, group_codes, n_groups, max_days)
+    return km_from_counts(removed, died, max_days)
+
+
+def km_counts(durations, events, group_codes, n_groups, max_days=MAX_DAYS):
+    """
+    Per-(group, duration bucket) removal and event counts, the input of `km_from_counts`.
+    """
+    width = max_days + 2
+    days = np.clip(durations, 0, max_days + 1).astype(np.int64)
+    idx = group_codes.astype(np.int64) * width + days
+    size = n_groups * width
+
+    removed = np.bincount(idx, minlength=size).reshape(n_groups, width)
+    died = np.bincount(idx, weights=events, minlength=size).reshape(n_groups, width)
+    return removed, died
+
+
+def km_from_counts(removed, died, max_days=MAX_DAYS):
+    """
+    Kaplan-Meier survival from per-(group, duration bucket) counts.
+
+    Parameters:
+    - removed (np.ndarray): (n_groups, max_days + 2) rows leaving the risk set per bucket
+      (events and censorings); the last bucket collects durations beyond `max_days`.
+    - died (np.ndarray): Same shape, events only.
+    - max_days (int, optional): Last day of the grid. Defaults to 180.
+
+    Returns:
+    - survival (np.ndarray): (n_groups, max_days + 1) survival probabilities.
+    - last_day (np.ndarray): Largest observed duration per group (capped at max_days),
+      -1 for groups without rows.
+    """
+    removed_before = np.cumsum(removed, axis=1) - removed
+    at_risk = removed.sum(axis=1, keepdims=True) - removed_before
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hazard = np.where(at_risk > 0, died / at_risk, 0.0)
+    survival = np.cumprod(1.0 - hazard, axis=1)[:, :max_days + 1]
+
+    observed = removed > 0
+    last_bucket = removed.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    last_day = np.where(observed.any(axis=1), np.minimum(last_bucket, max_days), -1)
+    return survival, last_day
+
+
+def curves_frame(survival, last_day, groups, group_column, max_days=MAX_DAYS):
+    """
+    Long-form frame of survival curves, each group cut at its last observed day.
+    """
+    day_grid = np.arange(max_days + 1)
+    on_curve = day_grid[None, :] <= last_day[:, None]
+    group_idx, day_idx = np.nonzero(on_curve)
+    return pd.DataFrame({
+        'Days': day_idx,
+        group_column: np.asarray(groups)[group_idx],
+        '% Survived': survival[group_idx, day_idx].round(3),
+    })
+
+
+def _bootstrap_batch(removed, died, n_resamples, seed, max_days=MAX_DAYS):
+    """
+    Survival curves of `n_resamples` bootstrap resamples, shape (n_resamples, n_groups, max_days + 1).
+
+    Resampling a group's rows with replacement only changes how many rows fall in
+    each (duration bucket, event or censored) cell, so each resample is one
+    multinomial draw over those cells: every group and resample in a single call,
+    whatever the number of rows.
+    """
+    rng = np.random.default_rng(seed)
+    width = removed.shape[1]
+    cells = np.concatenate([died, removed - died], axis=1).astype(np.float64)
+    n = cells.sum(axis=1).astype(np.int64)
+    pvals = np.where(n[:, None] > 0, cells / np.maximum(n, 1)[:, None], 1.0 / cells.shape[1])
+    draws = rng.multinomial(n, pvals, size=(n_resamples, len(n)))
+    died_b = draws[..., :width]
+    removed_b = died_b + draws[..., width:]
+    survival, _ = km_from_counts(removed_b.reshape(-1, width), died_b.reshape(-1, width), max_days)
+    return survival.reshape(n_resamples, len(n), max_days + 1)
+
+
+def get_process_pool(workers=BOOTSTRAP_WORKERS):
+    """
+    Process pool for CPU-bound resampling, recreated if the worker count changes.
+    Workers are spawned rather than forked from the threaded Streamlit server.
+    """
+    global _pool, _pool_workers
+    with _pool_guard:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def reset_process_pool(pool):
+    """
+    Drop `pool` (e.g. after a worker died) so the next `get_process_pool` starts a new one.
+    """
+    global _pool, _pool_workers
+    with _pool_guard:
+        if _pool is pool:
+            _pool, _pool_workers = None, None
+    pool.shutdown(wait=False)
+
+
+def bootstrap_bands(removed, died, n_resamples=N_RESAMPLES, alpha=0.05, seed=0, workers=BOOTSTRAP_WORKERS,
+                    batch_size=BATCH_RESAMPLES, max_days=MAX_DAYS, min_pool_cells=POOL_MIN_CELLS):
+    """
+    Pointwise bootstrap confidence bands for the Kaplan-Meier curves of `km_from_counts`.
+
+    Resamples are drawn in batches of `batch_size`, each with its own child of
+    `SeedSequence(seed)`, so results depend on the seed but not on the worker count.
+    Batches run on the process pool when `workers` > 1 and the job covers at least
+    `min_pool_cells` resample x group x bucket cells, and inline otherwise. A
+    broken pool is replaced on the next call and the batches run inline.
+
+    Parameters:
+    - removed (np.ndarray): (n_groups, max_days + 2) removal counts (see km_from_counts).
+    - died (np.ndarray): Same shape, events only.
+    - n_resamples (int, optional): Bootstrap resamples. Defaults to 200.
+    - alpha (float, optional): 1 - confidence level. Defaults to 0.05 (95% bands).
+    - seed (int, optional): RNG seed. Defaults to 0.
+    - workers (int, optional): Processes to spread batches over. Defaults to BOOTSTRAP_WORKERS.
+    - batch_size (int, optional): Resamples per batch. Defaults to 50.
+    - max_days (int, optional): Last day of the grid. Defaults to 180.
+    - min_pool_cells (int, optional): Smallest job sent to the pool. Defaults to POOL_MIN_CELLS.
+
+    Returns:
+    - lower (np.ndarray): (n_groups, max_days + 1) lower band.
+    - upper (np.ndarray): Same shape, upper band.
+    """
+    sizes = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = (removed, died)
+    samples = None
+    if workers > 1 and len(sizes) > 1 and n_resamples * removed.size >= min_pool_cells:
+        pool = get_process_pool(workers)
+        try:
+            futures = [pool.submit(_bootstrap_batch, *args, size, s, max_days) for size, s in zip(sizes, seeds)]
+            samples = [f.result() for f in futures]
+        except BrokenProcessPool:
+            logger.warning('Bootstrap process pool broke; replacing it and running this band inline')
+            reset_process_pool(pool)
+    if samples is None:
+        samples = [_bootstrap_batch(*args, size, s, max_days) for size, s in zip(sizes, seeds)]
+    samples = np.concatenate(samples, axis=0)
+    lower, upper = np.quantile(samples, [alpha / 2, 1 - alpha / 2], axis=0)
+    return lower, upper
+
+
+def bands_frame(lower, upper, last_day, groups, group_column, max_days=MAX_DAYS):
+    """
+    Long-form frame of confidence bands (`Days`, `group_column`, `lower`, `upper`), cut like `curves_frame`.
+    """
+    day_grid = np.arange(max_days + 1)
+    group_idx, day_idx = np.nonzero(day_grid[None, :] <= last_day[:, None])
+    return pd.DataFrame({
+        'Days': day_idx,
+        group_column: np.asarray(groups)[group_idx],
+        'lower': lower[group_idx, day_idx].round(3),
+        'upper': upper[group_idx, day_idx].round(3),
+    })
+
+
+def _survival_counts(df, start_time_column, group_column, max_days, today):
+    durations = durations_from_dates(df, start_time_column, today=today)
+    valid = ~np.isnan(durations)
+    codes, groups = pd.factorize(df[group_column].to_numpy()[valid], sort=True)
+    keep = codes >= 0  # factorize marks missing groups with -1
+    events = df['event_occurred'].to_numpy()[valid][keep].astype(np.float64)
+    removed, died = km_counts(durations[valid][keep], events, codes[keep], len(groups), max_days)
+    return removed, died, groups
+
+
+def survival_bands(df, start_time_column, group_column='model', max_days=MAX_DAYS, today=None, **bootstrap):
+    """
+    Bootstrap confidence bands matching `survival_table(df, ...)`; `bootstrap` goes to `bootstrap_bands`.
+    """
+    removed, died, groups = _survival_counts(df, start_time_column, group_column, max_days, today)
+    _, last_day = km_from_counts(removed, died, max_days)
+    lower, upper = bootstrap_bands(removed, died, max_days=max_days, **bootstrap)
+    return bands_frame(lower, upper, last_day, groups, group_column, max_days)
+
+
+def survival_table(df, start_time_column, group_column='model', max_days=MAX_DAYS, today=None):
+    """
+    Long-form survival curves for every value of `group_column`.
+
+    Parameters:
+    - df (pd.DataFrame): Rows with `start_time_column`, `moved_out_date`, `event_occurred` and `group_column`.
+    - start_time_column (str): Column the duration is measured from.
+    - group_column (str, optional): Column to group by (model, site_code, region...). Defaults to 'model'.
+    - max_days (int, optional): Last day of the grid. Defaults to 180.
+    - today (datetime, optional): Censoring date for tenants still in place. Defaults to now.
+
+    Returns:
+    - data (pd.DataFrame): `Days`, `group_column` and `% Survived`, one row per group and
+      day up to the group's last observed duration.
+    """
+    removed, died, groups = _survival_counts(df, start_time_column, group_column, max_days, today)
+    survival, last_day = km_from_counts(removed, died, max_days)
+    return curves_frame(survival, last_day, groups, group_column, max_days)
+
+
+class SurvivalIndex():
+    """
+    Prefix-summed event/censor counts for answering KM curves over any start-date window.
+
+    Rows are bucketed by (start day, group, duration bucket). Counts are
+    accumulated along the start-day axis, so the counts for any [start, end]
+    window are one subtraction of two slices, and the curves follow from
+    `km_from_counts`. Each slider move then costs O(groups x max_days)
+    regardless of how many rows the ECRI history holds.
+
+    Memory is 2 x (days + 1) x groups x (max_days + 2) int32 counts, so this suits
+    low-cardinality groupings such as `model`.
+    """
+    def __init__(self, df, start_time_column, group_column='model', max_days=MAX_DAYS, today=None):
+        self.group_column = group_column
+        self.max_days = max_days
+
+        start = df[start_time_column]
+        durations = durations_from_dates(df, start_time_column, today=today)
+        valid = (~np.isnan(durations) & start.notna().to_numpy())
+        codes, self.groups = pd.factorize(df[group_column].to_numpy()[valid], sort=True)
+        keep = codes >= 0
+
+        start_days = start.to_numpy()[valid][keep].astype('datetime64[D]')
+        self.first_day = start_days.min() if len(start_days) else np.datetime64('today', 'D')
+        day_idx = (start_days - self.first_day).astype(np.int64)
+        self.n_days = int(day_idx.max()) + 1 if len(day_idx) else 0
+
+        n_groups = len(self.groups)
+        width = max_days + 2
+        buckets = np.clip(durations[valid][keep], 0, max_days + 1).astype(np.int64)
+        idx = (day_idx * n_groups + codes[keep]) * width + buckets
+        size = self.n_days * n_groups * width
+        events = df['event_occurred'].to_numpy()[valid][keep]
+
+        shape = (self.n_days, n_groups, width)
+        removed = np.bincount(idx, minlength=size).reshape(shape)
+        died = np.bincount(idx, weights=events, minlength=size).reshape(shape)
+
+        # row d + 1 holds totals over start days 0..d
+        self.removed = np.zeros((self.n_days + 1, n_groups, width), dtype=np.int32)
+        self.died = np.zeros((self.n_days + 1, n_groups, width), dtype=np.int32)
+        self.removed[1:] = np.cumsum(removed, axis=0)
+        self.died[1:] = np.cumsum(died, axis=0)
+
+    def _day(self, d):
+        offset = (np.datetime64(pd.Timestamp(d).date(), 'D') - self.first_day).astype(np.int64)
+        return int(np.clip(offset, 0, self.n_days))
+
+    def counts(self, start_date, end_date):
+        """
+        Removed and event counts for rows starting between `start_date` and `end_date` (inclusive).
+        """
+        lo = self._day(start_date)
+        hi = self._day(pd.Timestamp(end_date) + pd.Timedelta(days=1))
+        return self.removed[hi] - self.removed[lo], self.died[hi] - self.died[lo]
+
+    def window(self, start_date, end_date):
+        """
+        Survival curves for rows whose start date lies in [start_date, end_date].
+
+        Returns the same long-form frame as `survival_table`.
+        """
+        removed, died = self.counts(start_date, end_date)
+        survival, last_day = km_from_counts(removed, died, self.max_days)
+        return curves_frame(survival, last_day, self.groups, self.group_column, self.max_days)
+
+    def bands(self, start_date, end_date, **bootstrap):
+        """
+        Bootstrap confidence bands for `window(start_date, end_date)`; `bootstrap` goes to `bootstrap_bands`.
+        """
+        removed, died = self.counts(start_date, end_date)
+        _, last_day = km_from_counts(removed, died, self.max_days)
+        lower, upper = bootstrap_bands(removed, died, max_days=self.max_days, **bootstrap)
+        return bands_frame(lower, upper, last_day, self.groups, self.group_column, self.max_days)
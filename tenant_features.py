@@ -0,0 +1,259 @@
+import datetime
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from instrumentation import note, span
+from schemas import apply_schema
+from sql_queries import (fetch_sql_arrow, fetch_sql_query, ledger_charges_between, ledger_watermark,
+                         tenant_occupancies, tenant_occupancies_types)
+
+logger = logging.getLogger(__name__)
+
+FEATURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'tenant_features')
+BATCH_IDS = 5_000_000  # ledger ids fetched per query while catching up
+# ids re-scanned behind the watermark on each refresh, for rows whose id was assigned before
+# it was read but whose transaction committed after
+LEDGER_ID_OVERLAP = 10_000
+DAYS_PER_MONTH = 30.4167
+
+# same matches as all_tenants' `like '%write off%' or like '%write-off%'` (and the move out exclusions)
+WRITE_OFF_PATTERN = r'write[ -]off'
+MOVE_OUT_PATTERN = r'move[ -]out'
+
+WRITE_OFF_COLUMNS = ['occupancy_id', 'write_offs', 'move_out_write_offs', 'n_write_offs']
+
+
+def classify_ledger_rows(description):
+    """
+    Classify ledger descriptions in one vectorized pass.
+
+    Parameters:
+    - description (array-like): Ledger descriptions (nulls allowed).
+
+    Returns:
+    - (write_off, move_out) (tuple of np.ndarray): Boolean masks. `write_off` rows
+      count toward `write_offs`; `move_out` rows are write-offs booked at move out,
+      which all_tenants leaves out.
+    """
+    text = pd.Series(description, dtype='string[pyarrow]').str.lower()
+    mentions_write_off = text.str.contains(WRITE_OFF_PATTERN, regex=True).fillna(False).to_numpy(dtype=bool)
+    mentions_move_out = text.str.contains(MOVE_OUT_PATTERN, regex=True).fillna(False).to_numpy(dtype=bool)
+    return mentions_write_off & ~mentions_move_out, mentions_write_off & mentions_move_out
+
+
+def summarize_write_offs(ledger):
+    """
+    Per-occupancy sums of classified ledger rows (columns: WRITE_OFF_COLUMNS).
+    """
+    write_off, move_out = classify_ledger_rows(ledger['description'])
+    keep = write_off | move_out
+    chg = pd.to_numeric(ledger['chg'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)[keep]
+    sums = pd.DataFrame({
+        'occupancy_id': ledger['occupancy_id'].to_numpy()[keep],
+        'write_offs': np.where(write_off[keep], chg, 0.0),
+        'move_out_write_offs': np.where(move_out[keep], chg, 0.0),
+        'n_write_offs': write_off[keep].astype(np.int64),
+    })
+    return sums.groupby('occupancy_id', sort=True, as_index=False).sum()
+
+
+class WriteOffStore():
+    """
+    Per-occupancy write-off sums, kept up to date from new ledger rows only.
+
+    The all_tenants query ran leading-wildcard LIKE patterns over every
+    charge_type 7 ledger row on each execution. Here each row is classified once:
+    a refresh fetches the rows with ids above the stored watermark, less
+    `overlap_ids` (a primary key range scan), classifies them with
+    `classify_ledger_rows`, and adds their sums to `<root>/write_offs.parquet`.
+    The ids of counted rows inside the overlap are kept in the state file, so a
+    row committed late is added once it appears and never twice. Ledger rows are
+    treated as append-only; `rebuild` reclassifies everything should rows be
+    edited or deleted.
+    """
+    def __init__(self, fetch, root=FEATURE_DIR, batch_ids=BATCH_IDS, overlap_ids=LEDGER_ID_OVERLAP):
+        """
+        Parameters:
+        - fetch (callable): Function running (sql_query, params) and returning a DataFrame.
+        - root (str, optional): Directory holding the store.
+        - batch_ids (int, optional): Ledger ids covered by one fetch.
+        - overlap_ids (int, optional): Ledger ids re-scanned behind the watermark.
+        """
+        self.fetch = fetch
+        self.root = root
+        self.batch_ids = batch_ids
+        self.overlap_ids = overlap_ids
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def state_path(self):
+        return os.path.join(self.root, '_state.json')
+
+    @property
+    def data_path(self):
+        return os.path.join(self.root, 'write_offs.parquet')
+
+    def read_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_state(self, state):
+        with open(self.state_path + '.tmp', 'w') as f:
+            json.dump(state, f, default=str)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def load(self):
+        """
+        The stored sums, one row per occupancy with at least one classified ledger row.
+        """
+        if not os.path.exists(self.data_path) or self.read_state() is None:
+            return pd.DataFrame({c: pd.Series(dtype='float64' if 'write_offs' in c else 'int64') for c in WRITE_OFF_COLUMNS})
+        return pd.read_parquet(self.data_path)
+
+    def _write(self, df):
+        tmp = self.data_path + '.tmp'
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, self.data_path)
+
+    def refresh(self):
+        """
+        Classify the ledger rows added since the last refresh and fold them into the store.
+
+        Returns:
+        - rows (int): Ledger rows fetched.
+        """
+        with self._lock:
+            state = self.read_state()
+            after_id = int(state['ledger_id']) if state else 0
+            through_id = self.fetch(ledger_watermark, None)['id'].iloc[0]
+            through_id = after_id if through_id is None or pd.isnull(through_id) else int(through_id)
+
+            sums = [self.load()] if state else []
+            # counted ids already in the stored sums, from the overlap scanned last time
+            seen = np.asarray(state.get('recent_ids', []) if state else [], dtype=np.int64)
+            counted_ids = [seen]
+            scan_from = max(0, after_id - self.overlap_ids) if state else 0
+            fetched = 0
+            added = 0
+            with span('tenant_features.classify', rows_in=None) as record:
+                for start in range(scan_from, through_id, self.batch_ids):
+                    params = {'after_id': start, 'through_id': min(start + self.batch_ids, through_id)}
+                    ledger = self.fetch(ledger_charges_between, params)
+                    fetched += len(ledger)
+                    if not len(ledger):
+                        continue
+                    write_off, move_out = classify_ledger_rows(ledger['description'])
+                    counted = ledger[(write_off | move_out) & ~np.isin(ledger['id'].to_numpy(), seen)]
+                    if len(counted):
+                        sums.append(summarize_write_offs(counted))
+                        counted_ids.append(counted['id'].to_numpy(dtype=np.int64))
+                        added += len(counted)
+                record['rows_in'] = fetched
+            if added or state is None:
+                combined = pd.concat(sums, ignore_index=True) if sums else self.load()
+                combined = combined.groupby('occupancy_id', sort=True, as_index=False).sum()
+                self._write(combined[WRITE_OFF_COLUMNS])
+                note(rows_out=len(combined))
+            logger.info('Write-off store: classified %d ledger rows (ids %d-%d), %d new write-off rows',
+                        fetched, scan_from, through_id, added)
+
+            counted_ids = np.concatenate(counted_ids)
+            self.write_state({
+                'ledger_id': through_id,
+                'recent_ids': sorted(int(i) for i in counted_ids[counted_ids > through_id - self.overlap_ids]),
+                'refreshed_at': datetime.datetime.now().isoformat(),
+            })
+            return fetched
+
+    def rebuild(self):
+        """
+        Drop the watermark and reclassify every ledger row.
+        """
+        with self._lock:
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+        return self.refresh()
+
+
+def tenant_frame(occupancies, write_offs, today=None):
+    """
+    Assemble the all_tenants frame from occupancy rows and stored write-off sums.
+
+    As in the query, each (site_code, account) is represented by one of its
+    occupancies at that site (`occ_id`), paired with the latest move-in of the same
+    occupancy group, which supplies moved_out, autopay, insurance_id and
+    monthly_rate. Ties keep the occupancy with the latest move-in.
+
+    Parameters:
+    - occupancies (pd.DataFrame): `tenant_occupancies` result.
+    - write_offs (pd.DataFrame): `WriteOffStore.load()` result.
+    - today (date, optional): End of open tenancies. Defaults to today.
+
+    Returns:
+    - tenants (pd.DataFrame): One row per (site_code, account) with all_tenants' columns.
+    """
+    today = pd.Timestamp(today or datetime.date.today())
+    move_in = pd.to_datetime(occupancies['move_in_date'])
+
+    # the latest move-in of each occupancy group (missing dates first, as Postgres sorts DESC)
+    latest = (occupancies[['occupancy_group_id', 'moved_out', 'autopay', 'insurance_id', 'monthly_rate']]
+              .assign(latest_move_in=move_in)
+              .sort_values('latest_move_in', ascending=False, na_position='first', kind='stable')
+              .drop_duplicates('occupancy_group_id'))
+
+    tenants = occupancies[['site_code', 'account_id', 'occ_id', 'occupancy_group_id', 'moved_out_at']]
+    tenants = tenants.assign(move_in_date=move_in, moved_out_at=pd.to_datetime(tenants['moved_out_at']))
+    tenants = tenants.merge(latest, on='occupancy_group_id', how='left')
+    tenants = (tenants.sort_values(['site_code', 'account_id', 'latest_move_in', 'move_in_date'],
+                                   ascending=[True, True, False, False], na_position='first', kind='stable')
+               .drop_duplicates(['site_code', 'account_id']))
+
+    sums = write_offs.set_index('occupancy_id')
+    written_off = tenants['occ_id'].map(sums['n_write_offs']).fillna(0) > 0
+    write_off_total = tenants['occ_id'].map(sums['write_offs']).where(written_off)
+    tenure_days = (tenants['moved_out_at'].fillna(today) - tenants['move_in_date']).dt.days
+
+    return pd.DataFrame({
+        'site_code': tenants['site_code'],
+        'id': tenants['account_id'],
+        'occ_id': tenants['occ_id'],
+        'move_in_date': tenants['move_in_date'],
+        'moved_out_at': tenants['moved_out_at'],
+        'moved_out': tenants['moved_out'],
+        'tenancy': np.round(tenure_days / DAYS_PER_MONTH, 2),
+        'autopay': tenants['autopay'].eq(True),
+        'insurance_id': tenants['insurance_id'],
+        'monthly_rate': tenants['monthly_rate'],
+        'write_offs': write_off_total,
+        'bad_debt': write_off_total.lt(0),
+    }).reset_index(drop=True)
+
+
+def fetch_tenant_occupancies():
+    table = fetch_sql_arrow(tenant_occupancies, column_types=tenant_occupancies_types)
+    return table.to_pandas(date_as_object=False)
+
+
+def default_write_off_store():
+    return WriteOffStore(fetch_sql_query)
+
+
+def load_tenants(store=None, fetch_occupancies=fetch_tenant_occupancies, today=None):
+    """
+    Refresh the write-off store and return the tenant frame all_tenants used to produce,
+    with the compact dtypes of its schema.
+    """
+    store = store or default_write_off_store()
+    store.refresh()
+    with span('tenant_features.assemble'):
+        tenants = tenant_frame(fetch_occupancies(), store.load(), today=today)
+        note(rows_out=len(tenants))
+    return apply_schema(tenants, 'all_tenants')
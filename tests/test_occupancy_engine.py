@@ -0,0 +1,76 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from occupancy_engine import EPOCH, OccupancyEngine
+from query_builder import facility_params
+from schemas import apply_schema
+from sql_queries import move_outs_range, occupancy_intervals, occupants_range
+
+pytest.importorskip('duckdb')
+from benchmarks.backends import DuckDBBackend  # noqa: E402
+from benchmarks.synthetic_data import generate_tables  # noqa: E402
+
+TODAY = datetime.date(2024, 6, 15)
+START = datetime.date(2022, 1, 1)
+LAST_CLOSED = datetime.date(2024, 5, 31)
+
+
+@pytest.fixture(scope='module')
+def backend():
+    backend = DuckDBBackend(generate_tables(n_sites=8, n_occupancies=5_000, seed=5, today=pd.Timestamp(TODAY)))
+    yield backend
+    backend.close()
+
+
+@pytest.fixture(scope='module')
+def engine(backend):
+    intervals = backend.run(occupancy_intervals, {'epoch': EPOCH.isoformat(), **facility_params()})
+    return OccupancyEngine.from_frame(apply_schema(intervals, 'occupancy_intervals'))
+
+
+def month_end_query(backend, sql_query, end_date=LAST_CLOSED):
+    params = {**facility_params(), 'start_date': START.isoformat(), 'end_date': end_date.isoformat()}
+    df = backend.run(sql_query, params)
+    df['date'] = pd.to_datetime(df['date']).astype('datetime64[ns]')
+    df['site_code'] = df['site_code'].astype(str)
+    return df.set_index(['date', 'site_code']).sort_index()
+
+
+def rollup(engine, column):
+    df = engine.rollup(START, LAST_CLOSED, how='any')
+    df['date'] = pd.to_datetime(df['date']).astype('datetime64[ns]')
+    df['site_code'] = df['site_code'].astype(str)
+    df = df.set_index(['date', 'site_code']).sort_index()
+    return df.loc[df[column] > 0, column].astype(np.int64)
+
+
+def test_rollup_any_matches_the_occupants_query(backend, engine):
+    expected = month_end_query(backend, occupants_range)['occupants'].astype(np.int64)
+    pd.testing.assert_series_equal(rollup(engine, 'occupants'), expected)
+
+
+def test_rollup_move_outs_match_the_move_outs_query(backend, engine):
+    expected = month_end_query(backend, move_outs_range)['move_outs'].astype(np.int64)
+    pd.testing.assert_series_equal(rollup(engine, 'move_outs'), expected)
+
+
+def test_month_end_occupants_match_the_occupants_query_through_the_open_month(backend, engine):
+    expected = month_end_query(backend, occupants_range, end_date=TODAY).reset_index()
+    actual = engine.month_end_occupants(START, today=TODAY)
+    assert list(actual.columns) == ['date', 'site_code', 'occupants']
+    actual = actual.assign(date=actual['date'].astype('datetime64[ns]'), site_code=actual['site_code'].astype(str))
+    actual = actual.set_index(['date', 'site_code']).sort_index()
+    pd.testing.assert_series_equal(actual['occupants'].astype(np.int64),
+                                   expected.set_index(['date', 'site_code'])['occupants'].astype(np.int64))
+
+
+def test_daily_totals_sum_the_selected_sites(engine):
+    sites = list(engine.sites[:3])
+    site_area = pd.Series(1_000.0, index=engine.sites)
+    days, occupants, occupied = engine.daily(TODAY - datetime.timedelta(days=9), TODAY)
+    totals = engine.daily_totals(TODAY - datetime.timedelta(days=9), TODAY, site_codes=sites, site_area=site_area)
+    assert len(totals) == 10
+    np.testing.assert_array_equal(totals['occupants'], occupants[:3].sum(axis=0))
+    np.testing.assert_allclose(totals['area_occupancy'], occupied[:3].sum(axis=0) / 3_000.0, rtol=1e-6)
@@ -0,0 +1,88 @@
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+from s3_cache import S3ObjectCache
+
+BUCKET = 'cache-test'
+KEY = 'data/move_outs.csv'
+
+
+@pytest.fixture
+def client():
+    with mock_aws():
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket=BUCKET)
+        yield s3
+
+
+@pytest.fixture
+def cache(client, tmp_path):
+    return S3ObjectCache(client, cache_dir=str(tmp_path))
+
+
+def read(cache):
+    f, meta = cache.open(BUCKET, KEY)
+    with f:
+        return f.read(), meta
+
+
+def test_miss_downloads_object(client, cache):
+    client.put_object(Bucket=BUCKET, Key=KEY, Body=b'a,b\n1,2\n')
+
+    body, meta = read(cache)
+
+    assert body == b'a,b\n1,2\n'
+    assert meta['size'] == len(body)
+    assert cache.stats == {'hits': 0, 'misses': 1, 'bytes_downloaded': len(body)}
+
+
+def test_unchanged_object_is_revalidated_not_downloaded(client, cache):
+    client.put_object(Bucket=BUCKET, Key=KEY, Body=b'a,b\n1,2\n')
+    _, first = read(cache)
+
+    body, meta = read(cache)
+
+    assert body == b'a,b\n1,2\n'
+    assert meta['path'] == first['path']
+    assert meta['checked_at'] >= first['checked_at']
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 1
+
+
+def test_changed_etag_replaces_cached_version(client, cache):
+    client.put_object(Bucket=BUCKET, Key=KEY, Body=b'a,b\n1,2\n')
+    _, first = read(cache)
+    client.put_object(Bucket=BUCKET, Key=KEY, Body=b'a,b\n3,4\n5,6\n')
+
+    body, meta = read(cache)
+
+    assert body == b'a,b\n3,4\n5,6\n'
+    assert meta['etag'] != first['etag']
+    assert not os.path.exists(first['path'])
+    assert cache.stats['misses'] == 2
+    assert sorted(os.listdir(os.path.dirname(meta['path']))) == sorted([os.path.basename(meta['path']), 'meta.json'])
+
+
+def test_open_refetches_a_version_removed_by_another_process(client, cache):
+    client.put_object(Bucket=BUCKET, Key=KEY, Body=b'a,b\n1,2\n')
+    _, first = read(cache)
+    client.put_object(Bucket=BUCKET, Key=KEY, Body=b'a,b\n3,4\n')
+    fetch = cache._fetch
+    calls = []
+
+    def fetch_then_lose_file(bucket, key):
+        # the first lookup still sees the old version, which another replica then replaces
+        meta = first if not calls else fetch(bucket, key)
+        calls.append(meta)
+        if len(calls) == 1:
+            os.remove(first['path'])
+        return meta
+
+    cache._fetch = fetch_then_lose_file
+    body, meta = read(cache)
+
+    assert body == b'a,b\n3,4\n'
+    assert len(calls) == 2
+    assert meta['etag'] != first['etag']
@@ -0,0 +1,153 @@
+import datetime
+
+import pandas as pd
+import pytest
+import query_builder
+from snapshot_store import MonthEndSnapshotStore
+from sql_queries import move_outs_range, occupants_range
+
+pytest.importorskip('duckdb')
+from benchmarks.backends import DuckDBBackend  # noqa: E402
+from benchmarks.synthetic_data import generate_tables  # noqa: E402
+
+TODAY = datetime.date(2024, 6, 15)
+HISTORY_START = datetime.date(2023, 1, 31)
+ALL_MONTHS = pd.period_range('2023-01', '2024-06', freq='M').strftime('%Y-%m').tolist()
+DATASETS = {'move_outs': move_outs_range, 'occupants': occupants_range}
+
+
+class RecordingFetch():
+    """
+    Runs queries on DuckDB and records the (start_date, end_date) of every dataset query.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.ranges = []
+
+    def __call__(self, sql_query, params):
+        if params and 'start_date' in params:
+            self.ranges.append((params['start_date'], params['end_date']))
+        return self.backend.run(sql_query, params)
+
+
+@pytest.fixture
+def backend():
+    backend = DuckDBBackend(generate_tables(n_sites=8, n_occupancies=3_000, seed=3, today=pd.Timestamp(TODAY)))
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def store(backend, tmp_path):
+    store = MonthEndSnapshotStore(DATASETS, RecordingFetch(backend), root=str(tmp_path / 'store'), history_start=HISTORY_START)
+    store.refresh(today=TODAY)
+    store.fetch.ranges.clear()
+    return store
+
+
+def sorted_frame(df):
+    return df.sort_values(['date', 'site_code']).reset_index(drop=True)
+
+
+def assert_matches_rebuild(store, backend, tmp_path, today=TODAY):
+    fresh = MonthEndSnapshotStore(DATASETS, backend.run, root=str(tmp_path / 'fresh'), history_start=HISTORY_START)
+    fresh.rebuild(today=today)
+    for name in DATASETS:
+        pd.testing.assert_frame_equal(sorted_frame(store.load(name)), sorted_frame(fresh.load(name)))
+
+
+def touch(backend, where, assignment=None):
+    """
+    Apply `assignment` to the occupancies matching `where`, bumping their updated_at past the watermark.
+    """
+    set_clause = f'{assignment}, ' if assignment else ''
+    backend.conn.execute(f"""
+        update occupancies set {set_clause}updated_at = (select max(updated_at) from occupancies) + interval 1 minute
+        where {where}
+    """)
+
+
+def pick(backend, where):
+    return int(backend.conn.execute(f'select min(id) from occupancies where {where}').fetchone()[0])
+
+
+def test_first_build_computes_every_month(backend, tmp_path):
+    store = MonthEndSnapshotStore(DATASETS, backend.run, root=str(tmp_path / 'store'), history_start=HISTORY_START)
+    recomputed = store.refresh(today=TODAY)
+    assert recomputed == {'move_outs': ALL_MONTHS, 'occupants': ALL_MONTHS}
+    assert store.stored_months('occupants') == ALL_MONTHS
+
+
+def test_unchanged_refresh_only_recomputes_the_open_month(store, backend, tmp_path):
+    assert store.refresh(today=TODAY) == {'move_outs': ['2024-06'], 'occupants': ['2024-06']}
+    assert store.fetch.ranges == [('2024-06-01', '2024-06-15')] * 2
+    assert_matches_rebuild(store, backend, tmp_path)
+
+
+def test_rate_edit_recomputes_its_move_out_month(store, backend, tmp_path):
+    occ_id = pick(backend, "moved_out and moved_out_at >= '2023-08-01' and moved_out_at < '2023-09-01'")
+    touch(backend, f'id = {occ_id}', 'monthly_rate = monthly_rate + 10')
+    touch(backend, f'id = {occ_id + 1}', 'auto_pay_id = null')
+
+    assert store.refresh(today=TODAY) == {'move_outs': ['2023-08', '2024-06'], 'occupants': ['2024-06']}
+    assert store.fetch.ranges[0] == ('2023-08-01', '2023-08-31')
+    assert_matches_rebuild(store, backend, tmp_path)
+
+
+def test_later_move_in_recomputes_the_months_in_between(store, backend, tmp_path):
+    occ_id = pick(backend, "move_in_date >= '2023-03-01' and move_in_date < '2023-04-01' "
+                           "and moved_out and moved_out_at >= '2023-12-01'")
+    touch(backend, f'id = {occ_id}', "move_in_date = '2023-09-10'")
+
+    recomputed = store.refresh(today=TODAY)
+    assert recomputed['move_outs'] == ['2024-06']
+    assert recomputed['occupants'] == ALL_MONTHS[2:9] + ['2024-06']
+    assert_matches_rebuild(store, backend, tmp_path)
+
+
+def test_move_out_recomputes_from_its_month(store, backend, tmp_path):
+    occ_id = pick(backend, "not moved_out and move_in_date < '2023-06-01'")
+    touch(backend, f'id = {occ_id}', "moved_out = true, moved_out_at = '2024-02-20'")
+
+    recomputed = store.refresh(today=TODAY)
+    assert recomputed['move_outs'] == ['2024-02', '2024-06']
+    assert recomputed['occupants'] == ['2024-02', '2024-03', '2024-04', '2024-05', '2024-06']
+    assert_matches_rebuild(store, backend, tmp_path)
+
+
+def test_delete_recomputes_only_its_months(store, backend, tmp_path):
+    occ_id = pick(backend, "move_in_date >= '2023-05-01' and move_in_date < '2023-06-01' "
+                           "and moved_out and moved_out_at >= '2023-10-01' and moved_out_at < '2023-11-01'")
+    backend.conn.execute(f'delete from occupancies where id = {occ_id}')
+
+    recomputed = store.refresh(today=TODAY)
+    assert recomputed['move_outs'] == ['2023-10', '2024-06']
+    assert recomputed['occupants'] == ALL_MONTHS[4:10] + ['2024-06']
+    assert_matches_rebuild(store, backend, tmp_path)
+
+
+def test_insert_behind_the_watermark_is_found_by_id(store, backend, tmp_path):
+    # committed late: id and updated_at both older than the overlapped watermark
+    backend.conn.execute("""
+        insert into occupancies by name
+        select * replace (-1 as id, '2023-04-02'::date as move_in_date, true as moved_out,
+                          '2023-07-15'::timestamptz as moved_out_at, '2020-01-01'::timestamptz as updated_at)
+        from occupancies limit 1
+    """)
+    recomputed = store.refresh(today=TODAY)
+    assert recomputed['move_outs'] == ['2023-07', '2024-06']
+    assert recomputed['occupants'] == ALL_MONTHS[3:7] + ['2024-06']
+    assert_matches_rebuild(store, backend, tmp_path)
+
+
+def test_missing_month_ends_are_filled_in(backend, tmp_path):
+    store = MonthEndSnapshotStore(DATASETS, backend.run, root=str(tmp_path / 'store'), history_start=HISTORY_START)
+    store.refresh(today=datetime.date(2024, 4, 15))
+    assert store.refresh(today=TODAY) == {'move_outs': ['2024-05', '2024-06'], 'occupants': ['2024-05', '2024-06']}
+    assert_matches_rebuild(store, backend, tmp_path)
+
+
+def test_filter_change_rebuilds_everything(store, backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(query_builder, 'EXCLUDED_FACILITY_IDS', [48, 2])
+    assert store.refresh(today=TODAY) == {'move_outs': ALL_MONTHS, 'occupants': ALL_MONTHS}
+    assert_matches_rebuild(store, backend, tmp_path)
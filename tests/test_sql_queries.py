@@ -0,0 +1,102 @@
+import datetime
+
+import psycopg2
+import pyarrow as pa
+import pytest
+import sql_queries
+
+# what `COPY (...) TO STDOUT WITH (FORMAT csv, HEADER true)` writes: NULL unquoted and empty,
+# empty strings quoted, booleans as t/f, values with newlines quoted
+COPY_CSV = (
+    b'occ_id,site_code,moved_out,moved_out_at,note,monthly_rate\n'
+    b'1,RD001,t,2024-01-31,"",100.5\n'
+    b'2,,f,,,\n'
+    b'3,RD003,,2024-02-29,"two\nlines, quoted ""here""",75\n'
+)
+
+
+class FakeCursor():
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, sql_query, params):
+        return (sql_query % {k: repr(v) for k, v in params.items()}).encode('utf-8')
+
+    def copy_expert(self, sql, sink):
+        self.conn.copied.append(sql)
+        if self.conn.error is not None:
+            raise self.conn.error
+        sink.write(self.conn.payload)
+
+
+class FakeConnection():
+    def __init__(self, payload=COPY_CSV, error=None):
+        self.payload = payload
+        self.error = error
+        self.copied = []
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connect(monkeypatch):
+    def install(conn):
+        monkeypatch.setattr(sql_queries, 'get_sql_connection', lambda: conn)
+        return conn
+    return install
+
+
+TYPES = {
+    'occ_id': pa.int64(),
+    'site_code': pa.string(),
+    'moved_out': pa.bool_(),
+    'moved_out_at': pa.date32(),
+    'note': pa.string(),
+    'monthly_rate': pa.float64(),
+}
+
+
+def test_copy_csv_nulls_booleans_and_strings(connect):
+    conn = connect(FakeConnection())
+
+    table = sql_queries.fetch_sql_arrow('select * from occupancies where id > %(id)s;', {'id': 0},
+                                        column_types=TYPES, block_size=128)
+
+    assert conn.copied == ['COPY (select * from occupancies where id > 0) TO STDOUT WITH (FORMAT csv, HEADER true)']
+    assert conn.closed
+    assert table.schema.types == list(TYPES.values())
+    rows = table.to_pylist()
+    assert [r['moved_out'] for r in rows] == [True, False, None]
+    assert [r['moved_out_at'] for r in rows] == [datetime.date(2024, 1, 31), None, datetime.date(2024, 2, 29)]
+    # an unquoted empty field is NULL, a quoted one an empty string
+    assert [r['site_code'] for r in rows] == ['RD001', None, 'RD003']
+    assert [r['note'] for r in rows] == ['', None, 'two\nlines, quoted "here"']
+    assert [r['monthly_rate'] for r in rows] == [100.5, None, 75.0]
+
+
+def test_copy_database_error_is_raised(connect):
+    conn = connect(FakeConnection(error=psycopg2.ProgrammingError('relation "occupancies" does not exist')))
+
+    with pytest.raises(psycopg2.ProgrammingError):
+        sql_queries.fetch_sql_arrow('select * from occupancies')
+    assert conn.closed
+
+
+def test_copy_parse_error_is_not_masked_by_the_broken_pipe(connect):
+    conn = connect(FakeConnection(payload=b'occ_id\n' + b'1\n' * 100_000 + b'x\n'))
+
+    with pytest.raises(pa.ArrowInvalid):
+        sql_queries.fetch_sql_arrow('select occ_id from occupancies', column_types={'occ_id': pa.int64()},
+                                    block_size=1024)
+    assert conn.closed
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+
+class TimeIndexedFrame():
+    """
+    A DataFrame kept sorted by one datetime64 column, for cheap date-range slicing.
+
+    The frame is sorted (stably) once at construction and the time column is held
+    as a datetime64[ns] array. A range query is two `searchsorted` calls and an
+    `iloc` slice, so it costs O(log n) and returns a view of the sorted frame
+    rather than a filtered copy. Slices must be treated as read-only.
+
+    Ranges are whole calendar days, inclusive at both ends: [start 00:00, end + 1 day).
+    Rows with a missing time sort last and are never returned by a range query.
+    """
+    def __init__(self, df, time_column):
+        """
+        Parameters:
+        - df (pd.DataFrame): Data to index. It is not modified.
+        - time_column (str): Column holding the timestamps (dates are converted to datetime64).
+        """
+        self.time_column = time_column
+        times = df[time_column]
+        if times.dtype != 'datetime64[ns]':
+            times = pd.to_datetime(times)
+            if times.dt.tz is not None:
+                times = times.dt.tz_localize(None)  # compare on local wall-clock days
+            df = df.assign(**{time_column: times.astype('datetime64[ns]')})
+        if not self._sorted(df[time_column].to_numpy()):
+            df = df.sort_values(time_column, kind='stable', na_position='last')
+        self.frame = df
+        self.times = self.frame[time_column].to_numpy()
+        self.n_valid = len(self.times) - int(np.isnat(self.times).sum())
+
+    @staticmethod
+    def _sorted(times):
+        # ascending with any missing times at the end, as sort_values(na_position='last') leaves them
+        n_valid = len(times) - int(np.isnat(times).sum())
+        if np.isnat(times[:n_valid]).any():
+            return False
+        return bool((times[1:n_valid] >= times[:n_valid - 1]).all()) if n_valid > 1 else True
+
+    def __len__(self):
+        return len(self.frame)
+
+    @staticmethod
+    def _day(value):
+        return np.datetime64(pd.Timestamp(value).normalize().tz_localize(None), 'ns')
+
+    def bounds(self, start_date=None, end_date=None):
+        """
+        Row positions [lo, hi) of the rows dated from `start_date` through `end_date`.
+        An omitted bound is open.
+        """
+        valid = self.times[:self.n_valid]
+        lo = 0 if start_date is None else int(np.searchsorted(valid, self._day(start_date), side='left'))
+        hi = self.n_valid if end_date is None else int(np.searchsorted(valid, self._day(end_date) + np.timedelta64(1, 'D'), side='left'))
+        return lo, max(lo, hi)
+
+    def between(self, start_date=None, end_date=None):
+        """
+        Rows dated from `start_date` through `end_date` (inclusive).
+
+        Parameters:
+        - start_date (date | datetime, optional): First day. Defaults to the first row.
+        - end_date (date | datetime, optional): Last day. Defaults to the last row.
+
+        Returns:
+        - df (pd.DataFrame): Slice of the sorted frame.
+        """
+        lo, hi = self.bounds(start_date, end_date)
+        return self.frame.iloc[lo:hi]
+
+    def shifted(self, start_date, end_date, years=0, months=0):
+        """
+        The same window moved back by `years`/`months`, e.g. the prior-year comparison window.
+        """
+        offset = pd.DateOffset(years=years, months=months)
+        return self.between(pd.Timestamp(start_date) - offset, pd.Timestamp(end_date) - offset)
+
+    def trailing(self, months, end_date=None):
+        """
+        Rows in the `months` months up to and including `end_date` (defaults to the latest row).
+        """
+        end_date = self.max() if end_date is None else pd.Timestamp(end_date)
+        if end_date is None:
+            return self.frame.iloc[0:0]
+        start_date = end_date - pd.DateOffset(months=months) + pd.Timedelta(days=1)
+        return self.between(start_date, end_date)
+
+    def min(self):
+        return pd.Timestamp(self.times[0]) if self.n_valid else None
+
+    def max(self):
+        return pd.Timestamp(self.times[self.n_valid - 1]) if self.n_valid else None
@@ -1,38 +1,140 @@
 import pandas as pd
 import streamlit as st 
-import boto3 
 import json  
-from io import StringIO    
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import csv as pa_csv
+from s3_cache import S3ObjectCache
+from instrumentation import timed
+from schemas import apply_schema
 
-MASTER_ACCESS_KEY = st.secrets["MASTER_ACCESS_KEY"]
-MASTER_SECRET = st.secrets["MASTER_SECRET"]
+_s3_client = None
+_s3_cache = None
+_s3_lock = threading.Lock()
 
 def s3_init():  
-    
-    # --- s3 client --- 
-    s3 = boto3.client('s3', region_name = 'us-west-1', 
-          aws_access_key_id=MASTER_ACCESS_KEY, 
-          aws_secret_access_key=MASTER_SECRET) 
-    return s3 
-
-@st.cache_data
-def grab_s3_file(f, bucket, idx_col=None, is_json=False):
-    s3 = s3_init()
-    data = s3.get_object(Bucket=bucket, Key=f)['Body'].read().decode('utf-8') 
-    
-    # Check if the file is a JSON
-    if is_json:
-        return json.loads(data)  # Return the parsed JSON data as a dictionary
-    
-    # If the file is a CSV
-    if idx_col is None:
-        data = pd.read_csv(StringIO(data)) 
-    else:
-        data = pd.read_csv(StringIO(data), index_col=idx_col)
+    """
+    Return the process-wide S3 client, creating it on first use. boto3 clients
+    are thread-safe, so building one per call only re-resolves credentials.
+    """
+    global _s3_client
+    with _s3_lock:
+        if _s3_client is None:
+            import boto3  # imported here so pages that never touch S3 start without it
+            # --- s3 client --- 
+            _s3_client = boto3.client('s3', region_name = 'us-west-1', 
+                  aws_access_key_id=st.secrets["MASTER_ACCESS_KEY"], 
+                  aws_secret_access_key=st.secrets["MASTER_SECRET"]) 
+    return _s3_client 
+
+def s3_cache():
+    global _s3_cache
+    client = s3_init()
+    with _s3_lock:
+        if _s3_cache is None:
+            _s3_cache = S3ObjectCache(client)
+    return _s3_cache
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+
+ECRIS_BUCKET = 'rev-mgt'
+ECRIS_KEY = 'ecri/master_ecris.csv'
+ECRI_OCCS_KEY = 'ecri/occupancies.csv'
+
+def _arrow_type(t):
+    return pa.type_for_alias(t) if isinstance(t, str) else t
+
+def read_s3_table(body, f, columns=None, dtypes=None, parse_dates=None, content_encoding=None):
+    """
+    Parse an S3 object body into an Arrow table without decoding it to a Python str.
+
+    CSV (optionally gzip) is streamed straight from the body into pyarrow's CSV
+    reader; Parquet needs random access so it is read into a single Arrow buffer.
+
+    Parameters:
+    - body: File-like object body (e.g. botocore StreamingBody).
+    - f (str): Object key, used to detect the format from its suffix.
+    - columns (list, optional): Columns to keep; others are skipped while parsing.
+    - dtypes (dict, optional): Column -> pyarrow type or alias ('string', 'float64', 'bool', ...).
+    - parse_dates (list, optional): Columns to parse as timestamps.
+    - content_encoding (str, optional): ContentEncoding of the object ('gzip' is decompressed).
+
+    Returns:
+    - table (pa.Table): Parsed data.
+    """
+    key = f.lower()
+    is_gzip = key.endswith('.gz') or content_encoding == 'gzip'
+    if is_gzip:
+        key = key[:-3] if key.endswith('.gz') else key
+
+    if key.endswith(PARQUET_SUFFIXES):
+        source = pa.BufferReader(pa.py_buffer(body.read()))
+        if is_gzip:
+            source = pa.BufferReader(pa.CompressedInputStream(source, 'gzip').read())
+        table = pq.read_table(source, columns=columns)
+        casts = {c: _arrow_type(t) for c, t in (dtypes or {}).items()}
+        casts.update({c: pa.timestamp('ns') for c in parse_dates or []})
+        for col, typ in casts.items():
+            if col in table.column_names:
+                idx = table.column_names.index(col)
+                table = table.set_column(idx, col, table.column(col).cast(typ))
+        if casts:
+            # stale pandas metadata would otherwise restore the pre-cast dtypes in to_pandas()
+            table = table.replace_schema_metadata(None)
+        return table
+
+    stream = pa.PythonFile(body, mode='r')
+    if is_gzip:
+        stream = pa.CompressedInputStream(stream, 'gzip')
+    column_types = {c: _arrow_type(t) for c, t in (dtypes or {}).items()}
+    column_types.update({c: pa.timestamp('ns') for c in parse_dates or []})
+    return pa_csv.read_csv(
+        stream,
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types,
+            include_columns=columns,
+            strings_can_be_null=True,
+        ),
+    )
+
+def read_s3_file(f, bucket, idx_col=None, is_json=False, columns=None, dtypes=None, parse_dates=None):
+    # served from the local ETag-validated copy; only changed objects are downloaded
+    body, meta = s3_cache().open(bucket, f)
+    with body:
+        # Check if the file is a JSON
+        if is_json:
+            return json.loads(body.read())  # Return the parsed JSON data as a dictionary
+
+        # CSV / gzip CSV / Parquet, parsed columnar straight from the stream
+        table = read_s3_table(body, f, columns=columns, dtypes=dtypes, parse_dates=parse_dates,
+                              content_encoding=meta['content_encoding'])
+    data = table.to_pandas()
+    if idx_col is not None:
+        data = data.set_index(data.columns[idx_col] if isinstance(idx_col, int) else idx_col)
 
 # we can add a pickle function to this if needed
     return data 
 
+@timed('grab_s3_file', cache_default='memory')
+@st.cache_data(ttl=60*15)  # revalidation is a cheap conditional GET, so re-check often
+def grab_s3_file(f, bucket, idx_col=None, is_json=False, columns=None, dtypes=None, parse_dates=None):
+    return read_s3_file(f, bucket, idx_col, is_json, columns, dtypes, parse_dates)
+
+def s3_version(f, bucket, revalidate=False):
+    # ETag of the locally cached copy (None until fetched once), or of the object in S3 when revalidating
+    if revalidate:
+        return s3_cache().fetch(bucket, f)['etag']
+    meta = s3_cache().read_meta(bucket, f)
+    return meta['etag'] if meta else None
+
+def fetch_ecris():
+    ecris = read_s3_file(ECRIS_KEY, ECRIS_BUCKET,
+                         dtypes={'ecri_pending': 'bool', 'model': 'string'},
+                         parse_dates=['notification_date', 'increase_date', 'moved_out_date'])
+    ecris['event_occurred'] = (~ecris['moved_out_date'].isnull()).astype(int)
+    return apply_schema(ecris, 'ecris')
+
 def blank(): return st.write('') 
 
 def password_authenticate(pwsd):